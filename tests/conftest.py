@@ -0,0 +1,45 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests never read or write the on-disk result cache, and draw without a display
+os.environ["TRAVEL_CACHE"] = "off"
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from travel_info import PROFILE_OPTIONS, LIKES_OPTIONS  # noqa: E402
+
+
+def random_profiles(count, seed=0):
+    """
+    count random complete profiles (same seed, same profiles).
+    """
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        user = {field: rng.choice(options) for field, options in PROFILE_OPTIONS.items()}
+        user["likes"] = [like for like in LIKES_OPTIONS if rng.random() < 0.4]
+        profiles.append(user)
+    return profiles
+
+
+@pytest.fixture(scope="session")
+def profiles():
+    return random_profiles(150)
+
+
+@pytest.fixture
+def trace_policy():
+    # Set a retention policy for one test, back to "full" afterwards
+    from travel_trace import set_trace_policy
+    yield set_trace_policy
+    set_trace_policy("full")
+
+
+@pytest.fixture(scope="session")
+def dest_facts():
+    from travel_info import build_destination_facts
+    return build_destination_facts()
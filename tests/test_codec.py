@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from travel_info import DESTINATIONS
+from travel_core import build_feature_matrix, compute_scores, run_inference
+from travel_codec import STATE_KEYS, EncodeError, decode_state, encode_state
+from travel_trace import TraceBuffer, format_trace
+
+
+def assert_same_state(view, state):
+    for key in STATE_KEYS:
+        if key in ("recommended", "not_recommended"):
+            assert list(view[key]) == list(state[key])
+            for d in state[key]:
+                assert list(view[key][d]) == state[key][d]
+        else:
+            assert list(view[key]) == list(state[key]), key
+    assert list(view["cube"].destinations) == list(state["cube"].destinations)
+    assert np.array_equal(view["cube"].counts, state["cube"].counts)
+
+
+def test_round_trip(profiles, dest_facts):
+    for user in profiles:
+        state = run_inference(user, dest_facts)
+        scores = compute_scores(state)
+        view = decode_state(encode_state(state, scores))
+
+        assert_same_state(view, state)
+        assert view.scores() == scores
+        assert compute_scores(view) == scores
+        destinations, matrix = build_feature_matrix(view)
+        expected_destinations, expected = build_feature_matrix(state)
+        assert destinations == expected_destinations
+        assert np.array_equal(matrix, expected)
+        assert_same_state(decode_state(encode_state(view.to_state())), state)
+
+
+def test_round_trip_custom_catalog(profiles, dest_facts):
+    catalog = list(reversed(DESTINATIONS))[:5]
+    state = run_inference(profiles[0], dest_facts, catalog)
+    view = decode_state(encode_state(state))
+    assert list(view.destinations) == catalog
+    assert_same_state(view, state)
+    assert view.scores() is None
+
+
+def test_without_trace(profiles, dest_facts):
+    state = run_inference(profiles[0], dest_facts)
+    view = decode_state(encode_state(state, trace=False))
+    assert view["trace"] == []
+    assert view.structured_trace() is None
+    assert compute_scores(view) == compute_scores(state)
+
+
+@pytest.mark.parametrize("policy", ["first:5", "ring:5", "sampled:5", "ring:0"])
+def test_round_trip_bounded_trace(profiles, dest_facts, trace_policy, policy):
+    trace_policy(policy)
+    for user in profiles[:20]:
+        state = run_inference(user, dest_facts)
+        trace = state["trace"]
+        assert isinstance(trace, TraceBuffer)
+
+        decoded = decode_state(encode_state(state))["trace"]
+        assert isinstance(decoded, TraceBuffer)
+        assert (decoded.policy, decoded.limit) == (trace.policy, trace.limit)
+        assert list(decoded) == list(trace)
+        assert (decoded.seen, decoded.dropped) == (trace.seen, trace.dropped)
+        assert decoded.rule_counts == trace.rule_counts
+        assert format_trace(decoded) == format_trace(trace)
+
+
+def test_bounded_trace_survives_a_full_policy_reader(profiles, dest_facts, trace_policy):
+    trace_policy("ring:3")
+    state = run_inference(profiles[0], dest_facts)
+    data = encode_state(state)
+    trace_policy("full")
+    decoded = decode_state(data)["trace"]
+    assert isinstance(decoded, TraceBuffer)
+    assert list(decoded) == list(state["trace"])
+
+
+def test_full_trace_read_under_a_bounded_policy(profiles, dest_facts, trace_policy):
+    state = run_inference(profiles[0], dest_facts)
+    data = encode_state(state)
+    trace_policy("first:4")
+    decoded = decode_state(data)["trace"]
+    assert list(decoded) == state["trace"][:4]
+    assert decoded.seen == len(state["trace"])
+
+
+def test_unencodable_state_is_not_a_value_error(profiles, dest_facts):
+    state = run_inference(profiles[0], dest_facts)
+    state["neutral"] = list(reversed(DESTINATIONS))
+    with pytest.raises(EncodeError):
+        encode_state(state)
+    assert not issubclass(EncodeError, ValueError)
+
+
+def test_garbage_is_rejected():
+    with pytest.raises(ValueError):
+        decode_state(b"not a state")
@@ -0,0 +1,28 @@
+import pytest
+
+import travel_server
+from travel_core import build_sample_user
+from travel_daemon import handle_message
+
+
+def test_recommend():
+    response, keep_running = handle_message({"profile": build_sample_user(), "top": 3})
+    assert keep_running and response["ok"]
+    assert len(response["result"]["ranking"]) == 3
+
+
+@pytest.mark.parametrize("top", [True, False, 0, -2, 1.5, "3"])
+def test_invalid_top(top):
+    response, keep_running = handle_message({"profile": build_sample_user(), "top": top})
+    assert keep_running
+    assert response == {"ok": False, "error": "top must be a positive integer"}
+
+
+def test_unexpected_error_is_answered(monkeypatch):
+    def fail(*args):
+        raise KeyError("cube")
+
+    monkeypatch.setattr(travel_server, "evaluate_request", fail)
+    response, keep_running = handle_message({"op": "scores", "profile": build_sample_user()})
+    assert keep_running
+    assert response == {"ok": False, "error": "KeyError: 'cube'"}
@@ -0,0 +1,55 @@
+import pytest
+
+from travel_info import EXPLANATIONS
+from travel_core import (
+    LABEL_EXPLANATIONS,
+    LazyExplanations,
+    build_explanations,
+    explain_destination,
+    explain_signature,
+    run_inference,
+)
+
+
+def reference_explanation(state, d):
+    # Straight from the tables: rule texts in firing order, then label texts, no duplicates
+    result = {"positives": [], "negatives": []}
+    for side, rules in (("positives", state["recommended"][d]), ("negatives", state["not_recommended"][d])):
+        for rule in rules:
+            text = EXPLANATIONS.get(rule)
+            if text is not None and text not in result[side]:
+                result[side].append(text)
+    for label, (side, text) in LABEL_EXPLANATIONS.items():
+        if d in state[label] and text not in result[side]:
+            result[side].append(text)
+    return result
+
+
+def test_memoized_explanations_match_the_tables(profiles, dest_facts):
+    explain_signature.cache_clear()
+    for user in profiles:
+        state = run_inference(user, dest_facts)
+        explanations = build_explanations(state)
+        for d in state["recommended"]:
+            assert explanations[d] == reference_explanation(state, d)
+            assert explain_destination(state, d) == explanations[d]
+    assert explain_signature.cache_info().hits > 0
+
+
+def test_lazy_explanations_match_build_explanations(profiles, dest_facts):
+    for user in profiles[:30]:
+        state = run_inference(user, dest_facts)
+        lazy = LazyExplanations(state)
+        assert dict(lazy) == build_explanations(state)
+        assert len(lazy) == len(state["recommended"])
+
+
+def test_lazy_explanations_only_build_what_is_read(profiles, dest_facts):
+    state = run_inference(profiles[0], dest_facts)
+    lazy = LazyExplanations(state)
+    first = next(iter(state["recommended"]))
+    lazy[first]
+    assert list(lazy.cache) == [first]
+    with pytest.raises(KeyError):
+        lazy["Atlantis"]
+
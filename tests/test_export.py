@@ -0,0 +1,58 @@
+import io
+import json
+import os
+
+import pytest
+
+from travel_info import DESTINATIONS
+from travel_core import compute_scores, normalize_user, rank_destinations, run_inference
+from travel_export import SCHEMA_FILE, ColumnWriter, category_code, export_batch, export_rows, read_columns
+
+
+def jsonl(profiles):
+    return io.StringIO("".join(json.dumps(user) + "\n" for user in profiles))
+
+
+def test_export_matches_inference(tmp_path, profiles, dest_facts):
+    users = profiles[:12]
+    source = jsonl(users[:5]).getvalue() + "not json\n" + jsonl(users[5:]).getvalue()
+    schema = export_batch(io.StringIO(source), str(tmp_path), chunk_size=4)
+
+    assert schema["rows"] == len(users) * len(DESTINATIONS)
+    assert schema["profiles"] == len(users)
+    assert schema["invalid_lines"] == [6]
+    assert sum(schema["chunks"]) == schema["rows"]
+
+    columns = read_columns(str(tmp_path))
+    row = 0
+    for number, user in enumerate(users):
+        scores = compute_scores(run_inference(normalize_user(user), dest_facts))
+        ranks = {d: i for i, d in enumerate(rank_destinations(scores), start=1)}
+        for d in DESTINATIONS:
+            assert columns["profile"][row] == number
+            assert columns["destination"][row] == category_code(schema, "destination", d)
+            assert columns["budget"][row] == category_code(schema, "budget", user["budget"])
+            assert columns["score"][row] == scores[d]
+            assert columns["rank"][row] == ranks[d]
+            row += 1
+
+
+def test_schema_only_written_on_success(tmp_path, profiles):
+    part = export_rows(list(enumerate(jsonl(profiles[:2]).getvalue().splitlines(), start=1)))
+    with pytest.raises(RuntimeError):
+        with ColumnWriter(str(tmp_path)) as writer:
+            writer.append(part)
+            raise RuntimeError("interrupted")
+    assert not os.path.exists(tmp_path / SCHEMA_FILE)
+    assert writer.files is None
+
+
+def test_rewrite_removes_stale_schema(tmp_path, profiles):
+    export_batch(jsonl(profiles[:2]), str(tmp_path))
+    assert os.path.exists(tmp_path / SCHEMA_FILE)
+
+    writer = ColumnWriter(str(tmp_path))
+    assert not os.path.exists(tmp_path / SCHEMA_FILE)
+    writer.close()
+    writer.close()
+    assert read_columns(str(tmp_path))["score"].shape == (0,)
@@ -0,0 +1,57 @@
+import pytest
+
+from travel_info import DESTINATIONS, TRAVEL_TIPS
+from travel_core import compute_scores, run_inference
+from travel_kb import SharedKB, attach_kb
+
+
+@pytest.fixture
+def attached():
+    # Attach to a block published for one test; detach and unlink afterwards
+    opened = []
+
+    def attach(*args, **kwargs):
+        kb = SharedKB(*args, **kwargs)
+        view = attach_kb(kb.name)
+        opened.append((kb, view))
+        return view
+
+    yield attach
+    for kb, view in opened:
+        view.close()
+        kb.close()
+        kb.unlink()
+
+
+def test_views_match_facts(attached, dest_facts):
+    kb = attached()
+    assert list(kb.destinations) == DESTINATIONS
+    for fact, members in dest_facts.items():
+        view = kb.dest_facts[fact]
+        if isinstance(members, dict):
+            assert {d: set(view[d]) for d in view} == {d: set(v) for d, v in members.items() if v}
+        else:
+            assert set(view) == set(members)
+    assert {d: kb.tips[d] for d in DESTINATIONS} == {d: TRAVEL_TIPS.get(d, []) for d in DESTINATIONS}
+    assert "Atlantis" not in kb.dest_facts["expensive"]
+    assert "Atlantis" not in kb.dest_facts["best_season"]
+    assert kb.row("Atlantis") == -1
+
+
+def test_rules_on_views(attached, dest_facts, profiles):
+    kb = attached()
+    for user in profiles:
+        state = run_inference(user, kb.dest_facts)
+        assert compute_scores(state) == compute_scores(run_inference(user, dest_facts))
+        assert state["trace"] == run_inference(user, dest_facts)["trace"]
+
+
+def test_large_catalog_lookup(attached):
+    # Thousands of names collide in the hash table; each must still find its row
+    destinations = [f"Place {i}" for i in range(5000)] + ["Zürich"]
+    facts = {"expensive": destinations[::3], "best_season": {d: ["spring"] for d in destinations[::7]}}
+    kb = attached(facts, destinations, tips={})
+    assert [kb.row(d) for d in destinations] == list(range(len(destinations)))
+    assert kb.destinations[-1] == "Zürich"
+    assert set(kb.dest_facts["expensive"]) == set(facts["expensive"])
+    assert set(kb.dest_facts["best_season"]) == set(facts["best_season"])
@@ -0,0 +1,88 @@
+import pytest
+
+from travel_core import run_inference
+from travel_query import BitmapIndex, IndexBuilder, is_known_key, outcome_keys
+
+A = "budget=low"
+B = "Japan:neutral"
+C = "rule:R22_contradiction_detection"
+
+
+@pytest.fixture
+def index():
+    # Profiles 0-7: bit 0 of n says A, bit 1 says B, bit 2 says C
+    bitmaps = {"all": 0xFF}
+    for bit, key in enumerate((A, B, C)):
+        bitmaps[key] = sum(1 << n for n in range(8) if n >> bit & 1)
+    return BitmapIndex("batch", bitmaps)
+
+
+def matching(predicate):
+    return sum(1 << n for n in range(8) if predicate(n & 1, n >> 1 & 1, n >> 2 & 1))
+
+
+@pytest.mark.parametrize("expression, predicate", [
+    (f"{A} or {B} and {C}", lambda a, b, c: a or (b and c)),
+    (f"{A} and {B} or {C}", lambda a, b, c: (a and b) or c),
+    (f"not {A} and {B}", lambda a, b, c: (not a) and b),
+    (f"not {A} or {B}", lambda a, b, c: (not a) or b),
+    (f"not ({A} or {B})", lambda a, b, c: not (a or b)),
+    (f"({A} or {B}) and {C}", lambda a, b, c: (a or b) and c),
+    (f"not not {A}", lambda a, b, c: a),
+    (f"{A} and not ({B} and not {C})", lambda a, b, c: a and not (b and not c)),
+    (f"(({A}))", lambda a, b, c: a),
+])
+def test_precedence(index, expression, predicate):
+    assert index.query(expression) == matching(predicate)
+
+
+@pytest.mark.parametrize("expression", [
+    "", f"({A}", f"{A})", f"{A} and", f"or {A}", f"{A} {B}", "()",
+    "budget=bogus", "rule:R99_missing", f"{C}@Atlantis",
+])
+def test_rejected_queries(index, expression):
+    with pytest.raises(ValueError):
+        index.query(expression)
+
+
+def test_known_keys_that_never_occurred(index):
+    assert index.query("Dubai:strongly_recommended") == 0
+    assert index.query(f"{C}@Japan") == 0
+    assert not is_known_key("rule:")
+    assert not is_known_key("likes=skiing")
+
+
+def build_index(profiles, dest_facts):
+    builder = IndexBuilder("batch")
+    for number, user in enumerate(profiles):
+        builder.add(number, user, run_inference(user, dest_facts))
+    return builder.build()
+
+
+@pytest.mark.parametrize("policy", ["ring:20", "first:5", "sampled:10", "ring:0"])
+def test_index_does_not_depend_on_trace_retention(profiles, dest_facts, trace_policy, policy):
+    full = build_index(profiles[:50], dest_facts)
+    trace_policy(policy)
+    bounded = build_index(profiles[:50], dest_facts)
+    assert bounded.bitmaps == full.bitmaps
+    assert any(key.startswith("rule:") and "@" in key for key in full.keys())
+
+
+def test_index_matches_outcomes(profiles, dest_facts):
+    builder = IndexBuilder("batch")
+    outcomes = []
+    for number, user in enumerate(profiles[:60]):
+        state = run_inference(user, dest_facts)
+        builder.add(number, user, state)
+        outcomes.append(outcome_keys(user, state))
+    index = builder.build()
+
+    query = "Japan:strongly_recommended and not (budget=low or rule:R22_contradiction_detection@Japan)"
+    expected = [
+        n for n, keys in enumerate(outcomes)
+        if "Japan:strongly_recommended" in keys
+        and not ("budget=low" in keys or "rule:R22_contradiction_detection@Japan" in keys)
+    ]
+    assert index.numbers(index.query(query)) == expected
+    for key in index.keys():
+        assert is_known_key(key), key
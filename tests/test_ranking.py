@@ -0,0 +1,20 @@
+import itertools
+
+import pytest
+
+from travel_core import compute_scores, iter_ranked, rank_destinations, run_inference
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 7, 50])
+def test_pages_match_full_ranking(profiles, dest_facts, page_size):
+    for user in profiles[:30]:
+        scores = compute_scores(run_inference(user, dest_facts))
+        pages = list(iter_ranked(scores, page_size=page_size))
+        assert all(0 < len(page) <= page_size for page in pages)
+        assert list(itertools.chain.from_iterable(pages)) == rank_destinations(scores)
+
+
+@pytest.mark.parametrize("page_size", [0, -1, 2.5, True, None])
+def test_invalid_page_size(page_size):
+    with pytest.raises(ValueError):
+        iter_ranked({"Italy": 1, "Japan": 2}, page_size=page_size)
@@ -0,0 +1,30 @@
+import json
+
+import travel_report
+from travel_report import generate_reports
+
+
+def test_errors_are_recorded_per_line(tmp_path, monkeypatch, profiles):
+    written = []
+
+    def write_report(user, state, scores, path, fmt="pdf", top=5, dpi=100):
+        # Line 2 hits a full disk, line 3 a rendering error, the others succeed
+        if path.endswith("-2"):
+            raise OSError(28, "No space left on device")
+        if path.endswith("-3"):
+            raise RuntimeError("renderer failed")
+        written.append(path)
+        return [path + "." + fmt]
+
+    monkeypatch.setattr(travel_report, "write_report", write_report)
+    lines = [json.dumps(dict(user, id="c")) for user in profiles[:5]] + ["{not json"]
+    outdir = tmp_path / "reports"
+    assert generate_reports(lines, str(outdir), chunk_size=10) == (3, 3)
+
+    index = [json.loads(line) for line in (outdir / "index.jsonl").read_text().splitlines()]
+    assert [record["line"] for record in index] == [1, 2, 3, 4, 5, 6]
+    assert "No space left" in index[1]["error"] and "files" not in index[1]
+    assert "renderer failed" in index[2]["error"]
+    assert "error" in index[5]
+    assert [record["files"] for record in index if "files" in record] == [["c-1.pdf"], ["c-4.pdf"], ["c-5.pdf"]]
+    assert len(written) == 3
@@ -0,0 +1,31 @@
+from travel_core import run_inference, compute_scores, rank_destinations
+from travel_whatif import profile_alternatives, what_if
+
+
+def test_deltas_match_full_reruns(profiles, dest_facts):
+    for user in profiles[:40]:
+        report = what_if(user, dest_facts)
+        base = report["base_scores"]
+        assert base == compute_scores(run_inference(user, dest_facts))
+        assert report["base_top"] == rank_destinations(base)[0]
+
+        alternatives = list(profile_alternatives(user))
+        assert len(report["changes"]) == len(alternatives)
+        for change, (field, old, new, alt) in zip(report["changes"], alternatives):
+            assert (change["field"], change["from"], change["to"]) == (field, old, new)
+
+            scores = compute_scores(run_inference(alt, dest_facts))
+            expected = {d: scores[d] - base[d] for d in scores if scores[d] != base[d]}
+            assert change["deltas"] == expected, (field, new)
+
+            top = rank_destinations(scores)[0]
+            assert change["top"] == top
+            assert change["top_score"] == scores[top]
+            assert change["top_changed"] == (top != report["base_top"])
+
+
+def test_alternatives_change_one_field(profiles):
+    user = profiles[0]
+    for field, old, new, alt in profile_alternatives(user):
+        assert alt[field] == new != old
+        assert {f for f in user if user[f] != alt[f]} == {field}
@@ -0,0 +1,234 @@
+# =============================================
+# Travel Cache - Persistent Result Cache
+# =============================================
+# SQLite-backed cache of inference results, keyed by the canonical user
+# profile and the knowledge-base version (KBSnapshot digest), so a restarted
+# GUI, CLI, batch run or service starts warm.
+#
+# - Entries of other KB versions are never returned (and are dropped first
+#   when the cache is compacted).
+# - Size limits (entries and bytes): when exceeded, the least recently used
+#   entries are deleted until the cache is back under 90% of the limits.
+# - Safe for several threads and processes (WAL mode, one connection per
+#   process, lock per connection).
+#
+# On by default. Environment overrides:
+#   TRAVEL_CACHE=off           disable the default cache
+#   TRAVEL_CACHE_PATH=<file>   location (default: ~/.cache/travel-advisor/results.sqlite3)
+
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from travel_kb import snapshot_kb
+
+
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# How often (in puts) the size limits are checked
+COMPACT_EVERY = 500
+
+# Last-used times are only refreshed when older than this many seconds,
+# so cache hits rarely need a write
+TOUCH_INTERVAL = 60.0
+
+
+def default_cache_path():
+    path = os.environ.get("TRAVEL_CACHE_PATH")
+    if path:
+        return path
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "travel-advisor", "results.sqlite3")
+
+
+@functools.lru_cache(maxsize=1)
+def default_kb_version():
+    """
+    Version of the built-in knowledge base: the digest of snapshot_kb().
+    """
+    return snapshot_kb().digest
+
+
+# ===========================
+# 1. Cache
+# ===========================
+
+class ResultCache:
+    """
+    Persistent key -> value store for inference results.
+
+    get(version, key) / put(version, key, value); keys are strings
+    (see travel_core.profile_key()), values any JSON-serializable object.
+    get_blob() / put_blob() store bytes as they are (e.g. travel_codec states).
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or default_cache_path()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.puts = 0
+        self.conn = None
+        self.pid = None
+
+    def _connect(self):
+        # A connection must not be used across fork(): reopen in each process
+        if self.conn is not None and self.pid == os.getpid():
+            return self.conn
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " version TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (version, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.conn = conn
+        self.pid = os.getpid()
+        return conn
+
+    def encode(self, value):
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, blob):
+        return json.loads(blob)
+
+    def get(self, version, key):
+        """
+        Cached value for (version, key), or None.
+        """
+        blob = self.get_blob(version, key)
+        return None if blob is None else self.decode(blob)
+
+    def put(self, version, key, value):
+        self.put_blob(version, key, self.encode(value))
+
+    def get_blob(self, version, key):
+        """
+        Cached bytes for (version, key), or None.
+        """
+        with self.lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, last_used FROM results WHERE version = ? AND key = ?", (version, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL:
+                conn.execute(
+                    "UPDATE results SET last_used = ? WHERE version = ? AND key = ?", (now, version, key)
+                )
+        return row[0]
+
+    def put_blob(self, version, key, blob):
+        with self.lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO results (version, key, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (version, key, blob, len(blob), time.time()),
+            )
+            self.puts += 1
+            if self.puts % COMPACT_EVERY == 0:
+                self._compact(conn, version)
+
+    def compact(self, version=None):
+        """
+        Enforce the size limits now. Entries of versions other than `version`
+        are removed first, then the least recently used ones.
+        """
+        with self.lock:
+            self._compact(self._connect(), version)
+
+    def _compact(self, conn, version):
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version is not None:
+                conn.execute("DELETE FROM results WHERE version != ?", (version,))
+                entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+
+            target_entries = int(self.max_entries * 0.9)
+            target_bytes = int(self.max_bytes * 0.9)
+            if entries > target_entries or size > target_bytes:
+                # Walk from the least recently used entry and find the cut-off
+                drop = 0
+                cutoff = None
+                rows = conn.execute("SELECT last_used, size FROM results ORDER BY last_used")
+                for last_used, entry_size in rows:
+                    if entries - drop <= target_entries and size <= target_bytes:
+                        break
+                    drop += 1
+                    size -= entry_size
+                    cutoff = last_used
+                if cutoff is not None:
+                    conn.execute("DELETE FROM results WHERE last_used <= ?", (cutoff,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        with self.lock:
+            self._connect().execute("DELETE FROM results")
+
+    def stats(self):
+        """
+        {"entries", "bytes", "hits", "misses"} (hits / misses of this process).
+        """
+        with self.lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+        return {"entries": entries, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None and self.pid == os.getpid():
+                self.conn.close()
+            self.conn = None
+
+
+# ===========================
+# 2. Default cache
+# ===========================
+
+_DEFAULT = {}
+
+
+def default_cache():
+    """
+    Process-wide cache at default_cache_path(), or None if disabled
+    (TRAVEL_CACHE=off) or the location is not writable.
+    """
+    if os.environ.get("TRAVEL_CACHE", "").lower() in ("0", "off", "false", "no"):
+        return None
+    path = default_cache_path()
+    cache = _DEFAULT.get(path)
+    if cache is None:
+        cache = ResultCache(path)
+        try:
+            cache.stats()   # opens / creates the database
+        except (OSError, sqlite3.Error):
+            cache = False
+        _DEFAULT[path] = cache
+    return cache or None
@@ -0,0 +1,521 @@
+# =============================================
+# Travel Codec - Compact Binary Inference Results
+# =============================================
+# Binary encoding of run_inference() states (optionally with scores), much
+# smaller and faster to move between processes than JSON or pickle:
+#
+# - destination and rule ids are interned: rules come from a fixed codebook
+#   (the RULE_LOGIC order), destinations are only spelled out when the state
+#   is not over the built-in DESTINATIONS catalog;
+# - evidence is one fixed-width bitmask pair per destination (recommended /
+#   not_recommended rules) plus one byte of label bits, so any destination
+#   can be read in place;
+# - scores are zigzag varints;
+# - the reasoning trace is optional and stored structured, as (rule, destination)
+#   pairs that are expanded back into the RULE_LOGIC text when read. A bounded
+#   trace (travel_trace.TraceBuffer) also stores its policy and counters.
+#
+# decode_state() returns a StateView: a zero-copy, read-only view over the
+# buffer with the same read API as the state dict (state["recommended"][d],
+# state["strongly_recommended"], state["trace"], ...), so compute_scores(),
+# LazyExplanations and the plotting helpers accept it directly.
+#
+# Layout:
+#   magic "TRS\x01" | flags u8 | varint D | [D names] | varint extra rules | [names]
+#   | varint W | D x (W bytes rec mask, W bytes not-rec mask, 1 label byte)
+#   | varint flag count | [flag strings] | [D zigzag scores] | [trace entries]
+#   | [bounded trace: policy string, varint events seen, varint rules, rules x (name, varint count)]
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from travel_info import DESTINATIONS, RULE_LOGIC, SCORE_FEATURES
+from travel_cube import CategoryCube, rule_category_matrix
+from travel_trace import TraceBuffer, format_trace_policy, parse_trace_policy, retain_trace
+
+
+MAGIC = b"TRS\x01"
+
+# Header flags
+CUSTOM_CATALOG = 1
+HAS_SCORES = 2
+HAS_TRACE = 4
+BOUNDED_TRACE = 8
+
+# Fixed rule codebook: bit i of an evidence mask is RULE_CODES[i]
+RULE_CODES = list(RULE_LOGIC)
+RULE_INDEX = {rule: i for i, rule in enumerate(RULE_CODES)}
+
+# Label lists of the state, bit i of the label byte is LABELS[i]
+LABELS = [
+    "strongly_recommended",
+    "strongly_not_recommended",
+    "neutral",
+    "season_matched",
+    "weak_recommendation",
+    "contradictions",
+    "final_recommendation",
+]
+
+# Keys of a state dict, in init_state() order
+STATE_KEYS = [
+    "recommended",
+    "not_recommended",
+    "strongly_recommended",
+    "strongly_not_recommended",
+    "neutral",
+    "season_matched",
+    "weak_recommendation",
+    "contradictions",
+    "flags",
+    "trace",
+    "final_recommendation",
+]
+
+# Keys of a decoded view: the encoded ones plus the derived analytics cube
+VIEW_KEYS = STATE_KEYS + ["cube"]
+
+
+# ===========================
+# 1. Varints
+# ===========================
+
+def write_varint(out, n):
+    """
+    Append an unsigned LEB128 varint to a bytearray.
+    """
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(buf, pos):
+    """
+    Read an unsigned varint from buf at pos. Returns (value, new pos).
+    """
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def zigzag(n):
+    return n * 2 if n >= 0 else -n * 2 - 1
+
+
+def unzigzag(n):
+    return n >> 1 if n % 2 == 0 else -((n + 1) >> 1)
+
+
+def write_string(out, text):
+    data = text.encode("utf-8")
+    write_varint(out, len(data))
+    out += data
+
+
+def read_string(buf, pos):
+    length, pos = read_varint(buf, pos)
+    return str(buf[pos:pos + length], "utf-8"), pos + length
+
+
+# ===========================
+# 2. Structured trace
+# ===========================
+
+# Exact texts the rules write, per rule id (see add_rec() in travel_core)
+TRACE_LINES = {rule: rule + ": " + logic for rule, logic in RULE_LOGIC.items() if logic}
+TRACE_PREFIXES = {rule: line + "; applied with X = " for rule, line in TRACE_LINES.items()}
+
+
+def parse_trace_line(line, position):
+    """
+    Match a trace line against the RULE_LOGIC formats written by the rules:
+      "<rule>: <logic>; applied with X = <dest>" -> (rule, dest)
+      "<rule>: <logic>"                         -> (rule, None)
+    Returns None for any other line (stored as raw text).
+    """
+    rule = line[:line.find(":")]
+    prefix = TRACE_PREFIXES.get(rule)
+    if prefix is None:
+        return None
+    if line.startswith(prefix):
+        dest = line[len(prefix):]
+        if dest in position:
+            return rule, dest
+    elif line == TRACE_LINES[rule]:
+        return rule, None
+    return None
+
+
+def format_trace_entry(rule, dest):
+    """
+    Trace line for a structured (rule, dest) entry, as the rules write it.
+    """
+    if dest is None:
+        return TRACE_LINES[rule]
+    return TRACE_PREFIXES[rule] + dest
+
+
+# ===========================
+# 3. Encoder
+# ===========================
+
+class EncodeError(Exception):
+    """
+    A state the format cannot hold. Not a ValueError, so it is never taken
+    for the invalid-profile errors callers report.
+    """
+
+
+def encode_state(state, scores=None, trace=True):
+    """
+    Encode an inference state (and optionally its scores dict) to bytes.
+    The trace is included unless trace=False.
+
+    Raises EncodeError for states run_inference() cannot produce (evidence
+    not in rule order, labels not in catalog order or outside the catalog).
+    """
+    destinations = list(state["recommended"])
+    position = {d: i for i, d in enumerate(destinations)}
+    custom = destinations != DESTINATIONS
+
+    rules = list(RULE_CODES)
+    rule_ids = {r: i for i, r in enumerate(rules)}
+    extra = []
+    for side in ("recommended", "not_recommended"):
+        for fired in state[side].values():
+            for r in fired:
+                if r not in rule_ids:
+                    rule_ids[r] = len(rules)
+                    rules.append(r)
+                    extra.append(r)
+    width = max(1, (len(rules) + 7) // 8)
+
+    bounded = trace and isinstance(state["trace"], TraceBuffer)
+    flags = (CUSTOM_CATALOG if custom else 0) | (HAS_SCORES if scores is not None else 0) \
+        | (HAS_TRACE if trace else 0) | (BOUNDED_TRACE if bounded else 0)
+
+    out = bytearray(MAGIC)
+    out.append(flags)
+    write_varint(out, len(destinations))
+    if custom:
+        for d in destinations:
+            write_string(out, d)
+    write_varint(out, len(extra))
+    for r in extra:
+        write_string(out, r)
+    write_varint(out, width)
+
+    # Label bits per destination
+    label_bits = bytearray(len(destinations))
+    for bit, label in enumerate(LABELS):
+        last = -1
+        for d in state[label]:
+            i = position.get(d)
+            if i is None:
+                raise EncodeError(f"{label} has {d!r}, which is not in the catalog")
+            if i <= last:
+                raise EncodeError(f"{label} is not in catalog order")
+            last = i
+            label_bits[i] |= 1 << bit
+
+    # Evidence block
+    for i, d in enumerate(destinations):
+        for side in ("recommended", "not_recommended"):
+            mask = 0
+            last = -1
+            for r in state[side][d]:
+                rid = rule_ids[r]
+                if rid <= last:
+                    raise EncodeError(f"{side}[{d}] is not in rule order")
+                last = rid
+                mask |= 1 << rid
+            out += mask.to_bytes(width, "little")
+        out.append(label_bits[i])
+
+    write_varint(out, len(state["flags"]))
+    for flag in state["flags"]:
+        write_string(out, flag)
+
+    if scores is not None:
+        for d in destinations:
+            write_varint(out, zigzag(int(scores[d])))
+
+    if trace:
+        write_varint(out, len(state["trace"]))
+        for line in state["trace"]:
+            entry = parse_trace_line(line, position)
+            if entry is None:
+                write_varint(out, 0)
+                write_string(out, line)
+            else:
+                rule, dest = entry
+                write_varint(out, RULE_INDEX[rule] + 1)
+                write_varint(out, 0 if dest is None else position[dest] + 1)
+
+    if bounded:
+        buffer = state["trace"]
+        write_string(out, format_trace_policy(buffer.policy, buffer.limit))
+        write_varint(out, buffer.seen)
+        write_varint(out, len(buffer.rule_counts))
+        for rule, count in buffer.rule_counts.items():
+            write_string(out, rule)
+            write_varint(out, count)
+
+    return bytes(out)
+
+
+# ===========================
+# 4. Zero-copy decoder
+# ===========================
+
+class EvidenceView(Mapping):
+    """
+    dest -> list of rules, read from the evidence bitmasks in place.
+    """
+
+    def __init__(self, view, side):
+        self.view = view
+        self.offset = 0 if side == "recommended" else view.width
+
+    def __getitem__(self, d):
+        i = self.view.position[d]
+        view = self.view
+        start = view.evidence_at + i * view.record + self.offset
+        mask = int.from_bytes(view.buf[start:start + view.width], "little")
+        return view.rules_for(mask)
+
+    def __contains__(self, d):
+        return d in self.view.position
+
+    def __iter__(self):
+        return iter(self.view.destinations)
+
+    def __len__(self):
+        return len(self.view.destinations)
+
+
+class StateView(Mapping):
+    """
+    Read-only view over an encoded state with the same read API as the state dict.
+    Lists are decoded on access; nothing is copied up front.
+      destinations        -> catalog of the state
+      scores()            -> dest -> score, or None if not encoded
+      structured_trace()  -> list of (rule, dest or None) / raw strings, or None
+      cube()              -> travel_cube.CategoryCube (also state["cube"])
+      to_state()          -> plain state dict
+    """
+
+    def __init__(self, data):
+        buf = memoryview(data)
+        if buf.format != "B" or buf.ndim != 1:
+            buf = buf.cast("B")
+        if bytes(buf[:4]) != MAGIC:
+            raise ValueError("not an encoded travel state")
+        self.buf = buf
+        self.flags = buf[4]
+
+        count, pos = read_varint(buf, 5)
+        if self.flags & CUSTOM_CATALOG:
+            destinations = []
+            for _ in range(count):
+                name, pos = read_string(buf, pos)
+                destinations.append(name)
+        else:
+            destinations = DESTINATIONS
+        self.destinations = destinations
+        self.position = {d: i for i, d in enumerate(destinations)}
+
+        extra_count, pos = read_varint(buf, pos)
+        self.rules = list(RULE_CODES)
+        for _ in range(extra_count):
+            name, pos = read_string(buf, pos)
+            self.rules.append(name)
+
+        self.width, pos = read_varint(buf, pos)
+        self.record = 2 * self.width + 1
+        self.evidence_at = pos
+        pos += self.record * count
+
+        flag_count, pos = read_varint(buf, pos)
+        self._flags = []
+        for _ in range(flag_count):
+            flag, pos = read_string(buf, pos)
+            self._flags.append(flag)
+
+        self.scores_at = pos
+        self.trace_at = None
+        self._scores = None
+        self._trace = None
+        self._labels = {}
+        self._mask_rules = {}
+        self._cube = None
+
+    def rules_for(self, mask):
+        rules = self._mask_rules.get(mask)
+        if rules is None:
+            rules = tuple(r for bit, r in enumerate(self.rules) if mask >> bit & 1)
+            self._mask_rules[mask] = rules
+        return list(rules)
+
+    def _label(self, bit):
+        members = self._labels.get(bit)
+        if members is None:
+            # Label bytes of all destinations, read with a stride
+            start = self.evidence_at + 2 * self.width
+            column = self.buf[start:start + self.record * len(self.destinations):self.record]
+            members = tuple(self.destinations[i] for i, b in enumerate(column) if b >> bit & 1)
+            self._labels[bit] = members
+        return members
+
+    def __getitem__(self, key):
+        if key == "recommended" or key == "not_recommended":
+            return EvidenceView(self, key)
+        if key in LABELS:
+            return list(self._label(LABELS.index(key)))
+        if key == "flags":
+            return list(self._flags)
+        if key == "trace":
+            return self._decode_trace()
+        if key == "cube":
+            return self.cube()
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(VIEW_KEYS)
+
+    def __len__(self):
+        return len(VIEW_KEYS)
+
+    def _skip_scores(self):
+        pos = self.scores_at
+        if self.flags & HAS_SCORES:
+            values = []
+            for _ in self.destinations:
+                value, pos = read_varint(self.buf, pos)
+                values.append(unzigzag(value))
+            self._scores = dict(zip(self.destinations, values))
+        self.trace_at = pos
+
+    def scores(self):
+        """
+        dest -> score if scores were encoded, else None.
+        """
+        if self.trace_at is None:
+            self._skip_scores()
+        return dict(self._scores) if self._scores is not None else None
+
+    def structured_trace(self):
+        """
+        Trace as a list of (rule, dest or None) tuples, with raw strings for
+        lines that did not match a RULE_LOGIC format; None if no trace was encoded.
+        For a bounded trace these are the kept lines only.
+        """
+        if not self.flags & HAS_TRACE:
+            return None
+        return self._read_trace()[0]
+
+    def _read_trace(self):
+        if self.trace_at is None:
+            self._skip_scores()
+        buf = self.buf
+        count, pos = read_varint(buf, self.trace_at)
+        entries = []
+        for _ in range(count):
+            code, pos = read_varint(buf, pos)
+            if code == 0:
+                line, pos = read_string(buf, pos)
+                entries.append(line)
+            else:
+                dest, pos = read_varint(buf, pos)
+                entries.append((RULE_CODES[code - 1], None if dest == 0 else self.destinations[dest - 1]))
+        return entries, pos
+
+    def _decode_trace(self):
+        if self._trace is None:
+            if not self.flags & HAS_TRACE:
+                self._trace = ()
+            else:
+                entries, pos = self._read_trace()
+                lines = [e if isinstance(e, str) else format_trace_entry(*e) for e in entries]
+                if self.flags & BOUNDED_TRACE:
+                    spec, pos = read_string(self.buf, pos)
+                    seen, pos = read_varint(self.buf, pos)
+                    rule_count, pos = read_varint(self.buf, pos)
+                    rule_counts = {}
+                    for _ in range(rule_count):
+                        rule, pos = read_string(self.buf, pos)
+                        rule_counts[rule], pos = read_varint(self.buf, pos)
+                    self._trace = TraceBuffer.restore(*parse_trace_policy(spec), lines, seen, rule_counts)
+                else:
+                    # Complete traces are read under this process's retention policy
+                    trace = retain_trace(lines)
+                    self._trace = tuple(trace) if isinstance(trace, list) else trace
+        if isinstance(self._trace, TraceBuffer):
+            return self._trace.copy()
+        return list(self._trace)
+
+    def feature_matrix(self):
+        """
+        Same result as travel_core.build_feature_matrix() for this state,
+        computed with NumPy straight from the encoded evidence block.
+        """
+        count = len(self.destinations)
+        block = self._evidence_block()
+        matrix = np.zeros((count, len(SCORE_FEATURES)), dtype=np.int64)
+        for col, feature in enumerate(SCORE_FEATURES):
+            if feature == "recommended":
+                matrix[:, col] = np.unpackbits(block[:, :self.width], axis=1).sum(axis=1)
+            elif feature == "not_recommended":
+                matrix[:, col] = np.unpackbits(block[:, self.width:2 * self.width], axis=1).sum(axis=1)
+            else:
+                bit = LABELS.index(feature)
+                matrix[:, col] = (block[:, 2 * self.width] >> bit) & 1
+        return list(self.destinations), matrix
+
+    def _evidence_block(self):
+        count = len(self.destinations)
+        return np.frombuffer(self.buf, dtype=np.uint8, count=count * self.record,
+                             offset=self.evidence_at).reshape(count, self.record)
+
+    def cube(self):
+        """
+        travel_cube.CategoryCube of this state: the rule bitmasks times a
+        rule -> category matrix, without decoding any rule lists.
+        """
+        if self._cube is None:
+            block = self._evidence_block()
+            categories = rule_category_matrix(self.rules)
+            sides = []
+            for start in (0, self.width):
+                bits = np.unpackbits(block[:, start:start + self.width], axis=1, bitorder="little")
+                sides.append(bits[:, :len(self.rules)].astype(np.int64) @ categories)
+            self._cube = CategoryCube(list(self.destinations), np.stack(sides, axis=2))
+        return self._cube
+
+    def to_state(self):
+        """
+        Plain, mutable state dict (as returned by run_inference()).
+        """
+        state = {}
+        for key in STATE_KEYS:
+            value = self[key]
+            if isinstance(value, EvidenceView):
+                value = {d: value[d] for d in self.destinations}
+            state[key] = value
+        state["cube"] = self.cube()
+        return state
+
+
+def decode_state(data):
+    """
+    Zero-copy view over bytes produced by encode_state().
+    """
+    return StateView(data)
@@ -1,6 +1,17 @@
 # =============================================
 # AI - Travel Destination Planner Agent
 # =============================================
+import argparse
+import functools
+import itertools
+import json
+import os
+import sys
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D  # needed for 3D plots in some Matplotlib versions
 
@@ -12,8 +23,25 @@ from travel_info import (
     RULE_CATEGORY,
     RULE_LOGIC,
     EXPLANATIONS,
+    SCORE_FEATURES,
+    SCORE_WEIGHT_PROFILES,
+    PROFILE_OPTIONS,
+    LIKES_OPTIONS,
 )
 
+# Opt-in timing hooks for rules and pipeline stages
+from travel_instrument import instrumented, record_event, stage
+
+# Persistent result cache (used by cached_inference)
+from travel_cache import default_cache, default_kb_version
+from travel_codec import EncodeError, encode_state, decode_state
+
+# Destination × category × polarity counts, shared by scoring and plotting
+from travel_cube import CATEGORIES, build_cube, state_cube
+
+# Retention policy of the reasoning trace (full list or bounded TraceBuffer)
+from travel_trace import new_trace, trace_policy_spec, format_trace
+
 
 # ===========================
 # 2. User profile dictionary
@@ -45,7 +73,7 @@ def build_sample_user():
 # 3. Inference state dict
 # ===========================
 
-def init_state():
+def init_state(destinations=DESTINATIONS):
     state = {
         "recommended": {},
         "not_recommended": {},
@@ -56,11 +84,11 @@ def init_state():
         "weak_recommendation": [],
         "contradictions": [],
         "flags": [],
-        "trace": [],
+        "trace": new_trace(),         # list, or a bounded TraceBuffer (see travel_trace)
         "final_recommendation": [],   # new: list of final recommended destinations
     }
 
-    for d in DESTINATIONS:
+    for d in destinations:
         state["recommended"][d] = []
         state["not_recommended"][d] = []
 
@@ -122,70 +150,76 @@ from travel_plot import (
 # ===========================
 # 5. Rule implementations
 # ===========================
-def rule_budget_vs_cost(user, dest_facts, state):
+@instrumented
+def rule_budget_vs_cost(user, dest_facts, state, destinations=DESTINATIONS):
     # R1: budget(low) ∧ expensive(X) → not_recommended(X)
     if user["budget"] == "low":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["expensive"]:
                 add_not_rec(state, d, "R1_budget_low_avoid_expensive")
 
     # R2: budget(medium|high) ∧ expensive(X) → recommended(X)
     if user["budget"] == "medium" or user["budget"] == "high":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["expensive"]:
                 add_rec(state, d, "R2_budget_allows_expensive")
 
 
-def rule_food_preferences(user, dest_facts, state):
+@instrumented
+def rule_food_preferences(user, dest_facts, state, destinations=DESTINATIONS):
     # R3: loves_local_cuisine ∧ good_local_cuisine(X) → recommended(X)
     if user["food_preference"] == "LovesLocalCuisine":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["good_local_cuisine"]:
                 add_rec(state, d, "R3_food_local_cuisine")
 
 
-def rule_activity_preferences(user, dest_facts, state):
+@instrumented
+def rule_activity_preferences(user, dest_facts, state, destinations=DESTINATIONS):
     likes = user["likes"]
 
     # R4: likes(culture_history) ∧ good_for_culture_history(X) → recommended(X)
     if "culture_history" in likes:
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["good_for_culture_history"]:
                 add_rec(state, d, "R4_culture_history")
 
     # R5: likes(adventure) ∧ good_for_adventure(X) → recommended(X)
     if "adventure" in likes:
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["good_for_adventure"]:
                 add_rec(state, d, "R5_adventure")
 
     # R6: likes(shopping) ∧ good_for_shopping(X) → recommended(X)
     if "shopping" in likes:
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["good_for_shopping"]:
                 add_rec(state, d, "R6_shopping")
 
     # R7: likes(nature_scenery) ∧ good_for_nature_scenery(X) → recommended(X)
     if "nature_scenery" in likes:
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["good_for_nature_scenery"]:
                 add_rec(state, d, "R7_nature")
 
     # R8: likes(city_life) ∧ good_for_city_life(X) → recommended(X)
     if "city_life" in likes:
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["good_for_city_life"]:
                 add_rec(state, d, "R8_city_life")
 
 
-def rule_season_matching(user, dest_facts, state):
+@instrumented
+def rule_season_matching(user, dest_facts, state, destinations=DESTINATIONS):
     best_season = dest_facts["best_season"]
     pref = user["prefers_season"]
 
     # R9: prefers_season(S) ∧ best_season(X,S) → season_matched(X)
-    for d in DESTINATIONS:
+    matched = set(state["season_matched"])
+    for d in destinations:
         if d in best_season and pref in best_season[d]:
-            if d not in state["season_matched"]:
+            if d not in matched:
+                matched.add(d)
                 state["season_matched"].append(d)
                 logic = RULE_LOGIC.get("R9_season_match", "")
                 if logic != "":
@@ -195,9 +229,11 @@ def rule_season_matching(user, dest_facts, state):
                 state["trace"].append(msg)
 
     # R10: prefers_season(S) ∧ ¬best_season(X,S) but X has some best season → weak_recommendation(X)
-    for d in DESTINATIONS:
+    weak = set(state["weak_recommendation"])
+    for d in destinations:
         if d in best_season:
-            if pref not in best_season[d] and d not in state["weak_recommendation"]:
+            if pref not in best_season[d] and d not in weak:
+                weak.add(d)
                 state["weak_recommendation"].append(d)
                 logic = RULE_LOGIC.get("R10_season_weak", "")
                 if logic != "":
@@ -207,47 +243,49 @@ def rule_season_matching(user, dest_facts, state):
                 state["trace"].append(msg)
 
 
-def rule_traffic_and_transport(user, dest_facts, state):
+@instrumented
+def rule_traffic_and_transport(user, dest_facts, state, destinations=DESTINATIONS):
     traffic_pref = user["traffic_preference"]
     transport = user["transport"]
 
     # R11: prefers_low_traffic ∧ high_traffic_peak(X) → not_recommended(X)
     if traffic_pref == "low_traffic":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["high_traffic_peak"]:
                 add_not_rec(state, d, "R11_low_traffic_avoid_high")
 
     # R12: prefers_high_traffic ∧ high_traffic_peak(X) → recommended(X)
     if traffic_pref == "high_traffic":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["high_traffic_peak"]:
                 add_rec(state, d, "R12_high_traffic_ok")
 
     # R13: prefers public transport & excellent_public_transport(X) → recommended(X)
     if transport == "public_transport":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["excellent_public_transport"]:
                 add_rec(state, d, "R13_public_transport")
 
     # R14: prefers walking & high_traffic_peak(X) → not_recommended(X)
     if transport == "walking":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["high_traffic_peak"]:
                 add_not_rec(state, d, "R14_walking_avoid_high_traffic")
 
 
-def rule_safety(user, dest_facts, state):
+@instrumented
+def rule_safety(user, dest_facts, state, destinations=DESTINATIONS):
     safety = user["safety_priority"]
 
     # R15: high_safety ∧ mid_safety(X) → not_recommended(X)
     if safety == "HighSafety":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["mid_safety"]:
                 add_not_rec(state, d, "R15_high_safety_avoid_mid")
 
     # R16: high_safety ∧ very_safe_destination(X) → recommended(X)
     if safety == "HighSafety":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["very_safe_destination"]:
                 add_rec(state, d, "R16_high_safety_prefers_very_safe")
 
@@ -262,27 +300,33 @@ def rule_safety(user, dest_facts, state):
         state["trace"].append(msg)
 
 
-def rule_companions(user, dest_facts, state):
+@instrumented
+def rule_companions(user, dest_facts, state, destinations=DESTINATIONS):
     companions = user["companions"]
 
     # R18: family ∧ good_for_adventure(X) ∧ high_traffic_peak(X) → not_recommended(X)
     if companions == "family":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["good_for_adventure"] and d in dest_facts["high_traffic_peak"]:
                 add_not_rec(state, d, "R18_family_avoid_risky_adventure_city")
 
     # R19: solo ∧ good_for_city_life(X) → recommended(X)
     if companions == "solo":
-        for d in DESTINATIONS:
+        for d in destinations:
             if d in dest_facts["good_for_city_life"]:
                 add_rec(state, d, "R19_solo_city_life")
 
 
-def rule_strong_recommendations(state):
+@instrumented
+def rule_strong_recommendations(state, destinations=DESTINATIONS):
     # R20: recommended(X) ∧ season_matched(X) → strongly_recommended(X)
-    for d in DESTINATIONS:
-        if len(state["recommended"][d]) > 0 and d in state["season_matched"]:
-            if d not in state["strongly_recommended"]:
+    # (label lists are mirrored in sets so large catalogs stay linear)
+    matched = set(state["season_matched"])
+    strong = set(state["strongly_recommended"])
+    for d in destinations:
+        if len(state["recommended"][d]) > 0 and d in matched:
+            if d not in strong:
+                strong.add(d)
                 state["strongly_recommended"].append(d)
                 logic = RULE_LOGIC.get("R20_strong_recommendation", "")
                 if logic != "":
@@ -292,9 +336,12 @@ def rule_strong_recommendations(state):
                 state["trace"].append(msg)
 
     # R21: not_recommended(X) ∧ weak_recommendation(X) → strongly_not_recommended(X)
-    for d in DESTINATIONS:
-        if len(state["not_recommended"][d]) > 0 and d in state["weak_recommendation"]:
-            if d not in state["strongly_not_recommended"]:
+    weak = set(state["weak_recommendation"])
+    strong_not = set(state["strongly_not_recommended"])
+    for d in destinations:
+        if len(state["not_recommended"][d]) > 0 and d in weak:
+            if d not in strong_not:
+                strong_not.add(d)
                 state["strongly_not_recommended"].append(d)
                 logic = RULE_LOGIC.get("R21_strong_not_recommendation", "")
                 if logic != "":
@@ -304,11 +351,14 @@ def rule_strong_recommendations(state):
                 state["trace"].append(msg)
 
 
-def rule_contradictions(state):
+@instrumented
+def rule_contradictions(state, destinations=DESTINATIONS):
     # R22: recommended(X) ∧ not_recommended(X) → contradiction(X)
-    for d in DESTINATIONS:
+    contradictions = set(state["contradictions"])
+    for d in destinations:
         if len(state["recommended"][d]) > 0 and len(state["not_recommended"][d]) > 0:
-            if d not in state["contradictions"]:
+            if d not in contradictions:
+                contradictions.add(d)
                 state["contradictions"].append(d)
                 logic = RULE_LOGIC.get("R22_contradiction_detection", "")
                 if logic != "":
@@ -328,11 +378,14 @@ def rule_contradictions(state):
         state["trace"].append(msg)
 
 
-def rule_neutral_and_final(state):
+@instrumented
+def rule_neutral_and_final(state, destinations=DESTINATIONS):
     # R24: ¬recommended(X) ∧ ¬not_recommended(X) → neutral(X)
-    for d in DESTINATIONS:
+    neutral = set(state["neutral"])
+    for d in destinations:
         if len(state["recommended"][d]) == 0 and len(state["not_recommended"][d]) == 0:
-            if d not in state["neutral"]:
+            if d not in neutral:
+                neutral.add(d)
                 state["neutral"].append(d)
                 logic = RULE_LOGIC.get("R24_neutral_default", "")
                 if logic != "":
@@ -342,8 +395,10 @@ def rule_neutral_and_final(state):
                 state["trace"].append(msg)
 
     # R25: strongly_recommended(X) → final_recommendation(X)
+    final = set(state["final_recommendation"])
     for d in state["strongly_recommended"]:
-        if d not in state["final_recommendation"]:
+        if d not in final:
+            final.add(d)
             state["final_recommendation"].append(d)
 
         logic = RULE_LOGIC.get("R25_final_recommendation", "")
@@ -371,11 +426,9 @@ def visualize_statistics(state, scores):
     # -----------------------------
     # 2) Positive / Negative Evidence
     # -----------------------------
-    pos_counts = []
-    neg_counts = []
-    for d in destinations:
-        pos_counts.append(len(state["recommended"][d]))
-        neg_counts.append(len(state["not_recommended"][d]))
+    cube = state_cube(state)
+    pos_counts = cube.positives().tolist()
+    neg_counts = cube.negatives().tolist()
 
     # -----------------------------
     # 3) Rule Firing Frequency
@@ -463,19 +516,17 @@ def visualize_statistics_3d(state, scores):
     # ----------------------------------
     # Common data: positives / negatives / scores
     # ----------------------------------
-    pos_counts = []
-    neg_counts = []
+    # Every count below is a slice of the destination × category × polarity cube
+    cube = state_cube(state)
+    pos_counts = cube.positives().tolist()
+    neg_counts = cube.negatives().tolist()
     score_values = []
 
     for d in destinations:
-        pos_counts.append(len(state["recommended"][d]))
-        neg_counts.append(len(state["not_recommended"][d]))
         score_values.append(scores[d])
 
     dest_indices = range(len(destinations))
-
-    # Destination-category matrices
-    categories, pos_matrix, neg_matrix = compute_dest_category_matrices(state)
+    categories = CATEGORIES
     cat_indices = range(len(categories))
 
     # ----------------------------------
@@ -509,16 +560,11 @@ def visualize_statistics_3d(state, scores):
     # ==================================
     ax2 = fig.add_subplot(1, 3, 2, projection='3d')
 
-    heat_x = []   # destination index
-    heat_y = []   # category index
-    heat_z = []   # total intensity (pos + neg)
-
-    for i, d in enumerate(destinations):
-        for j, c in enumerate(categories):
-            total = pos_matrix[d].get(c, 0) + neg_matrix[d].get(c, 0)
-            heat_x.append(i)
-            heat_y.append(j)
-            heat_z.append(total)
+    # One point per (destination, category) cell of the cube
+    grid_x, grid_y = np.meshgrid(list(dest_indices), list(cat_indices), indexing="ij")
+    heat_x = grid_x.ravel()
+    heat_y = grid_y.ravel()
+    heat_z = cube.intensity().ravel()
 
     ax2.scatter(heat_x, heat_y, heat_z)
     ax2.set_title("3D Heat Cube: Dest × Category × Intensity")
@@ -538,35 +584,17 @@ def visualize_statistics_3d(state, scores):
     # ==================================
     ax3 = fig.add_subplot(1, 3, 3, projection='3d')
 
-    bar_x = []
-    bar_y = []
-    bar_z = []
-    bar_dx = []
-    bar_dy = []
-    bar_dz = []
-
     width_x = 0.4
     width_y = 0.4
 
-    for i, d in enumerate(destinations):
-        for j, c in enumerate(categories):
-            pos_val = pos_matrix[d].get(c, 0)
-            neg_val = neg_matrix[d].get(c, 0)
-            net = pos_val - neg_val  # net "vote" of that category
-
-            if net >= 0:
-                z_base = 0
-                dz = net
-            else:
-                z_base = net
-                dz = -net
-
-            bar_x.append(i - width_x / 2.0)
-            bar_y.append(j - width_y / 2.0)
-            bar_z.append(z_base)
-            bar_dx.append(width_x)
-            bar_dy.append(width_y)
-            bar_dz.append(dz)
+    # Bars grow up from 0 for a positive net "vote", down from 0 for a negative one
+    net = cube.net().ravel()
+    bar_x = grid_x.ravel() - width_x / 2.0
+    bar_y = grid_y.ravel() - width_y / 2.0
+    bar_z = np.minimum(net, 0)
+    bar_dx = np.full(net.shape, width_x)
+    bar_dy = np.full(net.shape, width_y)
+    bar_dz = np.abs(net)
 
     ax3.bar3d(bar_x, bar_y, bar_z, bar_dx, bar_dy, bar_dz)
     ax3.set_title("3D Bar Landscape: Category Contribution Terrain")
@@ -589,103 +617,323 @@ def visualize_statistics_3d(state, scores):
 # 7. Run inference
 # ===========================
 
-def run_inference(user, dest_facts):
-    state = init_state()
+@instrumented
+def run_inference(user, dest_facts, destinations=DESTINATIONS):
+    state = init_state(destinations)
 
     # Base rules
-    rule_budget_vs_cost(user, dest_facts, state)
-    rule_food_preferences(user, dest_facts, state)
-    rule_activity_preferences(user, dest_facts, state)
-    rule_season_matching(user, dest_facts, state)
-    rule_traffic_and_transport(user, dest_facts, state)
-    rule_safety(user, dest_facts, state)
-    rule_companions(user, dest_facts, state)
+    rule_budget_vs_cost(user, dest_facts, state, destinations)
+    rule_food_preferences(user, dest_facts, state, destinations)
+    rule_activity_preferences(user, dest_facts, state, destinations)
+    rule_season_matching(user, dest_facts, state, destinations)
+    rule_traffic_and_transport(user, dest_facts, state, destinations)
+    rule_safety(user, dest_facts, state, destinations)
+    rule_companions(user, dest_facts, state, destinations)
 
     # Higher-level rules
-    rule_strong_recommendations(state)
-    rule_contradictions(state)
-    rule_neutral_and_final(state)
+    rule_strong_recommendations(state, destinations)
+    rule_contradictions(state, destinations)
+    rule_neutral_and_final(state, destinations)
+
+    # Count the evidence once; scores and charts slice this cube
+    state["cube"] = build_cube(state)
 
     return state
 
 
 
-def compute_scores(state):
-    scores = {}
-    for d in DESTINATIONS:
-        score = 0
+def build_feature_matrix(state):
+    """
+    Count the scoring features of every destination.
+    Returns (destinations, matrix) where matrix is a destination × feature
+    NumPy array with columns in SCORE_FEATURES order.
+    """
+    # Encoded states (travel_codec.StateView) count straight from their bitmasks
+    if hasattr(state, "feature_matrix"):
+        return state.feature_matrix()
+
+    # Evidence columns are slices of the cube, labels are set per destination
+    cube = state_cube(state)
+    destinations = list(cube.destinations)
+    index = {d: i for i, d in enumerate(destinations)}
+    matrix = np.zeros((len(destinations), len(SCORE_FEATURES)), dtype=np.int64)
+
+    for col, feature in enumerate(SCORE_FEATURES):
+        if feature == "recommended":
+            matrix[:, col] = cube.positives()
+        elif feature == "not_recommended":
+            matrix[:, col] = cube.negatives()
+        else:
+            # Label: 1 if the destination carries it
+            for d in state[feature]:
+                matrix[index[d], col] = 1
 
-        # +2 per positive rule
-        score += 2 * len(state["recommended"][d])
+    return destinations, matrix
 
-        # -2 per negative rule
-        score -= 2 * len(state["not_recommended"][d])
 
-        # Season influence
-        if d in state["season_matched"]:
-            score += 1
-        if d in state["weak_recommendation"]:
-            score -= 1
+def weight_vector(weights):
+    """
+    Turn a weight profile (name from SCORE_WEIGHT_PROFILES, or a
+    feature -> weight dict) into a vector aligned with SCORE_FEATURES.
+    """
+    if isinstance(weights, str):
+        weights = SCORE_WEIGHT_PROFILES[weights]
+    return np.array([weights.get(feature, 0) for feature in SCORE_FEATURES])
 
-        # Strong labels
-        if d in state["strongly_recommended"]:
-            score += 3
-        if d in state["strongly_not_recommended"]:
-            score -= 3
 
-        scores[d] = score
+def score_weight_profiles(state, profiles=None):
+    """
+    Score one inference result under many weight profiles at once:
+    the feature matrix is multiplied by a feature × profile weight matrix
+    in a single matrix product.
+
+    profiles -> list of profile names / weight dicts, or a dict
+                name -> profile (default: all SCORE_WEIGHT_PROFILES)
+    Returns a dict: profile name -> {dest: score}
+    """
+    if profiles is None:
+        profiles = SCORE_WEIGHT_PROFILES
+    if isinstance(profiles, dict):
+        names = list(profiles)
+        vectors = [weight_vector(profiles[name]) for name in names]
+    else:
+        names = [p if isinstance(p, str) else str(i) for i, p in enumerate(profiles)]
+        vectors = [weight_vector(p) for p in profiles]
+
+    destinations, features = build_feature_matrix(state)
+    weights = np.column_stack(vectors)
+    totals = features @ weights
+
+    results = {}
+    for col, name in enumerate(names):
+        results[name] = dict(zip(destinations, totals[:, col].tolist()))
+    return results
+
+
+@instrumented
+def compute_scores(state, weights="default"):
+    """
+    Score every destination: destination × feature counts times a weight
+    vector (see SCORE_FEATURES / SCORE_WEIGHT_PROFILES in travel_info).
+    weights -> profile name or feature -> weight dict
+    Returns a dict: dest -> score
+    """
+    destinations, features = build_feature_matrix(state)
+    totals = features @ weight_vector(weights)
+    return dict(zip(destinations, totals.tolist()))
+
+
+def top_k_indices(values, k):
+    """
+    Indices of the k largest entries of a 1-D NumPy array, best first.
+    Ties are broken by the lower index (catalog order).
+    Uses np.partition (O(n)) and only sorts the k selected entries.
+    """
+    n = len(values)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= n:
+        return np.lexsort((np.arange(n), -values))
+
+    # Value of the k-th best entry; everything above it is in, and ties at
+    # that value are filled in catalog order
+    kth = np.partition(values, n - k)[n - k]
+    above = np.flatnonzero(values > kth)
+    ties = np.flatnonzero(values == kth)[: k - len(above)]
+    selected = np.concatenate([above, ties])
+
+    order = np.lexsort((selected, -values[selected]))
+    return selected[order]
+
+
+def _score_array(scores, destinations):
+    # (destinations, score array) in catalog order
+    if destinations is None:
+        destinations = list(scores)
+        values = np.fromiter(scores.values(), dtype=float, count=len(destinations))
+    else:
+        values = np.fromiter((scores[d] for d in destinations), dtype=float, count=len(destinations))
+    return destinations, values
+
+
+def rank_destinations(scores, k=None, destinations=None):
+    """
+    Return destinations ordered by score (best first).
+    Ties keep catalog order, exactly like
+    sorted(destinations, key=scores.get, reverse=True).
+
+    k            -> only return the top-k, found by partial selection
+                    instead of sorting everything
+    destinations -> candidates in catalog order (default: keys of scores)
+    """
+    destinations, values = _score_array(scores, destinations)
+    if k is None:
+        k = len(destinations)
+
+    return [destinations[i] for i in top_k_indices(values, k)]
+
+
+def iter_ranked(scores, page_size=10, destinations=None):
+    """
+    Stream the ranking page by page (each page is a list of destinations).
+    Every page is one partial selection over the catalog, so serving the
+    first pages never pays for a full sort.
+    Same ordering and tie-breaking as rank_destinations().
+    Raises ValueError for a page_size below 1 (checked on the call, not on
+    the first page).
+    """
+    if isinstance(page_size, bool) or not isinstance(page_size, int) or page_size < 1:
+        raise ValueError(f"invalid page_size: {page_size!r} (expected a positive integer)")
+    destinations, values = _score_array(scores, destinations)
+    return _ranked_pages(destinations, values, page_size)
+
+
+def _ranked_pages(destinations, values, page_size):
+    n = len(values)
+    served = 0
+
+    while served < n:
+        end = served + page_size
+        if end >= n // 2:
+            # Past the middle one full sort is cheaper than repeated selections
+            rest = top_k_indices(values, n)[served:]
+            for start in range(0, len(rest), page_size):
+                yield [destinations[i] for i in rest[start:start + page_size]]
+            return
+        yield [destinations[i] for i in top_k_indices(values, end)[served:]]
+        served = end
+
+
+# Explanations for labels that are not tied to a single evidence rule.
+# label -> (side, text); applied after the rule explanations, in this order.
+LABEL_EXPLANATIONS = {
+    "season_matched": ("positives", "The timing of your trip matches one of the best seasons to visit."),
+    "weak_recommendation": ("negatives", "This destination is not at its peak in your preferred season."),
+    "strongly_recommended": ("positives", "Overall fit is strong based on your preferences."),
+    "strongly_not_recommended": ("negatives", "Overall, it is strongly discouraged for this specific trip profile."),
+}
+
+
+def explanation_signature(state, d, label_sets=None):
+    """
+    Describe everything that decides the explanation of a destination:
+    (positive rules, negative rules, labels the destination carries).
+    Destinations with the same fired rules share one signature.
+    label_sets (label -> set of destinations) avoids list scans when
+    many destinations of the same state are explained.
+    """
+    labels = []
+    for label in LABEL_EXPLANATIONS:
+        if label_sets is not None:
+            has_label = d in label_sets[label]
+        else:
+            has_label = d in state[label]
+        if has_label:
+            labels.append(label)
+
+    return (
+        tuple(state["recommended"][d]),
+        tuple(state["not_recommended"][d]),
+        tuple(labels),
+    )
 
-    return scores
 
+@functools.lru_cache(maxsize=4096)
+def explain_signature(signature, explanations=None):
+    """
+    Build (positives, negatives) tuples for a fired-rule signature.
+    explanations (rule -> text) defaults to EXPLANATIONS; other tables must be
+    hashable, e.g. KBSnapshot.explanations.
+    Memoized, so each distinct signature is only turned into text once.
+    """
+    rec_rules, not_rec_rules, labels = signature
+    if explanations is None:
+        explanations = EXPLANATIONS
+
+    # dict.fromkeys keeps the first occurrence and drops duplicates
+    positives = dict.fromkeys(explanations[r] for r in rec_rules if r in explanations)
+    negatives = dict.fromkeys(explanations[r] for r in not_rec_rules if r in explanations)
+
+    for label in labels:
+        side, text = LABEL_EXPLANATIONS[label]
+        if side == "positives":
+            positives.setdefault(text)
+        else:
+            negatives.setdefault(text)
+
+    return tuple(positives), tuple(negatives)
+
+
+@instrumented
+def explain_destination(state, d, label_sets=None, explanations=None):
+    """
+    Build user-friendly explanation lists for a single destination.
+    Returns a dict: {"positives": [...], "negatives": [...]}
+    """
+    positives, negatives = explain_signature(explanation_signature(state, d, label_sets), explanations)
+    return {
+        "positives": list(positives),
+        "negatives": list(negatives),
+    }
+
+
+class LazyExplanations(Mapping):
+    """
+    Read-only mapping dest -> {"positives": [...], "negatives": [...]}
+    that explains a destination the first time it is looked up.
+    Drop-in for the dict returned by build_explanations() when only a
+    few destinations (e.g. the top of the ranking) are displayed.
+    explanations: rule -> text table (default EXPLANATIONS, see explain_signature()).
+    """
+
+    def __init__(self, state, explanations=None):
+        self.state = state
+        self.explanations = explanations
+        self.label_sets = {label: set(state[label]) for label in LABEL_EXPLANATIONS}
+        self.cache = {}
+
+    def __getitem__(self, d):
+        explanation = self.cache.get(d)
+        if explanation is None:
+            if d not in self.state["recommended"]:
+                raise KeyError(d)
+            explanation = explain_destination(self.state, d, self.label_sets, self.explanations)
+            self.cache[d] = explanation
+        return explanation
+
+    def __iter__(self):
+        return iter(self.state["recommended"])
+
+    def __len__(self):
+        return len(self.state["recommended"])
+
+
+@instrumented
 def build_explanations(state):
     """
     Build user-friendly explanation lists for each destination.
     Returns a dict: dest -> {"positives": [...], "negatives": [...]}
+    Use LazyExplanations(state) to only pay for destinations that are shown.
     """
+    label_sets = {label: set(state[label]) for label in LABEL_EXPLANATIONS}
     explanations = {}
-    for d in DESTINATIONS:
-        explanations[d] = {
-            "positives": [],
-            "negatives": [],
-        }
-
-        # From recommended rules
-        for rule_name in state["recommended"][d]:
-            if rule_name in EXPLANATIONS:
-                if EXPLANATIONS[rule_name] not in explanations[d]["positives"]:
-                    explanations[d]["positives"].append(EXPLANATIONS[rule_name])
-
-        # From not_recommended rules
-        for rule_name in state["not_recommended"][d]:
-            if rule_name in EXPLANATIONS:
-                if EXPLANATIONS[rule_name] not in explanations[d]["negatives"]:
-                    explanations[d]["negatives"].append(EXPLANATIONS[rule_name])
-
-        # Season matched
-        if d in state["season_matched"]:
-            text = "The timing of your trip matches one of the best seasons to visit."
-            if text not in explanations[d]["positives"]:
-                explanations[d]["positives"].append(text)
-
-        # Weak season
-        if d in state["weak_recommendation"]:
-            text = "This destination is not at its peak in your preferred season."
-            if text not in explanations[d]["negatives"]:
-                explanations[d]["negatives"].append(text)
-
-        # Strong labels
-        if d in state["strongly_recommended"]:
-            text = "Overall fit is strong based on your preferences."
-            if text not in explanations[d]["positives"]:
-                explanations[d]["positives"].append(text)
-
-        if d in state["strongly_not_recommended"]:
-            text = "Overall, it is strongly discouraged for this specific trip profile."
-            if text not in explanations[d]["negatives"]:
-                explanations[d]["negatives"].append(text)
+    for d in state["recommended"]:
+        explanations[d] = explain_destination(state, d, label_sets)
 
     return explanations
 
+
+@instrumented
+def lookup_tips(destinations, tips=None):
+    """
+    Travel tips for the given destinations: dict dest -> list of tips
+    (empty for destinations without stored tips).
+    tips defaults to shared_tips(): TRAVEL_TIPS, or the shared KB in pool workers.
+    """
+    if tips is None:
+        tips = shared_tips()
+    return {d: list(tips.get(d, [])) for d in destinations}
+
 # ===========================
 # CLI helper functions
 # ===========================
@@ -833,10 +1081,491 @@ def build_user_from_cli():
     print("\nThank you! Running the reasoning engine based on your answers...\n")
     return user
 
+# ===========================
+# Batch mode (JSON Lines)
+# ===========================
+# One JSON profile per input line, one JSON result per output line, in input order:
+#   {"id": "a1", "budget": "low", "likes": ["nature_scenery"], ...}
+#   -> {"line": 1, "id": "a1", "ranking": [{"destination": ..., "score": ...}, ...],
+#       "final_recommendation": [...], "flags": [...], "explanations": {...}}
+# Lines that cannot be evaluated produce {"line": n, "error": "..."} instead.
+
+@instrumented
+def normalize_user(raw):
+    """
+    Turn a JSON profile into a user dict like build_sample_user().
+    Missing fields take the sample user's value; unknown values raise ValueError.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("profile must be a JSON object")
+
+    user = build_sample_user()
+    for field, options in PROFILE_OPTIONS.items():
+        if field in raw:
+            if raw[field] not in options:
+                raise ValueError(f"invalid {field}: {raw[field]!r}")
+            user[field] = raw[field]
+
+    if "likes" in raw:
+        likes = raw["likes"]
+        if not isinstance(likes, list):
+            raise ValueError("likes must be a list")
+        for like in likes:
+            if like not in LIKES_OPTIONS:
+                raise ValueError(f"invalid like: {like!r}")
+        user["likes"] = list(dict.fromkeys(likes))
+
+    return user
+
+
+def canonical_profile(user):
+    """
+    Hashable key for a user profile: two profiles with the same key get the
+    same inference result (the order of "likes" does not matter to any rule).
+    """
+    fields = tuple((field, user.get(field)) for field in PROFILE_OPTIONS)
+    likes = tuple(like for like in LIKES_OPTIONS if like in user.get("likes", []))
+    return fields + (("likes", likes),)
+
+
+# Destination facts of the current process, built on first use
+_BATCH_FACTS = []
+
+
+def shared_dest_facts():
+    """
+    Destination facts built once per process (for batch / service workers).
+    """
+    if len(_BATCH_FACTS) == 0:
+        _BATCH_FACTS.append(build_destination_facts())
+    return _BATCH_FACTS[0]
+
+
+def use_shared_dest_facts(dest_facts):
+    """
+    Make shared_dest_facts() return dest_facts in this process,
+    e.g. the read-only view of a shared-memory KB (see travel_kb.init_worker).
+    """
+    _BATCH_FACTS[:] = [dest_facts]
+
+
+_SHARED_TIPS = []
+
+
+def shared_tips():
+    """
+    Travel tips of this process: TRAVEL_TIPS unless use_shared_tips() was called.
+    """
+    return _SHARED_TIPS[0] if _SHARED_TIPS else TRAVEL_TIPS
+
+
+def use_shared_tips(tips):
+    """
+    Make lookup_tips() read tips (e.g. travel_kb.TipsView over shared memory) in this process.
+    """
+    _SHARED_TIPS[:] = [tips]
+
+
+def profile_key(user):
+    """
+    String key of a user profile for the persistent result cache.
+    """
+    return json.dumps(canonical_profile(user), separators=(",", ":"))
+
+
+@instrumented
+def cached_inference(user, dest_facts=None, destinations=DESTINATIONS, version=None, cache=None):
+    """
+    run_inference() through the persistent result cache (travel_cache).
+
+    With dest_facts=None the built-in knowledge base is used and its version is
+    known; for other facts pass version (e.g. KBSnapshot.digest), otherwise
+    the cache is bypassed. cache defaults to travel_cache.default_cache().
+
+    States are stored in the travel_codec binary format; a cache hit returns
+    a read-only StateView over the stored bytes.
+    """
+    if dest_facts is None:
+        dest_facts = shared_dest_facts()
+        if version is None and destinations is DESTINATIONS:
+            version = default_kb_version()
+    if cache is None:
+        cache = default_cache()
+    if cache is None or version is None:
+        return run_inference(user, dest_facts, destinations)
+    # States with a bounded trace are cached apart from complete ones
+    policy = trace_policy_spec()
+    if policy != "full":
+        version = f"{version}+trace={policy}"
+
+    key = profile_key(user)
+    blob = cache.get_blob(version, key)
+    if blob is not None:
+        try:
+            state = decode_state(blob)
+            record_event("cache_hit")
+            return state
+        except ValueError:
+            pass    # written by an older format: recompute and replace
+    record_event("cache_miss")
+    state = run_inference(user, dest_facts, destinations)
+    try:
+        blob = encode_state(state)
+    except EncodeError:
+        return state    # not cacheable; the result itself is fine
+    cache.put_blob(version, key, blob)
+    return state
+
+
+def evaluate_profile(user, dest_facts=None, explain=False, top=None, destinations=DESTINATIONS, version=None):
+    """
+    Run inference and scoring for one user and return a JSON-ready dict:
+      "ranking"              -> [{"destination", "score"}, ...] best first (top entries only if top is given)
+      "final_recommendation" -> strongly recommended destinations
+      "flags"                -> global flags
+      "explanations"         -> dest -> {"positives", "negatives"} for the ranked destinations (if explain)
+    Inference results are cached on disk (see cached_inference()).
+    """
+    state = cached_inference(user, dest_facts, destinations, version)
+    return summarize_state(state, explain, top)
+
+
+def summarize_state(state, explain=False, top=None, explanations=None):
+    """
+    The evaluate_profile() result dict for an inference state.
+    explanations: rule -> text table for the explanations (default EXPLANATIONS).
+    """
+    scores = compute_scores(state)
+    ranked = rank_destinations(scores, k=top)
+
+    result = {
+        "ranking": [{"destination": d, "score": scores[d]} for d in ranked],
+        "final_recommendation": list(state["final_recommendation"]),
+        "flags": list(state["flags"]),
+    }
+    if explain:
+        explained = LazyExplanations(state, explanations)
+        result["explanations"] = {d: explained[d] for d in ranked}
+    return result
+
+
+def evaluate_lines(lines, explain=False, top=None, index=False):
+    """
+    Evaluate a chunk of (line number, JSON text) pairs.
+    Returns the output lines (JSON text) in the same order; with index=True,
+    (output lines, travel_query.BitmapIndex of the chunk keyed by line number).
+    """
+    out = []
+    builder = None
+    if index:
+        from travel_query import IndexBuilder
+        builder = IndexBuilder("batch", lines[0][0] if lines else 0)
+    for number, text in lines:
+        result = {"line": number}
+        try:
+            raw = json.loads(text)
+            if isinstance(raw, dict) and "id" in raw:
+                result["id"] = raw["id"]
+            user = normalize_user(raw)
+            state = cached_inference(user)
+            result.update(summarize_state(state, explain=explain, top=top))
+            if builder is not None:
+                builder.add(number, user, state)
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            result["error"] = str(e)
+        with stage("render"):
+            out.append(json.dumps(result))
+    if builder is not None:
+        return out, builder.build()
+    return out
+
+
+def map_ordered(fn, items, pool=None, max_in_flight=8):
+    """
+    Like map(fn, items), but runs on a concurrent.futures pool with at most
+    max_in_flight calls submitted ahead of the result being consumed.
+    Results are yielded in input order. Without a pool, runs in this process.
+    """
+    if pool is None:
+        for item in items:
+            yield fn(item)
+        return
+
+    pending = deque()
+    for item in items:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(pool.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+def read_chunks(infile, chunk_size):
+    """
+    Yield lists of (line number, text) for the non-blank lines of infile.
+    """
+    chunk = []
+    for number, text in enumerate(infile, start=1):
+        if text.strip() == "":
+            continue
+        chunk.append((number, text))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(infile, outfile, workers=1, explain=False, top=None, chunk_size=64, max_in_flight=None,
+              index=None, metrics=None):
+    """
+    Read JSONL profiles from infile and write JSONL results to outfile in input order.
+    Lines are processed in chunks of chunk_size; with workers > 1 the chunks run on a
+    process pool with a bounded number in flight, so memory does not grow with the input.
+    index (optional travel_query.BitmapIndex) receives the outcomes, keyed by line number.
+    metrics (optional travel_metrics.Metrics) receives the counters and stage latencies.
+    Returns the number of profiles processed.
+    """
+    chunks = read_chunks(infile, chunk_size)
+    work = functools.partial(evaluate_lines, explain=explain, top=top, index=index is not None)
+    if metrics is not None:
+        # Each chunk is measured where it runs; the counts travel back with the results
+        from travel_metrics import call_with_metrics
+        work = functools.partial(call_with_metrics, work)
+    count = 0
+
+    def write(out):
+        nonlocal count
+        if metrics is not None:
+            out, snapshot = out
+            metrics.merge(snapshot)
+        if index is not None:
+            out, part = out
+            index.update(part)
+        outfile.write("\n".join(out) + "\n")
+        count += len(out)
+
+    if workers <= 1:
+        for out in map_ordered(work, chunks):
+            write(out)
+        return count
+
+    if max_in_flight is None:
+        max_in_flight = workers * 2
+    # Workers attach to one shared copy of the knowledge base
+    from travel_kb import SharedKB, init_worker
+    with SharedKB() as kb:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(kb.name,)) as pool:
+            for out in map_ordered(work, chunks, pool, max_in_flight):
+                write(out)
+    return count
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AI Travel Destination Planner")
+    parser.add_argument("--batch", metavar="FILE", help="evaluate JSONL profiles from FILE ('-' for stdin) instead of opening the GUI")
+    parser.add_argument("--output", metavar="FILE", default="-", help="JSONL output file for --batch (default: stdout)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for --batch")
+    parser.add_argument("--top", type=int, default=None, help="only output the N best destinations per profile")
+    parser.add_argument("--explain", action="store_true", help="include explanations in --batch output")
+    parser.add_argument("--index", metavar="FILE", default=None, help="also save a bitmap index of the --batch outcomes (see travel_query.py)")
+    parser.add_argument("--metrics", metavar="FILE", default=None, help="also write Prometheus metrics of the --batch run (see travel_metrics.py)")
+    parser.add_argument("--explain-profile", metavar="JSON", default=None,
+                        help="print the ranking, explanations, tips and reasoning trace for one JSON profile ('-' for stdin)")
+    # --profile PREFIX runs the GUI session or --batch run under a profiler (see travel_profile.py)
+    from travel_profile import add_profile_args
+    add_profile_args(parser)
+    # --trace-retention ring:200 bounds the reasoning trace per request (see travel_trace.py)
+    from travel_trace import add_trace_args
+    add_trace_args(parser)
+    return parser.parse_args(argv)
+
+
+def main_batch(args):
+    infile = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    index = None
+    if args.index is not None:
+        from travel_query import BitmapIndex
+        index = BitmapIndex("batch")
+    metrics = None
+    if args.metrics is not None:
+        from travel_metrics import Metrics
+        metrics = Metrics()
+    try:
+        run_batch(infile, outfile, workers=args.workers, explain=args.explain, top=args.top, index=index,
+                  metrics=metrics)
+        if index is not None:
+            index.save(args.index)
+        if metrics is not None:
+            from travel_metrics import write_metrics
+            write_metrics(args.metrics, metrics)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+
+def status_labels(state, d):
+    """
+    Status labels of a destination for the text report.
+    """
+    labels = []
+    if d in state["strongly_recommended"]:
+        labels.append("STRONGLY RECOMMENDED")
+    elif len(state["recommended"][d]) > 0:
+        labels.append("RECOMMENDED")
+
+    if d in state["strongly_not_recommended"]:
+        labels.append("STRONGLY NOT RECOMMENDED")
+    elif len(state["not_recommended"][d]) > 0:
+        labels.append("HAS WARNINGS")
+
+    if d in state["neutral"]:
+        labels.append("NEUTRAL")
+
+    if d in state["contradictions"]:
+        labels.append("CONTRADICTING RULES")
+
+    if len(labels) == 0:
+        labels.append("NO STRONG EVIDENCE")
+    return labels
+
+
+def profile_report(state, top=None):
+    """
+    Text report of one inference state, as lines: ranked destinations with
+    status and explanations, tips for the final recommendation (or the best
+    destination), global flags and the reasoning trace. A bounded trace shows
+    its truncation marker (see travel_trace.format_trace).
+    """
+    scores = compute_scores(state)
+    ranked = rank_destinations(scores, k=top)
+    explanations = LazyExplanations(state)
+
+    lines = ["=== RANKED DESTINATIONS (BEST FIRST) ==="]
+    for d in ranked:
+        lines += ["", "----------------------------------------", f"Destination: {d}", f"Score: {scores[d]}"]
+        lines.append("Status: " + ", ".join(status_labels(state, d)))
+        if explanations[d]["positives"]:
+            lines += ["", "  Why this destination might be GOOD for you:"]
+            lines += [f"   - {reason}" for reason in explanations[d]["positives"]]
+        if explanations[d]["negatives"]:
+            lines += ["", "  Things to be careful about:"]
+            lines += [f"   - {reason}" for reason in explanations[d]["negatives"]]
+
+    lines += ["", "========================================"]
+    final = list(state["final_recommendation"])
+    if final:
+        lines.append("=== TRAVEL TIPS FOR YOUR TOP DESTINATION(S) ===")
+    else:
+        lines.append("=== TRAVEL TIPS ===")
+        lines.append("No strongly recommended destination, showing tips for your highest-scoring option.")
+        final = ranked[:1]
+    all_tips = lookup_tips(final)
+    for d in final:
+        lines += ["", f"Destination: {d}"]
+        if not all_tips[d]:
+            lines.append("  (No specific tips stored for this destination.)")
+        lines += [f"  Tip {i} : {tip}" for i, tip in enumerate(all_tips[d], start=1)]
+
+    lines += ["", "========================================", "=== GLOBAL FLAGS ===", str(list(state["flags"]))]
+    lines += ["", "=== RAW REASONING TRACE (for report / debugging) ==="]
+    lines += format_trace(state["trace"])
+    return lines
+
+
+def main_explain(args):
+    text = sys.stdin.read() if args.explain_profile == "-" else args.explain_profile
+    try:
+        user = normalize_user(json.loads(text))
+    except ValueError as e:
+        print(f"error: invalid profile: {e}", file=sys.stderr)
+        return 2
+    state = cached_inference(user)
+    print("\n".join(profile_report(state, args.top)))
+    return 0
+
+
+# ===========================
+# Thread-safe engine API
+# ===========================
+# run_inference() and the functions it calls keep all mutable data in the
+# per-call state dict; they only read the dest_facts passed in and the rule
+# text and categories of travel_info (which nothing modifies at runtime).
+# With a frozen travel_kb.KBSnapshot as input the facts cannot change
+# underneath either, and explanations and tips are read from the snapshot's
+# own tables, so the functions below may be called from many threads at once,
+# without locks or defensive copies. Results are new objects owned by the caller.
+#
+# They do not go through cached_inference(): the result cache has a single
+# SQLite connection behind a lock, which would serialize the threads.
+
+def recommend(snapshot, user, top=None, explain=False, tips=False):
+    """
+    Thread-safe: rank destinations for one user against a KBSnapshot.
+    user can be a full profile or a partial JSON-style dict (see normalize_user()).
+    Returns the same dict as evaluate_profile(), plus "tips" (dest -> list of
+    tips for the ranked destinations) if tips is set.
+    """
+    state = run_inference(normalize_user(user), snapshot.facts, snapshot.destinations)
+    result = summarize_state(state, explain, top, snapshot.explanations)
+    if tips:
+        result["tips"] = lookup_tips([entry["destination"] for entry in result["ranking"]], snapshot.tips)
+    return result
+
+
+def infer(snapshot, user):
+    """
+    Thread-safe: run_inference() for one user against a KBSnapshot.
+    Returns (state, scores).
+    """
+    state = run_inference(normalize_user(user), snapshot.facts, snapshot.destinations)
+    return state, compute_scores(state)
+
+
+def recommend_many(snapshot, users, workers=None, top=None, explain=False, tips=False, max_in_flight=None):
+    """
+    Run recommend() for many users on a thread pool and yield the results in input order.
+    At most max_in_flight users (default: 4 per thread) are queued ahead of the consumer.
+    Threads run in parallel on free-threaded Python builds; on regular builds
+    use the process-based batch mode for CPU-bound volumes.
+    """
+    if workers is None:
+        workers = min(32, (os.cpu_count() or 1) + 4)   # ThreadPoolExecutor's default
+    if max_in_flight is None:
+        max_in_flight = workers * 4
+
+    work = functools.partial(recommend, snapshot, top=top, explain=explain, tips=tips)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        yield from map_ordered(work, users, pool, max_in_flight)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    from travel_profile import profiling_from_args
+    from travel_trace import apply_trace_args
+    apply_trace_args(args)
+    if args.explain_profile is not None:
+        # One profile as a text report: python travel_core.py --explain-profile '{"budget": "low"}'
+        with profiling_from_args(args):
+            status = main_explain(args)
+        sys.exit(status)
+
+    if args.batch is not None:
+        # Non-interactive: python travel_core.py --batch profiles.jsonl --output results.jsonl
+        if args.profile is not None and args.workers > 1:
+            print("note: --profile only covers this process, use --workers 1 to profile the engine", file=sys.stderr)
+        with profiling_from_args(args):
+            main_batch(args)
+        sys.exit(0)
+
     # Launch GUI by default
     from travel_gui import main as gui_main
-    gui_main()
+    with profiling_from_args(args):
+        gui_main()
     
     # ===== OLD CLI CODE (PRESERVED FOR REFERENCE) =====
     # Uncomment the section below to use CLI mode instead of GUI
@@ -847,15 +1576,17 @@ if __name__ == "__main__":
 
     state = run_inference(user, dest_facts)
 
-    # 1) Compute scores and explanations
+    # 1) Compute scores; explanations are built lazily as they are printed
     scores = compute_scores(state)
-    explanations = build_explanations(state)
+    explanations = LazyExplanations(state)
 
-    # 2) Sort destinations by score (high to low)
-    ranked = sorted(DESTINATIONS, key=lambda d: scores[d], reverse=True)
+    # 2) Stream destinations by score (high to low), one page at a time
+    best_dest = None
 
     print("=== RANKED DESTINATIONS (BEST FIRST) ===")
-    for d in ranked:
+    for d in itertools.chain.from_iterable(iter_ranked(scores, page_size=20)):
+        if best_dest is None:
+            best_dest = d
         print("\n----------------------------------------")
         print("Destination:", d)
         print("Score:", scores[d])
@@ -903,9 +1634,10 @@ if __name__ == "__main__":
     print("\n========================================")
     if len(state["final_recommendation"]) > 0:
         print("=== TRAVEL TIPS FOR YOUR TOP DESTINATION(S) ===")
+        final_tips = lookup_tips(state["final_recommendation"])
         for d in state["final_recommendation"]:
             print("\nDestination:", d)
-            tips = TRAVEL_TIPS.get(d, [])
+            tips = final_tips[d]
             if len(tips) == 0:
                 print("  (No specific tips stored for this destination.)")
             else:
@@ -915,10 +1647,9 @@ if __name__ == "__main__":
         # Fallback: if no strongly_recommended destination, suggest best-scoring one
         print("=== TRAVEL TIPS ===")
         print("No strongly recommended destination, showing tips for your highest-scoring option.")
-        # pick best by score
-        best_dest = ranked[0]
+        # best_dest is the first destination of the ranking above
         print("\nDestination:", best_dest)
-        tips = TRAVEL_TIPS.get(best_dest, [])
+        tips = lookup_tips([best_dest])[best_dest]
         if len(tips) == 0:
             print("  (No specific tips stored for this destination.)")
         else:
@@ -931,7 +1662,7 @@ if __name__ == "__main__":
     print(state["flags"])
 
     print("\n=== RAW REASONING TRACE (for report / debugging) ===")
-    for step in state["trace"]:
+    for step in format_trace(state["trace"]):
         print(step)
 
     ENABLE_PLOTS = True
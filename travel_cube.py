@@ -0,0 +1,156 @@
+# =============================================
+# Travel Cube - Destination x Category x Polarity Counts
+# =============================================
+# One NumPy array holding, for every destination and rule category, how many
+# positive (recommended) and negative (not_recommended) rules fired:
+#
+#     cube.counts[i, j, POSITIVE]   positive rules of category j for destination i
+#     cube.counts[i, j, NEGATIVE]   negative rules of category j for destination i
+#
+# run_inference() stores it in state["cube"]; scoring, the 2D charts and the
+# 3D views slice it instead of walking the evidence lists again.
+#
+# Categories are the RULE_CATEGORY values in first-seen order, plus a last
+# "Other" column for rules without a category.
+
+import numpy as np
+
+from travel_info import RULE_CATEGORY
+
+
+# Named categories, in compute_dest_category_matrices() order
+CATEGORIES = []
+for _category in RULE_CATEGORY.values():
+    if _category not in CATEGORIES:
+        CATEGORIES.append(_category)
+
+OTHER = "Other"
+CUBE_CATEGORIES = CATEGORIES + [OTHER]
+
+POSITIVE = 0
+NEGATIVE = 1
+
+_CATEGORY_INDEX = {rule: CUBE_CATEGORIES.index(category) for rule, category in RULE_CATEGORY.items()}
+
+
+def category_index(rule):
+    """
+    Cube column of a rule (the "Other" column if it has no category).
+    """
+    return _CATEGORY_INDEX.get(rule, len(CATEGORIES))
+
+
+def rule_category_matrix(rules):
+    """
+    rule x category 0/1 matrix for a list of rules (used to turn rule
+    bitmasks straight into category counts).
+    """
+    matrix = np.zeros((len(rules), len(CUBE_CATEGORIES)), dtype=np.int64)
+    for i, rule in enumerate(rules):
+        matrix[i, category_index(rule)] = 1
+    return matrix
+
+
+class CategoryCube:
+    """
+    destinations -> catalog order of the first axis
+    counts       -> destination x category x polarity int array
+    """
+
+    __slots__ = ("destinations", "counts")
+
+    categories = CUBE_CATEGORIES
+
+    def __init__(self, destinations, counts):
+        self.destinations = destinations
+        self.counts = counts
+
+    # ---- slices ----
+
+    def positive(self):
+        """
+        destination x category counts of positive rules (named categories only).
+        """
+        return self.counts[:, :len(CATEGORIES), POSITIVE]
+
+    def negative(self):
+        return self.counts[:, :len(CATEGORIES), NEGATIVE]
+
+    def intensity(self):
+        """
+        destination x category total rules fired (pos + neg), for the heat cube.
+        """
+        return self.positive() + self.negative()
+
+    def net(self):
+        """
+        destination x category net contribution (pos - neg), for the bar landscape.
+        """
+        return self.positive() - self.negative()
+
+    def positives(self):
+        """
+        Positive rule count per destination (all categories).
+        """
+        return self.counts[:, :, POSITIVE].sum(axis=1)
+
+    def negatives(self):
+        return self.counts[:, :, NEGATIVE].sum(axis=1)
+
+    def matrices(self):
+        """
+        Same result as travel_plot.compute_dest_category_matrices():
+        (categories, pos_matrix, neg_matrix) with dest -> category -> count dicts.
+        """
+        pos_matrix = {}
+        neg_matrix = {}
+        pos_rows = self.counts[:, :, POSITIVE].tolist()
+        neg_rows = self.counts[:, :, NEGATIVE].tolist()
+        for d, pos_row, neg_row in zip(self.destinations, pos_rows, neg_rows):
+            pos_matrix[d] = dict(zip(CATEGORIES, pos_row))
+            neg_matrix[d] = dict(zip(CATEGORIES, neg_row))
+            # "Other" only appears when an uncategorized rule fired
+            if pos_row[-1]:
+                pos_matrix[d][OTHER] = pos_row[-1]
+            if neg_row[-1]:
+                neg_matrix[d][OTHER] = neg_row[-1]
+        return list(CATEGORIES), pos_matrix, neg_matrix
+
+    def __eq__(self, other):
+        if not isinstance(other, CategoryCube):
+            return NotImplemented
+        return list(self.destinations) == list(other.destinations) and np.array_equal(self.counts, other.counts)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"CategoryCube({len(self.destinations)} destinations x {len(CUBE_CATEGORIES)} categories)"
+
+
+def build_cube(state):
+    """
+    Count the evidence lists of a state into a CategoryCube.
+    """
+    destinations = list(state["recommended"])
+    width = len(CUBE_CATEGORIES)
+    cells = []
+    for side, polarity in (("recommended", POSITIVE), ("not_recommended", NEGATIVE)):
+        evidence = state[side]
+        for i, d in enumerate(destinations):
+            base = i * width
+            for rule in evidence[d]:
+                cells.append((base + category_index(rule)) * 2 + polarity)
+
+    counts = np.bincount(np.array(cells, dtype=np.int64), minlength=len(destinations) * width * 2)
+    return CategoryCube(destinations, counts.reshape(len(destinations), width, 2))
+
+
+def state_cube(state):
+    """
+    The cube of a state: the one stored by run_inference(), or built now
+    (for states assembled elsewhere, e.g. by travel_whatif).
+    """
+    cube = state.get("cube")
+    if cube is None:
+        cube = build_cube(state)
+    return cube
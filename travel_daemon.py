@@ -0,0 +1,281 @@
+# =============================================
+# Travel Daemon - Warm Engine over a Unix Socket
+# =============================================
+# Keeps one engine process resident (modules imported, destination facts
+# built, caches warm) and serves requests over a Unix domain socket, so shell
+# pipelines do not pay Python startup + the matplotlib import chain +
+# knowledge-base construction on every call.
+#
+# The client side of this file only uses the standard library; travel_core is
+# imported by the daemon alone.
+#
+# Protocol: one JSON object per line in each direction.
+#   request  -> {"op": "recommend" | "scores" | "explain" | "ping" | "stop",
+#                "profile": {...}, "top": N, "explain": true}
+#   response -> {"ok": true, "result": ...}  or  {"ok": false, "error": "..."}
+#
+# Usage:
+#     python travel_daemon.py start &                  # run the daemon
+#     echo '{"budget": "low"}' | python travel_daemon.py query --top 3
+#     python travel_daemon.py query profile.json --json
+#     python travel_daemon.py stop
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+
+def default_socket_path():
+    """
+    Socket path: $TRAVEL_DAEMON_SOCKET, or a per-user file in the temp directory.
+    """
+    path = os.environ.get("TRAVEL_DAEMON_SOCKET")
+    if path:
+        return path
+    uid = os.getuid() if hasattr(os, "getuid") else "user"
+    return os.path.join(os.environ.get("TMPDIR", "/tmp"), f"travel-advisor-{uid}.sock")
+
+
+# ===========================
+# 1. Wire format
+# ===========================
+
+def send_message(sock, message):
+    """
+    Send one JSON message (a single line) over a connected socket.
+    """
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def recv_message(stream):
+    """
+    Read one JSON message from a binary file object (socket.makefile("rb")).
+    Returns None when the other side closed the connection.
+    """
+    line = stream.readline()
+    if line == b"":
+        return None
+    return json.loads(line.decode("utf-8"))
+
+
+# ===========================
+# 2. Client
+# ===========================
+
+class DaemonNotRunning(Exception):
+    pass
+
+
+def request(message, path=None, timeout=30.0):
+    """
+    Send one request to the daemon and return its response dict.
+    Raises DaemonNotRunning if nothing is listening on the socket.
+    """
+    path = path or default_socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            raise DaemonNotRunning(f"no travel daemon listening on {path}")
+        send_message(sock, message)
+        with sock.makefile("rb") as stream:
+            response = recv_message(stream)
+        if response is None:
+            raise ConnectionError("daemon closed the connection without answering")
+        return response
+    finally:
+        sock.close()
+
+
+def print_result(op, result):
+    """
+    Human-readable output for the query command.
+    """
+    if op == "scores":
+        ordered = sorted(result["scores"].items(), key=lambda item: -item[1])
+        for d, score in ordered:
+            print(f"{d:<20} {score:>4}")
+        return
+    if op == "explain":
+        for d, reasons in result["explanations"].items():
+            print(d)
+            for reason in reasons["positives"]:
+                print("  +", reason)
+            for reason in reasons["negatives"]:
+                print("  -", reason)
+        return
+
+    for i, entry in enumerate(result["ranking"], start=1):
+        print(f"{i:>3}. {entry['destination']:<20} {entry['score']:>4}")
+        if "explanations" in result:
+            reasons = result["explanations"][entry["destination"]]
+            for reason in reasons["positives"]:
+                print("       +", reason)
+            for reason in reasons["negatives"]:
+                print("       -", reason)
+    if result["final_recommendation"]:
+        print("Final recommendation:", ", ".join(result["final_recommendation"]))
+    if result["flags"]:
+        print("Flags:", ", ".join(result["flags"]))
+
+
+# ===========================
+# 3. Daemon
+# ===========================
+
+def handle_message(message):
+    """
+    Answer one request inside the daemon. Returns (response, keep running).
+    """
+    from travel_core import normalize_user
+    from travel_server import evaluate_request
+
+    if not isinstance(message, dict):
+        return {"ok": False, "error": "request must be a JSON object"}, True
+
+    op = message.get("op", "recommend")
+    if op == "ping":
+        return {"ok": True, "result": {"pid": os.getpid()}}, True
+    if op == "stop":
+        return {"ok": True, "result": "stopping"}, False
+    if op not in ("recommend", "scores", "explain"):
+        return {"ok": False, "error": f"unknown op: {op}"}, True
+
+    try:
+        user = normalize_user(message.get("profile", {}))
+        top = message.get("top")
+        if top is not None and (isinstance(top, bool) or not isinstance(top, int) or top < 1):
+            raise ValueError("top must be a positive integer")
+        result = evaluate_request(op, user, top, bool(message.get("explain", False)))
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}, True
+    except Exception as e:
+        # Answer instead of dropping the connection, like the HTTP service's 500s
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}, True
+    return {"ok": True, "result": result}, True
+
+
+def run_daemon(path=None, quiet=False):
+    """
+    Serve requests on a Unix socket until a "stop" request (or Ctrl+C).
+    Each connection may send any number of requests; connections are served
+    on threads (each request builds its own inference state).
+    """
+    import socketserver
+    import threading
+    from travel_core import shared_dest_facts, run_inference, compute_scores, build_sample_user
+
+    path = path or default_socket_path()
+
+    # Refuse to start twice; remove a stale socket left by a crashed daemon
+    if os.path.exists(path):
+        try:
+            request({"op": "ping"}, path, timeout=1.0)
+            raise SystemExit(f"a travel daemon is already listening on {path}")
+        except DaemonNotRunning:
+            os.unlink(path)
+
+    # Warm up: knowledge base, explanation caches, first-call overheads
+    compute_scores(run_inference(build_sample_user(), shared_dest_facts()))
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                try:
+                    message = recv_message(self.rfile)
+                except ValueError as e:
+                    send_message(self.connection, {"ok": False, "error": f"invalid JSON: {e}"})
+                    continue
+                if message is None:
+                    return
+                response, keep_running = handle_message(message)
+                send_message(self.connection, response)
+                if not keep_running:
+                    # shutdown() blocks until serve_forever() returns: call it from another thread
+                    threading.Thread(target=self.server.shutdown).start()
+                    return
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+    old_umask = os.umask(0o077)   # socket only accessible to the current user
+    try:
+        server = Server(path, Handler)
+    finally:
+        os.umask(old_umask)
+
+    if not quiet:
+        print(f"Travel daemon (pid {os.getpid()}) listening on {path}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+    if not quiet:
+        print("Travel daemon stopped.")
+
+
+# ===========================
+# 4. Command line
+# ===========================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm travel advisor daemon and thin client.")
+    parser.add_argument("--socket", default=None, help="socket path (default: $TRAVEL_DAEMON_SOCKET or a per-user temp file)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    start = commands.add_parser("start", help="run the daemon in the foreground")
+    start.add_argument("--quiet", action="store_true")
+
+    query = commands.add_parser("query", help="send a profile and print the result")
+    query.add_argument("profile", nargs="?", default="-", help="profile JSON file ('-' for stdin, the default)")
+    query.add_argument("--op", choices=["recommend", "scores", "explain"], default="recommend")
+    query.add_argument("--top", type=int, default=None)
+    query.add_argument("--explain", action="store_true")
+    query.add_argument("--json", action="store_true", help="print the raw JSON result")
+
+    commands.add_parser("ping", help="check that the daemon is running")
+    commands.add_parser("stop", help="stop the daemon")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "start":
+        run_daemon(args.socket, args.quiet)
+        return 0
+
+    if args.command == "query":
+        text = sys.stdin.read() if args.profile == "-" else open(args.profile, encoding="utf-8").read()
+        try:
+            profile = json.loads(text) if text.strip() else {}
+        except ValueError as e:
+            print("invalid profile JSON:", e, file=sys.stderr)
+            return 1
+        message = {"op": args.op, "profile": profile, "top": args.top, "explain": args.explain}
+    else:
+        message = {"op": args.command}
+
+    try:
+        response = request(message, args.socket)
+    except DaemonNotRunning as e:
+        print(f"{e} (start it with: python travel_daemon.py start)", file=sys.stderr)
+        return 2
+
+    if not response.get("ok"):
+        print("error:", response.get("error"), file=sys.stderr)
+        return 1
+    if args.command == "query" and not args.json:
+        print_result(args.op, response["result"])
+    else:
+        print(json.dumps(response["result"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
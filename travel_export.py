@@ -0,0 +1,320 @@
+# =============================================
+# Travel Export - Columnar Batch Results
+# =============================================
+# Writes batch inference results as a column store: one row per
+# (profile, destination), one file per column, so questions like "how often is
+# Japan strongly recommended to low-budget travellers" are a scan over a few
+# NumPy arrays instead of re-parsing reasoning traces.
+#
+# Layout of an export directory:
+#   schema.json      row / profile counts, chunk sizes and, per column, its
+#                    dtype and (for categorical columns) the category names
+#   <column>.bin     raw little-endian values of one column, all rows in order
+#
+# Categorical columns (destination, budget, season, ...) store indices into
+# their "categories" list; "likes" is a bitmask over LIKES_OPTIONS.
+#
+# Rows are computed in chunks (optionally on a process pool) and appended to
+# the column files as each chunk finishes, so memory does not grow with the
+# input. schema.json is written last: a directory without it is incomplete.
+#
+# Usage:
+#     python travel_export.py profiles.jsonl results/ --workers 4
+#     columns = read_columns("results/")      # dict: name -> NumPy array (memory-mapped)
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from travel_info import (
+    DESTINATIONS,
+    PROFILE_OPTIONS,
+    LIKES_OPTIONS,
+)
+from travel_core import (
+    normalize_user,
+    cached_inference,
+    compute_scores,
+    rank_destinations,
+    map_ordered,
+    read_chunks,
+)
+from travel_cube import CATEGORIES, state_cube
+
+
+# ===========================
+# 1. Schema
+# ===========================
+
+SCHEMA_FILE = "schema.json"
+FORMAT_VERSION = 1
+
+# Label columns: column name -> state list
+LABEL_COLUMNS = {
+    "strongly_recommended": "strongly_recommended",
+    "strongly_not_recommended": "strongly_not_recommended",
+    "neutral": "neutral",
+    "season_matched": "season_matched",
+    "weak_recommendation": "weak_recommendation",
+    "contradiction": "contradictions",
+    "final_recommendation": "final_recommendation",
+}
+
+
+def category_column(prefix, category):
+    return prefix + "_" + category.lower()
+
+
+def build_columns():
+    """
+    Column definitions in file order: name -> {"dtype", optional "categories" / "bits"}.
+    """
+    columns = {
+        "line": {"dtype": "<u4"},
+        "profile": {"dtype": "<u4"},
+    }
+    for field, options in PROFILE_OPTIONS.items():
+        columns[field] = {"dtype": "u1", "categories": list(options)}
+    columns["likes"] = {"dtype": "u1", "bits": list(LIKES_OPTIONS)}
+
+    columns["destination"] = {"dtype": "<u2", "categories": list(DESTINATIONS)}
+    columns["score"] = {"dtype": "<i4"}
+    columns["rank"] = {"dtype": "<u2"}
+    columns["positive"] = {"dtype": "<u2"}
+    columns["negative"] = {"dtype": "<u2"}
+    for category in CATEGORIES:
+        columns[category_column("pos", category)] = {"dtype": "<u2"}
+    for category in CATEGORIES:
+        columns[category_column("neg", category)] = {"dtype": "<u2"}
+    for name in LABEL_COLUMNS:
+        columns[name] = {"dtype": "|b1"}
+    return columns
+
+
+COLUMNS = build_columns()
+
+
+# ===========================
+# 2. Rows of one chunk
+# ===========================
+
+def export_rows(lines):
+    """
+    Evaluate a chunk of (line number, JSON text) pairs and return its rows as
+    {"columns": name -> NumPy array, "profiles": count, "errors": [line numbers]}.
+    The "profile" column is numbered from 0 within the chunk.
+    """
+    values = {name: [] for name in COLUMNS}
+    errors = []
+    profiles = 0
+
+    for number, text in lines:
+        try:
+            user = normalize_user(json.loads(text))
+        except ValueError:
+            errors.append(number)
+            continue
+
+        state = cached_inference(user)
+        scores = compute_scores(state)
+        ranks = {d: i for i, d in enumerate(rank_destinations(scores), start=1)}
+        cube = state_cube(state)
+        positives = cube.positives().tolist()
+        negatives = cube.negatives().tolist()
+        pos_matrix = cube.positive().tolist()
+        neg_matrix = cube.negative().tolist()
+        labels = {name: set(state[key]) for name, key in LABEL_COLUMNS.items()}
+        likes = sum(1 << bit for bit, like in enumerate(LIKES_OPTIONS) if like in user["likes"])
+
+        for code, d in enumerate(DESTINATIONS):
+            values["line"].append(number)
+            values["profile"].append(profiles)
+            for field, options in PROFILE_OPTIONS.items():
+                values[field].append(options.index(user[field]))
+            values["likes"].append(likes)
+
+            values["destination"].append(code)
+            values["score"].append(scores[d])
+            values["rank"].append(ranks[d])
+            values["positive"].append(positives[code])
+            values["negative"].append(negatives[code])
+            for j, category in enumerate(CATEGORIES):
+                values[category_column("pos", category)].append(pos_matrix[code][j])
+                values[category_column("neg", category)].append(neg_matrix[code][j])
+            for name in LABEL_COLUMNS:
+                values[name].append(d in labels[name])
+
+        profiles += 1
+
+    columns = {name: np.array(values[name], dtype=spec["dtype"]) for name, spec in COLUMNS.items()}
+    return {"columns": columns, "profiles": profiles, "errors": errors}
+
+
+# ===========================
+# 3. Streaming writer / reader
+# ===========================
+
+class ColumnWriter:
+    """
+    Appends row chunks to the column files of an export directory.
+    close() writes schema.json; use as a context manager, which only writes
+    the schema when the block finished without an exception.
+    """
+
+    def __init__(self, path, columns=COLUMNS):
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        self.profiles = 0
+        self.errors = []
+        self.chunks = []
+        os.makedirs(path, exist_ok=True)
+
+        # A stale schema would describe the old files while they are rewritten
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        if os.path.exists(schema_path):
+            os.remove(schema_path)
+        self.files = {name: open(os.path.join(path, name + ".bin"), "wb") for name in columns}
+
+    def append(self, part):
+        """
+        Write one chunk produced by export_rows().
+        """
+        columns = part["columns"]
+        columns["profile"] = columns["profile"] + np.uint32(self.profiles)
+        for name, f in self.files.items():
+            columns[name].tofile(f)
+
+        rows = len(columns["line"])
+        self.rows += rows
+        self.profiles += part["profiles"]
+        self.errors.extend(part["errors"])
+        self.chunks.append(rows)
+
+    def close_files(self):
+        """
+        Close the column files without writing the schema (the export stays incomplete).
+        Returns False if they were already closed.
+        """
+        if self.files is None:
+            return False
+        for f in self.files.values():
+            f.close()
+        self.files = None
+        return True
+
+    def close(self):
+        if not self.close_files():
+            return
+
+        schema = {
+            "format": "travel-columns",
+            "version": FORMAT_VERSION,
+            "rows": self.rows,
+            "profiles": self.profiles,
+            "invalid_lines": self.errors,
+            "chunks": self.chunks,
+            "columns": [dict(spec, name=name) for name, spec in self.columns.items()],
+        }
+        tmp = os.path.join(self.path, SCHEMA_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(schema, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, SCHEMA_FILE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.close_files()
+
+
+def read_schema(path):
+    with open(os.path.join(path, SCHEMA_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_columns(path, names=None):
+    """
+    Load an export directory: dict name -> NumPy array (memory-mapped, read-only).
+    names restricts loading to the given columns.
+    """
+    schema = read_schema(path)
+    columns = {}
+    for spec in schema["columns"]:
+        name = spec["name"]
+        if names is not None and name not in names:
+            continue
+        if schema["rows"] == 0:
+            columns[name] = np.zeros(0, dtype=spec["dtype"])
+        else:
+            columns[name] = np.memmap(os.path.join(path, name + ".bin"), dtype=spec["dtype"],
+                                      mode="r", shape=(schema["rows"],))
+    return columns
+
+
+def category_code(schema, column, value):
+    """
+    Stored code of a categorical value, e.g. category_code(schema, "budget", "low").
+    """
+    for spec in schema["columns"]:
+        if spec["name"] == column:
+            return spec["categories"].index(value)
+    raise KeyError(column)
+
+
+# ===========================
+# 4. Export driver
+# ===========================
+
+def export_batch(infile, path, workers=1, chunk_size=256, max_in_flight=None):
+    """
+    Evaluate JSONL profiles from infile and write the column store to path.
+    With workers > 1 chunks run on a process pool with a bounded number in flight.
+    Returns the schema dict that was written.
+    """
+    chunks = read_chunks(infile, chunk_size)
+
+    with ColumnWriter(path) as writer:
+        if workers <= 1:
+            for part in map_ordered(export_rows, chunks):
+                writer.append(part)
+        else:
+            if max_in_flight is None:
+                max_in_flight = workers * 2
+            # Workers attach to one shared copy of the knowledge base
+            from travel_kb import SharedKB, init_worker
+            with SharedKB() as kb:
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                         initargs=(kb.name,)) as pool:
+                    for part in map_ordered(export_rows, chunks, pool, max_in_flight):
+                        writer.append(part)
+
+    return read_schema(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export batch travel advisor results as a column store.")
+    parser.add_argument("input", help="JSONL profiles ('-' for stdin)")
+    parser.add_argument("output", help="export directory")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=256, help="profiles per chunk")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        schema = export_batch(infile, args.output, workers=args.workers, chunk_size=args.chunk_size)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+
+    print(f"Exported {schema['profiles']} profiles ({schema['rows']} rows, "
+          f"{len(schema['invalid_lines'])} invalid lines) in {time.perf_counter() - started:.1f}s")
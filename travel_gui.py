@@ -13,19 +13,22 @@ Features:
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import matplotlib.pyplot as plt
+import numpy as np
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 # Import the logic functions from the main file
 from travel_core import (
     build_destination_facts,
-    run_inference,
+    cached_inference,
     compute_scores,
-    build_explanations,
+    explain_destination,
+    rank_destinations,
+    iter_ranked,
+    lookup_tips,
 )
 
 # Import static data from travel_info module
 from travel_info import (
-    TRAVEL_TIPS,
     DESTINATIONS,
 )
 
@@ -34,9 +37,18 @@ from travel_plot import (
     compute_rule_frequency,
     compute_category_contributions,
     visualize_statistics_3d,
-    compute_dest_category_matrices,
 )
 
+# Destination × category × polarity counts (built once by run_inference)
+from travel_cube import CATEGORIES, state_cube
+
+# Timing spans of a planner run (recorded when TRAVEL_TRACE is set)
+from travel_instrument import instrumented
+from travel_spans import trace_request
+
+# Reasoning trace retention (bounded traces carry a truncation marker)
+from travel_trace import format_trace, trace_marker
+
 
 class TravelPlannerGUI(tk.Tk):
     """
@@ -197,26 +209,72 @@ class TravelPlannerGUI(tk.Tk):
 
     def create_results_tab(self):
         """
-        Create rich text area for results.
+        Create the ranked results table and the rich text area for tips.
         """
         self.tab_results.columnconfigure(0, weight=1)
         self.tab_results.rowconfigure(0, weight=1)
 
-        self.results_text = scrolledtext.ScrolledText(self.tab_results, wrap="word", font=("Segoe UI", 10), padx=30, pady=30)
-        self.results_text.grid(row=0, column=0, sticky="nsew")
+        paned = ttk.PanedWindow(self.tab_results, orient="vertical")
+        paned.grid(row=0, column=0, sticky="nsew")
+
+        # --- Ranked results table (rows are loaded page by page while scrolling) ---
+        table_frame = ttk.Frame(paned)
+        table_frame.columnconfigure(0, weight=1)
+        table_frame.rowconfigure(0, weight=1)
+
+        columns = ("rank", "score", "positives", "negatives", "status")
+        self.results_tree = ttk.Treeview(table_frame, columns=columns, selectmode="browse")
+        self.results_tree.heading("#0", text="Destination", anchor="w")
+        self.results_tree.heading("rank", text="#")
+        self.results_tree.heading("score", text="Score", command=lambda: self.sort_results("score"))
+        self.results_tree.heading("positives", text="Positives", command=lambda: self.sort_results("positives"))
+        self.results_tree.heading("negatives", text="Negatives", command=lambda: self.sort_results("negatives"))
+        self.results_tree.heading("status", text="Status", anchor="w")
+
+        self.results_tree.column("#0", width=420, stretch=True)
+        self.results_tree.column("rank", width=50, anchor="center", stretch=False)
+        self.results_tree.column("score", width=70, anchor="center", stretch=False)
+        self.results_tree.column("positives", width=80, anchor="center", stretch=False)
+        self.results_tree.column("negatives", width=80, anchor="center", stretch=False)
+        self.results_tree.column("status", width=260, stretch=True)
+
+        self.results_tree.tag_configure("strong", foreground="#27ae60")
+        self.results_tree.tag_configure("warn", foreground="#d35400")
+        self.results_tree.tag_configure("bad", foreground="#c0392b")
+        self.results_tree.tag_configure("good_item", foreground="#27ae60")
+        self.results_tree.tag_configure("bad_item", foreground="#c0392b")
+        self.results_tree.tag_configure("visa_item", foreground="#16a085")
+
+        tree_scroll = ttk.Scrollbar(table_frame, orient="vertical", command=self.results_tree.yview)
+        self.results_tree.configure(yscrollcommand=lambda first, last: self.on_results_scroll(tree_scroll, first, last))
+        self.results_tree.grid(row=0, column=0, sticky="nsew")
+        tree_scroll.grid(row=0, column=1, sticky="ns")
+
+        self.results_tree.bind("<<TreeviewOpen>>", self.on_result_expand)
+
+        # Table bookkeeping (filled by update_results_text)
+        self.result_pages = iter(())
+        self.result_more = False
+        self.result_loaded = 0
+        self.result_page_size = 50
+        self.result_sort_key = "score"
+        self.result_sort_desc = True
+        self.result_labels = {"strong": set(), "bad": set()}
+        self.result_ranks = {}
+        self.result_score_values = np.zeros(0)
+
+        # --- Tips / visa text area below the table ---
+        self.results_text = scrolledtext.ScrolledText(paned, wrap="word", font=("Segoe UI", 10), padx=30, pady=20, height=12)
+
+        paned.add(table_frame, weight=3)
+        paned.add(self.results_text, weight=2)
 
         # Configure Tags
         self.results_text.tag_config("header", font=("Segoe UI", 18, "bold"), foreground="#2980b9", spacing3=15)
         self.results_text.tag_config("subheader", font=("Segoe UI", 14, "bold"), foreground="#2c3e50", spacing1=10)
-        self.results_text.tag_config("score", font=("Segoe UI", 12, "bold"), foreground="#27ae60")
-        self.results_text.tag_config("good", foreground="#27ae60")
-        self.results_text.tag_config("bad", foreground="#c0392b")
         self.results_text.tag_config("tip", font=("Segoe UI", 10, "italic"), foreground="#8e44ad")
         self.results_text.tag_config("visa", font=("Segoe UI", 10), foreground="#16a085", background="#e8f8f5")
         self.results_text.tag_config("visa_header", font=("Segoe UI", 11, "bold"), foreground="#16a085")
-        self.results_text.tag_config("label_strong", background="#27ae60", foreground="white")
-        self.results_text.tag_config("label_warn", background="#f39c12", foreground="white")
-        self.results_text.tag_config("label_bad", background="#c0392b", foreground="white")
 
         self.results_text.insert(tk.END, "\n\nPlease fill out the form in the 'Plan Your Trip' tab and click 'Find My Destination'.")
 
@@ -260,6 +318,7 @@ class TravelPlannerGUI(tk.Tk):
         # Tags for formatting
         self.reasoning_text.tag_config("rule_name", foreground="#d35400", font=("Consolas", 10, "bold"))
         self.reasoning_text.tag_config("logic", foreground="#2c3e50")
+        self.reasoning_text.tag_config("marker", foreground="#7f8c8d", font=("Consolas", 10, "italic"))
 
         self.reasoning_text.insert(tk.END, "Run the planner to see the logic trace here.")
 
@@ -288,24 +347,25 @@ class TravelPlannerGUI(tk.Tk):
             "companions": self.companions_var.get(),
         }
 
-        # 3. Run Inference
-        self.state = run_inference(user, self.dest_facts)
-        self.scores = compute_scores(self.state)
-        explanations = build_explanations(self.state)
-        ranked = sorted(DESTINATIONS, key=lambda d: self.scores[d], reverse=True)
+        with trace_request("run_planner"):
+            # 3. Run Inference
+            # (results are cached on disk, keyed by profile and knowledge-base version)
+            self.state = cached_inference(user)
+            self.scores = compute_scores(self.state)
 
-        # 4. Update Results Tab
-        self.update_results_text(ranked, explanations)
+            # 4. Update Results Tab (rows are ranked page by page, explanations built on expand)
+            self.update_results_text()
 
-        # 5. Update Charts Tab
-        self.update_charts()
+            # 5. Update Charts Tab
+            self.update_charts()
 
-        # 6. Update Reasoning Tab
-        self.update_reasoning_tab()
+            # 6. Update Reasoning Tab
+            self.update_reasoning_tab()
 
         # 7. Auto-switch to Results Tab
         self.notebook.select(self.tab_results)
 
+    @instrumented
     def update_reasoning_tab(self):
         """
         Populate the reasoning tab with the trace log.
@@ -314,10 +374,14 @@ class TravelPlannerGUI(tk.Tk):
         self.reasoning_text.delete(1.0, tk.END)
         self.reasoning_text.insert(tk.END, "Inference Engine Trace:\n\n", "header")
 
+        # A bounded trace (see travel_trace) is shown with a truncation marker
         trace = self.state.get("trace", [])
-        for line in trace:
+        marker = trace_marker(trace)
+        for line in format_trace(trace):
+            if line == marker:
+                self.reasoning_text.insert(tk.END, line + "\n", "marker")
             # Try to split by first colon to separate Rule Name
-            if ":" in line:
+            elif ":" in line:
                 rule_name, logic = line.split(":", 1)
                 self.reasoning_text.insert(tk.END, rule_name + ":", "rule_name")
                 self.reasoning_text.insert(tk.END, logic + "\n", "logic")
@@ -326,67 +390,37 @@ class TravelPlannerGUI(tk.Tk):
 
         self.reasoning_text.config(state="disabled") # Disable to prevent editing
 
-    def update_results_text(self, ranked, explanations):
+    @instrumented
+    def update_results_text(self):
         """
-        Render formatted results.
+        Render formatted results: the ranked table plus tips for the top picks.
         """
+        # Label lookups are shared by every row, so build them once per run
+        self.result_labels = {
+            "strong": set(self.state["strongly_recommended"]),
+            "bad": set(self.state["strongly_not_recommended"]),
+        }
+        # The # column is the score rank; it stays with its row when the table is re-sorted.
+        # Ranks are filled in as rows are shown (see score_rank), never for the whole catalog.
+        self.result_ranks = {}
+        self.result_score_values = np.fromiter((self.scores[d] for d in DESTINATIONS), dtype=float, count=len(DESTINATIONS))
+        self.result_sort_key = "score"
+        self.result_sort_desc = True
+        self.reset_results_table(self.scores)
+
         self.results_text.delete(1.0, tk.END)
-        self.results_text.insert(tk.END, "Your Travel Recommendations\n", "header")
-
-        for d in ranked:
-            score = self.scores[d]
-            self.results_text.insert(tk.END, f"\n{d} ", "subheader")
-            self.results_text.insert(tk.END, f"(Score: {score})\n", "score")
-
-            # Status Labels
-            if d in self.state["strongly_recommended"]:
-                self.results_text.insert(tk.END, " STRONGLY RECOMMENDED ", "label_strong")
-                self.results_text.insert(tk.END, " ")
-            if d in self.state["not_recommended"]:
-                self.results_text.insert(tk.END, " HAS WARNINGS ", "label_warn")
-                self.results_text.insert(tk.END, " ")
-            if d in self.state["strongly_not_recommended"]:
-                self.results_text.insert(tk.END, " NOT RECOMMENDED ", "label_bad")
-                self.results_text.insert(tk.END, " ")
-
-            self.results_text.insert(tk.END, "\n")
-
-            # Positives
-            pos = explanations[d]["positives"]
-            if pos:
-                self.results_text.insert(tk.END, "  Why it's a match:\n", "good")
-                for p in pos:
-                    self.results_text.insert(tk.END, f"   • {p}\n")
-
-            # Negatives
-            neg = explanations[d]["negatives"]
-            if neg:
-                self.results_text.insert(tk.END, "  Concerns:\n", "bad")
-                for n in neg:
-                    self.results_text.insert(tk.END, f"   • {n}\n")
-
-            # Visa Information (extract from tips)
-            tips = TRAVEL_TIPS.get(d, [])
-            visa_info = [tip for tip in tips if tip.startswith("Visa:") or "passport" in tip.lower() or "visa" in tip.lower()]
-            if visa_info:
-                self.results_text.insert(tk.END, "  Visa & Entry Requirements:\n", "visa_header")
-                for visa_tip in visa_info:
-                    # Remove "Visa:" prefix if present for cleaner display
-                    display_tip = visa_tip.replace("Visa:", "").strip()
-                    self.results_text.insert(tk.END, f"   🛂 {display_tip}\n", "visa")
-
-            self.results_text.insert(tk.END, "_"*60 + "\n")
 
         # Travel Tips
         if self.state["final_recommendation"]:
             top_dests = self.state["final_recommendation"]
         else:
-            top_dests = [ranked[0]]
+            top_dests = rank_destinations(self.scores, k=1)
 
-        self.results_text.insert(tk.END, "\nTravel Tips for Top Picks\n", "header")
+        top_tips = lookup_tips(top_dests)
+        self.results_text.insert(tk.END, "Travel Tips for Top Picks\n", "header")
         for d in top_dests:
             self.results_text.insert(tk.END, f"\n{d}:\n", "subheader")
-            tips = TRAVEL_TIPS.get(d, [])
+            tips = top_tips[d]
             # Filter out visa-related tips since they're shown above
             general_tips = [tip for tip in tips if not (tip.startswith("Visa:") or ("passport" in tip.lower() and "valid" in tip.lower()))]
             for tip in general_tips:
@@ -396,11 +430,154 @@ class TravelPlannerGUI(tk.Tk):
         self.results_text.insert(tk.END, "\n\nVisa Requirements for Top Picks\n", "header")
         for d in top_dests:
             self.results_text.insert(tk.END, f"\n{d}:\n", "subheader")
-            tips = TRAVEL_TIPS.get(d, [])
+            tips = top_tips[d]
             visa_info = [tip for tip in tips if "visa" in tip.lower() or ("passport" in tip.lower() and "valid" in tip.lower())]
             for visa_tip in visa_info:
                 self.results_text.insert(tk.END, f"  🛂 {visa_tip}\n", "visa")
 
+    def reset_results_table(self, values):
+        """
+        Clear the results table and load the first page of rows,
+        ranked by values (dest -> number, highest first).
+        """
+        self.results_tree.delete(*self.results_tree.get_children())
+        self.result_pages = iter_ranked(values, page_size=self.result_page_size, destinations=DESTINATIONS)
+        self.result_more = True
+        self.result_loaded = 0
+        self.load_result_page()
+        self.results_tree.yview_moveto(0)
+
+    def load_result_page(self):
+        """
+        Append the next page of destinations to the results table.
+        """
+        page = next(self.result_pages, None)
+        if page is None:
+            self.result_more = False
+            return
+
+        # Pages in score order carry their ranks: page offset + position in the page
+        if self.result_sort_key == "score" and self.result_sort_desc:
+            for rank, d in enumerate(page, start=self.result_loaded + 1):
+                self.result_ranks[d] = rank
+
+        for d in page:
+            status, tag = self.result_status(d)
+            self.results_tree.insert(
+                "", "end", iid=d, text=d, tags=(tag,) if tag else (),
+                values=(
+                    self.score_rank(d),
+                    self.scores[d],
+                    len(self.state["recommended"][d]),
+                    len(self.state["not_recommended"][d]),
+                    status,
+                ),
+            )
+            # Placeholder child so the row can be expanded; replaced on first open
+            self.results_tree.insert(d, "end", iid=d + "::pending", text="Loading...")
+
+        self.result_loaded += len(page)
+
+    def score_rank(self, d):
+        """
+        Score rank of a destination (1 = best, ties in catalog order, as in
+        rank_destinations()). Counted for this row only when the table is
+        sorted by another column, and remembered for the run.
+        """
+        rank = self.result_ranks.get(d)
+        if rank is None:
+            values = self.result_score_values
+            i = DESTINATIONS.index(d)
+            rank = 1 + int(np.count_nonzero(values > values[i])) + int(np.count_nonzero(values[:i] == values[i]))
+            self.result_ranks[d] = rank
+        return rank
+
+    def result_status(self, d):
+        """
+        Return (status text, row tag) for a destination.
+        """
+        labels = []
+        tag = ""
+        if d in self.result_labels["strong"]:
+            labels.append("STRONGLY RECOMMENDED")
+            tag = "strong"
+        if len(self.state["not_recommended"][d]) > 0:
+            labels.append("HAS WARNINGS")
+            if tag == "":
+                tag = "warn"
+        if d in self.result_labels["bad"]:
+            labels.append("NOT RECOMMENDED")
+            tag = "bad"
+        return ", ".join(labels), tag
+
+    def on_results_scroll(self, scrollbar, first, last):
+        """
+        Keep the scrollbar in sync and load more rows when the end comes into view.
+        """
+        scrollbar.set(first, last)
+        if float(last) >= 0.95 and self.result_more:
+            self.load_result_page()
+
+    def on_result_expand(self, event):
+        """
+        Build the explanation rows of a destination the first time it is expanded.
+        """
+        d = self.results_tree.focus()
+        placeholder = d + "::pending"
+        if not self.results_tree.exists(placeholder):
+            return
+        self.results_tree.delete(placeholder)
+
+        explanation = explain_destination(self.state, d)
+
+        if explanation["positives"]:
+            node = self.results_tree.insert(d, "end", text="Why it's a match", open=True, tags=("good_item",))
+            for p in explanation["positives"]:
+                self.results_tree.insert(node, "end", text="• " + p)
+
+        if explanation["negatives"]:
+            node = self.results_tree.insert(d, "end", text="Concerns", open=True, tags=("bad_item",))
+            for n in explanation["negatives"]:
+                self.results_tree.insert(node, "end", text="• " + n)
+
+        # Visa Information (extract from tips)
+        tips = lookup_tips([d])[d]
+        visa_info = [tip for tip in tips if tip.startswith("Visa:") or "passport" in tip.lower() or "visa" in tip.lower()]
+        if visa_info:
+            node = self.results_tree.insert(d, "end", text="Visa & Entry Requirements", tags=("visa_item",))
+            for visa_tip in visa_info:
+                # Remove "Visa:" prefix if present for cleaner display
+                display_tip = visa_tip.replace("Visa:", "").strip()
+                self.results_tree.insert(node, "end", text="🛂 " + display_tip)
+
+    def sort_results(self, key):
+        """
+        Re-sort the table by score, positive count or negative count.
+        Uses the stored state and scores, so inference is not re-run.
+        """
+        if self.state is None:
+            return
+
+        if key == self.result_sort_key:
+            self.result_sort_desc = not self.result_sort_desc
+        else:
+            self.result_sort_key = key
+            self.result_sort_desc = True
+
+        if key == "positives":
+            values = dict(zip(DESTINATIONS, state_cube(self.state).positives().tolist()))
+        elif key == "negatives":
+            values = dict(zip(DESTINATIONS, state_cube(self.state).negatives().tolist()))
+        else:
+            values = self.scores
+
+        # iter_ranked always ranks highest first; negate for ascending order
+        if not self.result_sort_desc:
+            values = {d: -v for d, v in values.items()}
+
+        self.reset_results_table(values)
+
+    @instrumented
     def update_charts(self):
         """
         Draw matplotlib charts with better layout.
@@ -410,8 +587,9 @@ class TravelPlannerGUI(tk.Tk):
         # Data Preparation
         destinations = DESTINATIONS
         score_values = [self.scores[d] for d in destinations]
-        pos_counts = [len(self.state["recommended"][d]) for d in destinations]
-        neg_counts = [len(self.state["not_recommended"][d]) for d in destinations]
+        cube = state_cube(self.state)
+        pos_counts = cube.positives().tolist()
+        neg_counts = cube.negatives().tolist()
 
         rule_freq = compute_rule_frequency(self.state)
         rules = sorted(rule_freq.keys())
@@ -477,14 +655,13 @@ class TravelPlannerGUI(tk.Tk):
             )
             return
 
-        # Prepare data from the existing state
+        # Prepare data from the existing state: every count is a slice of the cube
         destinations = DESTINATIONS
-        pos_counts = [len(self.state["recommended"][d]) for d in destinations]
-        neg_counts = [len(self.state["not_recommended"][d]) for d in destinations]
+        cube = state_cube(self.state)
+        pos_counts = cube.positives().tolist()
+        neg_counts = cube.negatives().tolist()
         score_values = [self.scores[d] for d in destinations]
-
-        # Destination-category matrices (for heat cube and bar landscape)
-        categories, pos_matrix, neg_matrix = compute_dest_category_matrices(self.state)
+        categories = CATEGORIES
 
         # Create a new top-level window
         win = tk.Toplevel(self)
@@ -522,16 +699,11 @@ class TravelPlannerGUI(tk.Tk):
         # 2) 3D Heat Cube: Dest × Category × Intensity
         # ==================================
         ax2 = fig.add_subplot(1, 3, 2, projection='3d')
-        heat_x = []
-        heat_y = []
-        heat_z = []
-
-        for i, d in enumerate(destinations):
-            for j, c in enumerate(categories):
-                total = pos_matrix[d].get(c, 0) + neg_matrix[d].get(c, 0)
-                heat_x.append(i)
-                heat_y.append(j)
-                heat_z.append(total)
+        # One point per (destination, category) cell of the cube
+        grid_x, grid_y = np.meshgrid(list(dest_indices), list(cat_indices), indexing="ij")
+        heat_x = grid_x.ravel()
+        heat_y = grid_y.ravel()
+        heat_z = cube.intensity().ravel()
 
         ax2.scatter(heat_x, heat_y, heat_z)
         ax2.set_title("Dest × Category × Intensity", fontsize=9)
@@ -549,35 +721,17 @@ class TravelPlannerGUI(tk.Tk):
         # ==================================
         ax3 = fig.add_subplot(1, 3, 3, projection='3d')
 
-        bar_x = []
-        bar_y = []
-        bar_z = []
-        bar_dx = []
-        bar_dy = []
-        bar_dz = []
-
         width_x = 0.4
         width_y = 0.4
 
-        for i, d in enumerate(destinations):
-            for j, c in enumerate(categories):
-                pos_val = pos_matrix[d].get(c, 0)
-                neg_val = neg_matrix[d].get(c, 0)
-                net = pos_val - neg_val
-
-                if net >= 0:
-                    z_base = 0
-                    dz = net
-                else:
-                    z_base = net
-                    dz = -net
-
-                bar_x.append(i - width_x / 2.0)
-                bar_y.append(j - width_y / 2.0)
-                bar_z.append(z_base)
-                bar_dx.append(width_x)
-                bar_dy.append(width_y)
-                bar_dz.append(dz)
+        # Bars grow up from 0 for a positive net "vote", down from 0 for a negative one
+        net = cube.net().ravel()
+        bar_x = grid_x.ravel() - width_x / 2.0
+        bar_y = grid_y.ravel() - width_y / 2.0
+        bar_z = np.minimum(net, 0)
+        bar_dx = np.full(net.shape, width_x)
+        bar_dy = np.full(net.shape, width_y)
+        bar_dz = np.abs(net)
 
         ax3.bar3d(bar_x, bar_y, bar_z, bar_dx, bar_dy, bar_dz)
         ax3.set_title("Category Contribution Terrain", fontsize=9)
@@ -600,4 +754,14 @@ def main():
     app.mainloop()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    from travel_profile import add_profile_args, profiling_from_args
+    from travel_trace import add_trace_args, apply_trace_args
+
+    parser = argparse.ArgumentParser(description="AI Travel Destination Planner (GUI)")
+    add_profile_args(parser)
+    add_trace_args(parser)
+    args = parser.parse_args()
+    apply_trace_args(args)
+    with profiling_from_args(args):
+        main()
@@ -2,7 +2,7 @@
 # Travel Information - Static Data Module
 # =============================================
 # This file contains all static information used in the travel advisor system:
-# - Destination list
+# - Destination list and user profile options
 # - Destination facts/knowledge base
 # - Travel tips
 # - Rule categories and logic
@@ -23,6 +23,24 @@ DESTINATIONS = [
 ]
 
 
+# User profile fields and their allowed values (same choices as the GUI form
+# and the CLI questionnaire). "likes" is a list of LIKES_OPTIONS entries.
+PROFILE_OPTIONS = {
+    "budget": ["low", "medium", "high"],
+    "prefers_season": ["spring", "summer", "autumn", "winter"],
+    "trip_duration": ["short", "medium", "long"],
+    "crowd_tolerance": ["likes_lively", "prefers_quiet"],
+    "climate_preference": ["cool", "mild", "warm"],
+    "transport": ["public_transport", "walking", "car_taxi"],
+    "traffic_preference": ["low_traffic", "mid_traffic", "high_traffic"],
+    "food_preference": ["LovesLocalCuisine", "PrefersFamiliarFood"],
+    "safety_priority": ["HighSafety", "MediumSafety", "LowSafetyConcern"],
+    "companions": ["solo", "dual", "family"],
+}
+
+LIKES_OPTIONS = ["nature_scenery", "culture_history", "city_life", "shopping", "adventure"]
+
+
 # ===========================
 # 2. Destination Facts
 # ===========================
@@ -312,3 +330,45 @@ EXPLANATIONS = {
     "R24_neutral_default": "No strong evidence for or against this destination.",
     "R25_final_recommendation": "Chosen as one of the top recommendations.",
 }
+
+
+# ===========================
+# 7. Scoring Weights
+# ===========================
+
+# Features counted per destination by the scoring step (column order of
+# the destination × feature matrix). "recommended" / "not_recommended"
+# count evidence rules; the others are 0/1 labels from inference.
+SCORE_FEATURES = [
+    "recommended",
+    "not_recommended",
+    "season_matched",
+    "weak_recommendation",
+    "strongly_recommended",
+    "strongly_not_recommended",
+]
+
+# Named weight profiles: feature -> weight (missing features weigh 0).
+# "default" is the original scoring: ±2 per rule, ±1 season, ±3 strong labels.
+SCORE_WEIGHT_PROFILES = {
+    "default": {
+        "recommended": 2,
+        "not_recommended": -2,
+        "season_matched": 1,
+        "weak_recommendation": -1,
+        "strongly_recommended": 3,
+        "strongly_not_recommended": -3,
+    },
+    "evidence_only": {
+        "recommended": 1,
+        "not_recommended": -1,
+    },
+    "season_first": {
+        "recommended": 2,
+        "not_recommended": -2,
+        "season_matched": 4,
+        "weak_recommendation": -4,
+        "strongly_recommended": 3,
+        "strongly_not_recommended": -3,
+    },
+}
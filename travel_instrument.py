@@ -0,0 +1,320 @@
+# =============================================
+# Travel Instrumentation - Rule & Stage Timing
+# =============================================
+# Opt-in timing hooks around the rule functions (rule_*) and the pipeline
+# stages (run_inference, compute_scores, build_explanations) of travel_core,
+# plus timed blocks (stage) and point events such as result cache hits /
+# misses (record_event).
+#
+# When nothing is listening the hooks cost a single check per call, so the
+# decorators stay in place permanently.
+#
+# Usage:
+#     from travel_instrument import instrument, format_stats
+#     with instrument() as stats:
+#         state = run_inference(user, dest_facts)
+#         scores = compute_scores(state)
+#     print(format_stats(stats))
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+
+# ===========================
+# 1. Listener registry
+# ===========================
+
+# Tuple so it can be swapped atomically while other threads iterate it.
+# Each listener is called as: listener(name, started, elapsed, facts, result)
+_LISTENERS = ()
+
+# Listeners that use the facts count; without any, calls skip count_facts()
+_FACT_LISTENERS = ()
+
+# Stats collected by enable_instrumentation() (process-wide)
+_GLOBAL_STATS = {}
+
+
+def add_listener(listener, facts=True):
+    """
+    Register a callable that receives every instrumented call.
+    Signature: listener(name, started, elapsed, facts, result)
+      name    -> rule function / stage name (e.g. "rule_safety")
+      started -> time.perf_counter() value when the call began
+      elapsed -> wall time of the call in seconds
+      facts   -> number of facts the call asserted into the state
+      result  -> return value of the call
+    With facts=False the listener does not need the facts count; while only
+    such listeners are registered, calls report facts = 0 and skip counting.
+    """
+    global _LISTENERS, _FACT_LISTENERS
+    if listener not in _LISTENERS:
+        _LISTENERS = _LISTENERS + (listener,)
+        if facts:
+            _FACT_LISTENERS = _FACT_LISTENERS + (listener,)
+
+
+def remove_listener(listener):
+    """
+    Unregister a listener previously added with add_listener().
+    """
+    global _LISTENERS, _FACT_LISTENERS
+    _LISTENERS = tuple(l for l in _LISTENERS if l != listener)
+    _FACT_LISTENERS = tuple(l for l in _FACT_LISTENERS if l != listener)
+
+
+def is_active():
+    """
+    True if at least one listener is registered.
+    """
+    return len(_LISTENERS) > 0
+
+
+def record_event(name, result=None):
+    """
+    Report a point event without a duration (e.g. "cache_hit") to all
+    listeners, as a call with elapsed = 0 and no facts.
+    """
+    listeners = _LISTENERS
+    if listeners:
+        now = time.perf_counter()
+        for listener in listeners:
+            listener(name, now, 0.0, 0, result)
+
+
+# ===========================
+# 2. Fact counting
+# ===========================
+
+# State lists that hold asserted facts (besides the per-destination evidence)
+FACT_LISTS = [
+    "strongly_recommended",
+    "strongly_not_recommended",
+    "neutral",
+    "season_matched",
+    "weak_recommendation",
+    "contradictions",
+    "flags",
+    "final_recommendation",
+]
+
+
+def count_facts(state):
+    """
+    Count all facts currently asserted in an inference state:
+    evidence entries in recommended / not_recommended plus every label list.
+    """
+    total = 0
+    for rules in state["recommended"].values():
+        total += len(rules)
+    for rules in state["not_recommended"].values():
+        total += len(rules)
+    for key in FACT_LISTS:
+        total += len(state[key])
+    return total
+
+
+def _is_state(value):
+    return isinstance(value, dict) and "recommended" in value and "trace" in value
+
+
+def _find_state(args):
+    # Rule functions take the state as their last positional argument
+    for value in reversed(args):
+        if _is_state(value):
+            return value
+    return None
+
+
+# ===========================
+# 3. Decorator and timed blocks
+# ===========================
+
+def instrumented(fn):
+    """
+    Decorator for rule functions and pipeline stages.
+    Reports call timing and the number of facts asserted to all listeners.
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        listeners = _LISTENERS
+        if not listeners:
+            return fn(*args, **kwargs)
+
+        state = _find_state(args) if _FACT_LISTENERS else None
+        before = count_facts(state) if state is not None else 0
+
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+
+        if state is not None:
+            facts = count_facts(state) - before
+        elif not _FACT_LISTENERS:
+            facts = 0
+        elif _is_state(result):
+            # run_inference creates its own state
+            facts = count_facts(result)
+        else:
+            facts = 0
+
+        for listener in listeners:
+            listener(name, started, elapsed, facts, result)
+        return result
+
+    return wrapper
+
+
+# Code object shared by every instrumented wrapper; travel_profile merges its
+# frames into the function each one wraps
+WRAPPER_CODE = instrumented(lambda: None).__code__
+
+
+class _Stage:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        if _LISTENERS:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.started is not None:
+            elapsed = time.perf_counter() - self.started
+            for listener in _LISTENERS:
+                listener(self.name, self.started, elapsed, 0, None)
+        return False
+
+
+def stage(name):
+    """
+    Time a block of code that is not a function of its own:
+        with stage("render"):
+            body = json.dumps(payload)
+    Reported like an @instrumented call named name (facts = 0, result None).
+    """
+    return _Stage(name)
+
+
+# ===========================
+# 4. Stats API
+# ===========================
+
+def _stats_listener(stats):
+    """
+    Build a listener that aggregates calls into the given stats dict:
+    name -> {"calls", "total_time", "max_time", "facts"}
+    Safe to use while the engine runs on several threads.
+    """
+    lock = threading.Lock()
+
+    def listener(name, started, elapsed, facts, result):
+        with lock:
+            entry = stats.get(name)
+            if entry is None:
+                entry = {"calls": 0, "total_time": 0.0, "max_time": 0.0, "facts": 0}
+                stats[name] = entry
+            entry["calls"] += 1
+            entry["total_time"] += elapsed
+            if elapsed > entry["max_time"]:
+                entry["max_time"] = elapsed
+            entry["facts"] += facts
+    return listener
+
+
+_GLOBAL_LISTENER = _stats_listener(_GLOBAL_STATS)
+
+
+def enable_instrumentation():
+    """
+    Start collecting process-wide stats (see get_stats()).
+    """
+    add_listener(_GLOBAL_LISTENER)
+
+
+def disable_instrumentation():
+    """
+    Stop collecting process-wide stats. Collected data is kept.
+    """
+    remove_listener(_GLOBAL_LISTENER)
+
+
+def get_stats():
+    """
+    Return a copy of the process-wide stats:
+    name -> {"calls", "total_time", "max_time", "facts"}
+    """
+    return {name: dict(entry) for name, entry in _GLOBAL_STATS.items()}
+
+
+def reset_stats():
+    """
+    Clear the process-wide stats.
+    """
+    _GLOBAL_STATS.clear()
+
+
+@contextmanager
+def instrument():
+    """
+    Collect stats for the calls made inside the with-block.
+    Yields a dict that is filled while the block runs:
+    name -> {"calls", "total_time", "max_time", "facts"}
+    """
+    stats = {}
+    listener = _stats_listener(stats)
+    add_listener(listener)
+    try:
+        yield stats
+    finally:
+        remove_listener(listener)
+
+
+def format_stats(stats):
+    """
+    Format stats as a text table, slowest (by cumulative time) first.
+    """
+    lines = []
+    header = f"{'name':<30} {'calls':>7} {'total ms':>10} {'max ms':>9} {'facts':>7}"
+    lines.append(header)
+    lines.append("-" * len(header))
+
+    ordered = sorted(stats.items(), key=lambda item: item[1]["total_time"], reverse=True)
+    for name, entry in ordered:
+        lines.append(
+            f"{name:<30} {entry['calls']:>7} {entry['total_time'] * 1000:>10.3f} "
+            f"{entry['max_time'] * 1000:>9.3f} {entry['facts']:>7}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Quick report for the sample user.
+    # Go through the imported module: travel_core hooks into that copy, not __main__.
+    import travel_instrument
+    from travel_core import (
+        build_sample_user,
+        build_destination_facts,
+        run_inference,
+        compute_scores,
+        build_explanations,
+    )
+
+    user = build_sample_user()
+    dest_facts = build_destination_facts()
+
+    with travel_instrument.instrument() as stats:
+        for _ in range(1000):
+            state = run_inference(user, dest_facts)
+            compute_scores(state)
+            build_explanations(state)
+
+    print(travel_instrument.format_stats(stats))
@@ -0,0 +1,567 @@
+# =============================================
+# Travel KB - Shared-Memory Knowledge Base
+# =============================================
+# Places the compiled destination facts and travel tips once into
+# multiprocessing.shared_memory, so pool workers attach to them read-only
+# instead of each holding (or unpickling) their own copy.
+#
+# Layout of the shared block:
+#   [8 bytes header length][header JSON][fact bitmasks][name offsets]
+#   [tip offsets][name slots][names blob][tips blob]
+#
+# - header JSON: number of destinations, fact names and the bit of every fact
+# - fact bitmasks: one row of uint64 words per destination; bit b of a row is
+#   set when the destination has fact b ("expensive", "best_season=spring", ...)
+# - names: the UTF-8 destination names, back to back, with D+1 offsets, plus an
+#   open-addressing hash table (CRC-32 of the name -> row + 1) to find a row
+# - tips: the JSON-encoded tip list of every destination, back to back, with
+#   D+1 offsets
+#
+# Workers run the rules directly on read-only views with the same interface
+# as build_destination_facts() ("d in dest_facts[fact]",
+# dest_facts["best_season"][d]); tips are decoded per lookup
+# (travel_core.lookup_tips). The only per-worker state is a bounded cache of
+# name -> row (ROW_CACHE_SIZE), so a worker's memory does not grow with the
+# catalog and the KB is held once however many workers attach.
+#
+# Usage:
+#     kb = SharedKB()                                  # parent: publish once
+#     pool = ProcessPoolExecutor(initializer=init_worker, initargs=(kb.name,))
+#     ...
+#     kb.close(); kb.unlink()
+#
+# The same module provides KBSnapshot (section 4): a frozen, hashable copy of
+# the knowledge base for in-process (threaded) use.
+
+import hashlib
+import json
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Mapping, Sequence, Set
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+from travel_info import (
+    DESTINATIONS,
+    TRAVEL_TIPS,
+    RULE_CATEGORY,
+    RULE_LOGIC,
+    EXPLANATIONS,
+    build_destination_facts,
+)
+
+
+# ===========================
+# 1. Publishing
+# ===========================
+
+def _fact_bits(dest_facts):
+    """
+    Assign a bit to every fact of a dest_facts dict.
+    List facts ("expensive": [dest, ...]) get one bit; mapping facts
+    ("best_season": {dest: [value, ...]}) get one bit per distinct value.
+    Returns (fact -> bit or {value: bit}, number of bits).
+    """
+    bits = {}
+    count = 0
+    for fact, members in dest_facts.items():
+        if isinstance(members, dict):
+            values = list(dict.fromkeys(v for dest_values in members.values() for v in dest_values))
+            bits[fact] = {value: count + i for i, value in enumerate(values)}
+            count += len(values)
+        else:
+            bits[fact] = count
+            count += 1
+    return bits, count
+
+
+def _offsets(blobs):
+    # D+1 start offsets of blobs stored back to back
+    offsets = array("Q", [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return offsets
+
+
+def _slot(name):
+    # Hash of a UTF-8 name; stable across processes, unlike hash()
+    return zlib.crc32(name)
+
+
+def _name_slots(names):
+    """
+    Open-addressing hash table over the encoded names: a power-of-two number
+    of uint32 slots (at least twice the names), each 0 or row + 1.
+    """
+    size = 8
+    while size < 2 * len(names):
+        size *= 2
+    slots = array("I", bytes(4 * size))
+    for row, name in enumerate(names):
+        slot = _slot(name) & (size - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = row + 1
+    return slots
+
+
+def _layout(header_len, count, words, slot_count, names_size):
+    """
+    Start offset of every section of the shared block (the tips blob runs to
+    the end); the uint64 sections come first, 8-byte aligned.
+    """
+    at = 8 + header_len
+    at += -at % 8
+    layout = {"masks": at}
+    layout["name_offsets"] = layout["masks"] + 8 * count * words
+    layout["tip_offsets"] = layout["name_offsets"] + 8 * (count + 1)
+    layout["slots"] = layout["tip_offsets"] + 8 * (count + 1)
+    layout["names"] = layout["slots"] + 4 * slot_count
+    layout["tips"] = layout["names"] + names_size
+    return layout
+
+
+class SharedKB:
+    """
+    Owner of a shared-memory copy of the knowledge base.
+    Create it once in the parent process; workers attach by name with attach_kb().
+    """
+
+    def __init__(self, dest_facts=None, destinations=DESTINATIONS, tips=TRAVEL_TIPS, name=None):
+        if dest_facts is None:
+            dest_facts = build_destination_facts()
+        destinations = list(destinations)
+        index = {d: i for i, d in enumerate(destinations)}
+
+        bits, bit_count = _fact_bits(dest_facts)
+        words = max(1, (bit_count + 63) // 64)
+
+        # Fact bitmasks, row per destination
+        masks = array("Q", bytes(8 * len(destinations) * words))
+
+        def set_bit(d, bit):
+            i = index.get(d)
+            if i is not None:
+                masks[i * words + bit // 64] |= 1 << (bit % 64)
+
+        for fact, members in dest_facts.items():
+            if isinstance(members, dict):
+                for d, values in members.items():
+                    for value in values:
+                        set_bit(d, bits[fact][value])
+            else:
+                for d in members:
+                    set_bit(d, bits[fact])
+
+        # Names: UTF-8 blob + offsets, and a hash table to find a row by name
+        names = [d.encode("utf-8") for d in destinations]
+        name_offsets = _offsets(names)
+        slots = _name_slots(names)
+
+        # Tips: JSON list per destination + offsets
+        blobs = [json.dumps(tips.get(d, [])).encode("utf-8") for d in destinations]
+        tip_offsets = _offsets(blobs)
+
+        header = json.dumps({
+            "version": 2,
+            "count": len(destinations),
+            "bits": bits,
+            "words": words,
+            "slots": len(slots),
+            "names_size": name_offsets[-1],
+        }).encode("utf-8")
+
+        layout = _layout(len(header), len(destinations), words, len(slots), name_offsets[-1])
+        size = layout["tips"] + tip_offsets[-1]
+
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        buf = self.shm.buf
+        struct.pack_into("<Q", buf, 0, len(header))
+        buf[8:8 + len(header)] = header
+        buf[layout["masks"]:layout["name_offsets"]] = masks.tobytes()
+        buf[layout["name_offsets"]:layout["tip_offsets"]] = name_offsets.tobytes()
+        buf[layout["tip_offsets"]:layout["slots"]] = tip_offsets.tobytes()
+        buf[layout["slots"]:layout["names"]] = slots.tobytes()
+        buf[layout["names"]:layout["tips"]] = b"".join(names)
+        buf[layout["tips"]:size] = b"".join(blobs)
+
+        self.name = self.shm.name
+        self.size = size
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        """
+        Remove the shared block (call once, after the workers are done).
+        """
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        self.unlink()
+
+
+# ===========================
+# 2. Read-only views
+# ===========================
+
+class FactView(Set):
+    """
+    Destinations that have one fact, e.g. dest_facts["expensive"].
+    """
+
+    def __init__(self, kb, bit):
+        self.kb = kb
+        self.rows = kb.rows
+        self.masks = kb.masks
+        self.words = kb.words
+        self.word = bit // 64
+        self.mask = 1 << (bit % 64)
+
+    def __contains__(self, d):
+        # Inlined cache hit: the rules test every destination of every fact
+        i = self.rows.get(d)
+        if i is None:
+            i = self.kb.row(d)
+        return i >= 0 and (self.masks[i * self.words + self.word] & self.mask) != 0
+
+    def __iter__(self):
+        for d in self.kb.destinations:
+            if d in self:
+                yield d
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class ValuesView(Mapping):
+    """
+    dest -> list of values for a mapping fact, e.g. dest_facts["best_season"][d].
+    Destinations without any value are not in the mapping.
+    """
+
+    def __init__(self, kb, value_bits):
+        self.kb = kb
+        self.values = [(value, bit // 64, 1 << (bit % 64)) for value, bit in value_bits.items()]
+        # word -> bits of all values, to test "has any value" without listing them
+        self.any = {}
+        for _, word, mask in self.values:
+            self.any[word] = self.any.get(word, 0) | mask
+        self.any = list(self.any.items())
+
+    def _row_values(self, i):
+        row = i * self.kb.words
+        masks = self.kb.masks
+        return [value for value, word, mask in self.values if masks[row + word] & mask]
+
+    def __getitem__(self, d):
+        i = self.kb.row(d)
+        if i >= 0:
+            values = self._row_values(i)
+            if values:
+                return values
+        raise KeyError(d)
+
+    def __contains__(self, d):
+        i = self.kb.row(d)
+        if i < 0:
+            return False
+        row = i * self.kb.words
+        masks = self.kb.masks
+        return any(masks[row + word] & mask for word, mask in self.any)
+
+    def __iter__(self):
+        for d in self.kb.destinations:
+            if d in self:
+                yield d
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class TipsView(Mapping):
+    """
+    dest -> list of tips, decoded from the shared blob on access.
+    """
+
+    def __init__(self, kb):
+        self.kb = kb
+
+    def __getitem__(self, d):
+        i = self.kb.row(d)
+        if i < 0:
+            raise KeyError(d)
+        start, stop = self.kb.tip_offsets[i], self.kb.tip_offsets[i + 1]
+        return json.loads(bytes(self.kb.tips_blob[start:stop]))
+
+    def __iter__(self):
+        return iter(self.kb.destinations)
+
+    def __len__(self):
+        return len(self.kb.destinations)
+
+
+class NamesView(Sequence):
+    """
+    Destination names in catalog order, decoded from the shared blob on access.
+    """
+
+    def __init__(self, kb):
+        self.kb = kb
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.kb.name(i)
+
+    def __len__(self):
+        return self.kb.count
+
+
+# Rows remembered per attachment (about 1 MB for 20,000 names; the keys are the
+# caller's own strings). Beyond this, names are looked up in the shared hash
+# table every time, which is about 10x slower than a cache hit.
+ROW_CACHE_SIZE = 1 << 16
+
+
+class AttachedKB:
+    """
+    Read-only attachment to a SharedKB.
+      destinations -> sequence of destination names
+      dest_facts   -> view usable wherever build_destination_facts() is
+      tips         -> view usable like TRAVEL_TIPS
+
+    Everything is read from the shared block; the attachment itself only
+    keeps rows, a cache of up to ROW_CACHE_SIZE looked-up names.
+    """
+
+    def __init__(self, name):
+        self.shm = _attach(name)
+        buf = self.shm.buf.toreadonly()
+
+        (header_len,) = struct.unpack_from("<Q", buf, 0)
+        header = json.loads(bytes(buf[8:8 + header_len]))
+        self.count = header["count"]
+        self.words = header["words"]
+        layout = _layout(header_len, self.count, self.words, header["slots"], header["names_size"])
+
+        # Views straight into the shared block: nothing is copied
+        self.masks = buf[layout["masks"]:layout["name_offsets"]].cast("Q")
+        self.name_offsets = buf[layout["name_offsets"]:layout["tip_offsets"]].cast("Q")
+        self.tip_offsets = buf[layout["tip_offsets"]:layout["slots"]].cast("Q")
+        self.slots = buf[layout["slots"]:layout["names"]].cast("I")
+        self.names_blob = buf[layout["names"]:layout["tips"]]
+        self.tips_blob = buf[layout["tips"]:]
+
+        self.rows = {}
+        self.destinations = NamesView(self)
+        self.dest_facts = {}
+        for fact, bit in header["bits"].items():
+            if isinstance(bit, dict):
+                self.dest_facts[fact] = ValuesView(self, bit)
+            else:
+                self.dest_facts[fact] = FactView(self, bit)
+        self.tips = TipsView(self)
+
+    def name(self, i):
+        """
+        Name of the destination in row i.
+        """
+        return bytes(self.names_blob[self.name_offsets[i]:self.name_offsets[i + 1]]).decode("utf-8")
+
+    def row(self, d):
+        """
+        Row of destination d, or -1 when it is not in the catalog.
+        """
+        i = self.rows.get(d)
+        if i is None:
+            i = self._find(d)
+            if len(self.rows) < ROW_CACHE_SIZE:
+                self.rows[d] = i
+        return i
+
+    def _find(self, d):
+        # Probe the shared hash table; slots hold row + 1, 0 ends the chain
+        if not isinstance(d, str):
+            return -1
+        key = d.encode("utf-8")
+        last = len(self.slots) - 1
+        slot = _slot(key) & last
+        while True:
+            row = self.slots[slot] - 1
+            if row < 0:
+                return -1
+            if self.names_blob[self.name_offsets[row]:self.name_offsets[row + 1]] == key:
+                return row
+            slot = (slot + 1) & last
+
+    def close(self):
+        for view in (self.masks, self.name_offsets, self.tip_offsets, self.slots,
+                     self.names_blob, self.tips_blob):
+            view.release()
+        self.shm.close()
+
+
+def _attach(name):
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before 3.13 attaching registers the block with the resource tracker again.
+    # Pool workers share the owner's tracker, so this is a no-op there and the
+    # block is only unlinked by the owner.
+    return shared_memory.SharedMemory(name=name)
+
+
+def attach_kb(name):
+    """
+    Attach to a knowledge base published with SharedKB.
+    """
+    return AttachedKB(name)
+
+
+# ===========================
+# 3. Pool workers
+# ===========================
+
+# Attachment of the current worker process (kept alive for the process lifetime)
+_WORKER_KB = []
+
+
+def init_worker(name):
+    """
+    ProcessPoolExecutor initializer: attach to the shared KB, make its fact
+    views what travel_core.shared_dest_facts() returns and its tips what
+    travel_core.lookup_tips() reads.
+    """
+    from travel_core import use_shared_dest_facts, use_shared_tips
+
+    kb = attach_kb(name)
+    _WORKER_KB[:] = [kb]
+    use_shared_dest_facts(kb.dest_facts)
+    use_shared_tips(kb.tips)
+    return kb
+
+
+# ===========================
+# 4. Frozen snapshot
+# ===========================
+
+class FrozenMapping(Mapping):
+    """
+    Read-only, hashable dict wrapper (values must be hashable too).
+    """
+
+    __slots__ = ("_data", "_hash")
+
+    def __init__(self, data=()):
+        self._data = dict(data)
+        self._hash = None
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def __repr__(self):
+        return f"FrozenMapping({self._data!r})"
+
+
+def _freeze(value):
+    """
+    Recursively convert dicts / lists / sets into FrozenMapping / tuple / frozenset.
+    """
+    if isinstance(value, Mapping):
+        return FrozenMapping((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _plain(value):
+    # JSON-ready form of a frozen value, with a stable order (for the digest)
+    if isinstance(value, Mapping):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, frozenset):
+        return sorted(_plain(v) for v in value)
+    if isinstance(value, tuple):
+        return [_plain(v) for v in value]
+    return value
+
+
+@dataclass(frozen=True, eq=False)
+class KBSnapshot:
+    """
+    Immutable copy of the knowledge base.
+
+      destinations -> tuple of destination names
+      facts        -> like build_destination_facts(), with frozensets for the
+                      list facts and dest -> tuple for "best_season"
+      tips, explanations -> frozen copies of the travel_info tables, read by
+                      the thread-safe API in travel_core (lookup_tips, explanations)
+      digest       -> SHA-256 of the content plus RULE_LOGIC and RULE_CATEGORY
+                      (trace text and categories); equal snapshots have equal digests
+
+    Later changes to travel_info or to the dicts it was built from do not
+    affect a snapshot, so it can be shared between threads without copies.
+    Snapshots compare and hash by digest.
+    """
+
+    destinations: tuple
+    facts: FrozenMapping
+    tips: FrozenMapping
+    explanations: FrozenMapping
+    digest: str
+
+    def __eq__(self, other):
+        return isinstance(other, KBSnapshot) and self.digest == other.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+
+def snapshot_kb(dest_facts=None, destinations=DESTINATIONS, tips=TRAVEL_TIPS):
+    """
+    Build a KBSnapshot from the given facts (default: build_destination_facts())
+    and the current travel_info tables.
+    """
+    if dest_facts is None:
+        dest_facts = build_destination_facts()
+
+    facts = FrozenMapping(
+        (fact, _freeze(members) if isinstance(members, Mapping) else frozenset(members))
+        for fact, members in dest_facts.items()
+    )
+    parts = {
+        "destinations": tuple(destinations),
+        "facts": facts,
+        "tips": _freeze(tips),
+        "explanations": _freeze(EXPLANATIONS),
+    }
+    # The rules read trace text and categories from travel_info; they still version the results
+    versioned = dict(parts, rule_logic=RULE_LOGIC, rule_category=RULE_CATEGORY)
+    content = json.dumps({name: _plain(value) for name, value in versioned.items()}, sort_keys=True)
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return KBSnapshot(digest=digest, **parts)
@@ -0,0 +1,330 @@
+# =============================================
+# Travel Memory - Memory Footprint per Pipeline Stage
+# =============================================
+# Runs the recommendation pipeline for one profile under tracemalloc and
+# attributes the memory to what holds it:
+#
+#   knowledge_base   destination facts and tips of the catalog
+#   inference_state  state built by run_inference (evidence, labels, cube),
+#                    without the trace
+#   trace            the state["trace"] strings
+#   scores           compute_scores + the full ranking
+#   explanations     build_explanations (every destination)
+#   chart_data       rule frequencies, category contributions and matrices
+#   figures          2D and 3D statistics figures, drawn once
+#
+# Per stage the report lists the memory still held afterwards ("retained"),
+# the transient peak while the stage ran, the change of the resident set size
+# (where /proc is available: it also sees buffers tracemalloc cannot, such as
+# the Agg pixel buffers of figures) and the top allocation sites.
+#
+# The trace is measured by what dropping it frees at the end of the run, and
+# that amount is taken out of inference_state.
+#
+# Catalogs are grown with --copies N (the built-in destinations N times, copy 0
+# keeps the original names) or loaded from a JSON catalog (travel_shard format).
+# Reports can be saved as JSON and two of them compared.
+#
+# Usage:
+#     python travel_memory.py run --copies 1000 --output big.json
+#     python travel_memory.py run --user '{"budget": "low"}' --copies 10
+#     python travel_memory.py compare small.json big.json
+
+import argparse
+import gc
+import json
+import os
+import tracemalloc
+
+from travel_info import DESTINATIONS, TRAVEL_TIPS, build_destination_facts
+from travel_core import (
+    build_sample_user,
+    normalize_user,
+    run_inference,
+    compute_scores,
+    rank_destinations,
+    build_explanations,
+)
+from travel_plot import (
+    compute_rule_frequency,
+    compute_category_contributions,
+    compute_dest_category_matrices,
+    statistics_figure,
+)
+
+
+STAGES = ["knowledge_base", "inference_state", "trace", "scores", "explanations", "chart_data", "figures"]
+
+# Allocation sites listed per stage
+TOP_SITES = 5
+
+
+# ===========================
+# 1. Catalogs
+# ===========================
+
+def scaled_catalog(copies=1):
+    """
+    (destinations, dest_facts, tips) with the built-in catalog repeated
+    copies times; copy i > 0 names its destinations <name>_<i>.
+    Every size is built the same way (facts in sets, so the rules stay linear
+    in the catalog size, and a copied tips list per destination), so reports
+    of different sizes can be compared.
+    """
+    facts = build_destination_facts()
+    copies = max(copies, 1)
+
+    def name(d, i):
+        return d if i == 0 else f"{d}_{i}"
+
+    destinations = [name(d, i) for i in range(copies) for d in DESTINATIONS]
+    dest_facts = {}
+    for key, value in facts.items():
+        if isinstance(value, dict):
+            dest_facts[key] = {name(d, i): v for i in range(copies) for d, v in value.items()}
+        else:
+            dest_facts[key] = {name(d, i) for i in range(copies) for d in value}
+    tips = {name(d, i): list(TRAVEL_TIPS.get(d, [])) for i in range(copies) for d in DESTINATIONS}
+    return destinations, dest_facts, tips
+
+
+def file_catalog(path):
+    """
+    (destinations, dest_facts, tips) of a JSON catalog (see travel_shard.load_catalog).
+    """
+    from travel_shard import load_catalog
+    destinations, facts = load_catalog(path)
+    dest_facts = {key: value if isinstance(value, dict) else set(value) for key, value in facts.items()}
+    return destinations, dest_facts, {}
+
+
+# ===========================
+# 2. Measuring one stage
+# ===========================
+
+def resident_bytes():
+    """
+    Current resident set size of the process, or None where /proc is missing.
+    """
+    # os.read instead of open(): no file object whose buffers would show up in the report
+    try:
+        fd = os.open("/proc/self/statm", os.O_RDONLY)
+        try:
+            return int(os.read(fd, 256).split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        finally:
+            os.close(fd)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def site_label(frame):
+    return f"{os.path.basename(frame.filename)}:{frame.lineno}"
+
+
+class StageRecorder:
+    """
+    Measures stages one after another: measure(name, fn) runs fn, keeps its
+    result alive and records what the stage allocated.
+    """
+
+    def __init__(self, top=TOP_SITES):
+        self.top = top
+        self.stages = {}
+        self.ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        # First calls fill caches (filter patterns, file encodings) that would count as retained
+        self._snapshot()
+        resident_bytes()
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self.ignore)
+
+    def measure(self, name, fn):
+        gc.collect()
+        before = self._snapshot()
+        rss_before = resident_bytes()
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+        result = fn()
+
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        rss_after = resident_bytes()
+        diff = self._snapshot().compare_to(before, "lineno")
+        sites = [(site_label(stat.traceback[0]), stat.size_diff) for stat in diff if stat.size_diff > 0]
+
+        self.stages[name] = {
+            "retained": current - start,
+            "peak": max(peak - start, current - start),
+            "rss": None if rss_before is None else rss_after - rss_before,
+            "sites": sites[:self.top],
+        }
+        return result
+
+    def measure_release(self, name, release):
+        """
+        Record the memory freed by release() as the size of a stage's data.
+        """
+        gc.collect()
+        start = tracemalloc.get_traced_memory()[0]
+        release()
+        gc.collect()
+        freed = start - tracemalloc.get_traced_memory()[0]
+        self.stages[name] = {"retained": freed, "peak": freed, "rss": None, "sites": []}
+        return freed
+
+
+# ===========================
+# 3. Memory report
+# ===========================
+
+def memory_report(user=None, copies=1, catalog=None, figures=True, top=TOP_SITES, frames=1):
+    """
+    Run the pipeline for one profile under tracemalloc.
+    user    -> raw profile (normalized; default: build_sample_user())
+    copies  -> catalog size as a multiple of the built-in destinations
+    catalog -> JSON catalog file instead of copies
+    Returns a JSON-ready report: {"user", "destinations", "stages", "total"}.
+    """
+    user = build_sample_user() if user is None else normalize_user(user)
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(frames)
+    recorder = StageRecorder(top)
+    held = {}
+    try:
+        if catalog is not None:
+            destinations, dest_facts, tips = recorder.measure("knowledge_base", lambda: file_catalog(catalog))
+        else:
+            destinations, dest_facts, tips = recorder.measure("knowledge_base", lambda: scaled_catalog(copies))
+
+        state = recorder.measure("inference_state", lambda: run_inference(user, dest_facts, destinations))
+
+        def score():
+            scores = compute_scores(state)
+            return scores, rank_destinations(scores, destinations=destinations)
+        scores, held["ranking"] = recorder.measure("scores", score)
+
+        held["explanations"] = recorder.measure("explanations", lambda: build_explanations(state))
+
+        held["chart_data"] = recorder.measure("chart_data", lambda: (
+            compute_rule_frequency(state),
+            compute_category_contributions(state),
+            compute_dest_category_matrices(state),
+        ))
+
+        if figures:
+            def draw():
+                drawn = [statistics_figure(state, scores, kind) for kind in ("2d", "3d")]
+                for fig in drawn:
+                    fig.canvas.draw()
+                return drawn
+            held["figures"] = recorder.measure("figures", draw)
+
+        # Size of the trace: what dropping it frees (taken out of inference_state)
+        trace = recorder.measure_release("trace", lambda: state.pop("trace"))
+        recorder.stages["inference_state"]["retained"] -= trace
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    stages = {name: recorder.stages[name] for name in STAGES if name in recorder.stages}
+    return {
+        "user": {field: value for field, value in user.items() if field != "id"},
+        "destinations": len(destinations),
+        "stages": stages,
+        "total": sum(stage["retained"] for stage in stages.values()),
+    }
+
+
+def format_bytes(n):
+    if n is None:
+        return "-"
+    sign = "-" if n < 0 else ""
+    n = abs(n)
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return f"{sign}{n:.0f} {unit}" if unit == "B" else f"{sign}{n:.1f} {unit}"
+        n /= 1024
+    return f"{sign}{n:.2f} GiB"
+
+
+def format_report(report):
+    """
+    Text table of a report: one row per stage, then its top allocation sites.
+    """
+    lines = [f"Memory per stage, {report['destinations']} destinations", ""]
+    lines.append(f"{'stage':<18} {'retained':>12} {'peak':>12} {'rss':>12}")
+    for name, stage in report["stages"].items():
+        lines.append(f"{name:<18} {format_bytes(stage['retained']):>12} {format_bytes(stage['peak']):>12} "
+                     f"{format_bytes(stage['rss']):>12}")
+    lines.append(f"{'total':<18} {format_bytes(report['total']):>12}")
+
+    for name, stage in report["stages"].items():
+        if stage["sites"]:
+            lines.append("")
+            lines.append(f"{name}:")
+            for site, size in stage["sites"]:
+                lines.append(f"  {format_bytes(size):>12}  {site}")
+    return "\n".join(lines)
+
+
+def compare_reports(old, new):
+    """
+    Text table of the retained memory per stage of two reports.
+    The total only adds up the stages both reports measured; stages missing
+    from one report (e.g. figures skipped with --no-figures) are listed after it.
+    """
+    shared = [name for name in STAGES if name in old["stages"] and name in new["stages"]]
+    missing = [name for name in STAGES if (name in old["stages"]) != (name in new["stages"])]
+
+    lines = [f"{'stage':<18} {'old':>12} {'new':>12} {'change':>12} {'ratio':>8}"]
+    rows = [(name, old["stages"][name]["retained"], new["stages"][name]["retained"]) for name in shared]
+    rows.append(("total", sum(a for _, a, _ in rows), sum(b for _, _, b in rows)))
+    for name in missing:
+        rows.append((name, old["stages"].get(name, {}).get("retained"), new["stages"].get(name, {}).get("retained")))
+    for name, a, b in rows:
+        change = None if a is None or b is None else b - a
+        ratio = f"{b / a:.2f}x" if a and b is not None else "-"
+        lines.append(f"{name:<18} {format_bytes(a):>12} {format_bytes(b):>12} {format_bytes(change):>12} {ratio:>8}")
+    lines.append(f"{'destinations':<18} {old['destinations']:>12} {new['destinations']:>12}")
+    if missing:
+        lines.append("")
+        lines.append(f"note: {', '.join(missing)} measured in only one report, not included in the total")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory footprint of the travel advisor pipeline per stage.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="measure one profile")
+    run.add_argument("--user", default=None, help="JSON profile (default: the sample user)")
+    run.add_argument("--copies", type=int, default=1, help="catalog size as a multiple of the built-in destinations")
+    run.add_argument("--catalog", default=None, help="JSON catalog file (travel_shard format) instead of --copies")
+    run.add_argument("--no-figures", action="store_true", help="skip the figures stage")
+    run.add_argument("--top", type=int, default=TOP_SITES, help="allocation sites listed per stage")
+    run.add_argument("--frames", type=int, default=1, help="traceback depth recorded by tracemalloc")
+    run.add_argument("--output", metavar="FILE", default=None, help="also save the report as JSON")
+
+    compare = commands.add_parser("compare", help="compare two saved reports")
+    compare.add_argument("old")
+    compare.add_argument("new")
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        user = json.loads(args.user) if args.user is not None else None
+        report = memory_report(user, args.copies, args.catalog, not args.no_figures, args.top, args.frames)
+        if args.output is not None:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        print(format_report(report))
+        if args.output is not None:
+            print(f"\nSaved to {args.output}")
+    else:
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        print(compare_reports(old, new))
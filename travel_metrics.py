@@ -0,0 +1,336 @@
+# =============================================
+# Travel Metrics - Prometheus Counters and Latency Histograms
+# =============================================
+# A metrics registry fed by the instrumentation hooks of travel_instrument:
+#
+#   travel_inferences_total                  inference runs (cache hits excluded)
+#   travel_rules_fired_total{rule,category}  trace entries per rule (category from RULE_CATEGORY)
+#   travel_contradictions_total              destinations flagged by R22
+#   travel_cache_hits_total                  result cache hits (travel_cache)
+#   travel_cache_misses_total                result cache misses
+#   travel_stage_duration_seconds{stage}     latency histogram per pipeline stage
+#
+# Stages: inference (run_inference), scoring (compute_scores), explanations
+# (explain_destination, one observation per destination explained) and
+# chart_prep (travel_plot.compute_rule_frequency / compute_dest_category_matrices).
+#
+# Output is the Prometheus text exposition format, served over HTTP on a local
+# port (serve_metrics) or written to a file (write_metrics, e.g. for the
+# node_exporter textfile collector).
+#
+# Work done in pool processes is counted there: call_with_metrics() runs one
+# task with a fresh registry listening and returns its snapshot, which the
+# parent merges (travel_server, travel_core --batch --metrics).
+#
+# Usage:
+#     from travel_metrics import enable_metrics, serve_metrics
+#     enable_metrics()                      # start counting in this process
+#     serve_metrics(9464)                   # GET http://127.0.0.1:9464/metrics
+#
+#     python travel_core.py --batch profiles.jsonl --metrics batch.prom > results.jsonl
+
+import argparse
+import bisect
+import os
+import sys
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from travel_info import RULE_CATEGORY
+from travel_instrument import add_listener, remove_listener
+from travel_codec import TRACE_LINES
+from travel_trace import TraceBuffer
+
+
+# ===========================
+# 1. Metric definitions
+# ===========================
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name -> (type, labelled, help); unlabelled counters are always exposed, starting at 0
+METRICS = {
+    "travel_inferences_total": ("counter", False, "Inference runs (result cache hits excluded)."),
+    "travel_rules_fired_total": ("counter", True, "Rule firings recorded in the reasoning trace."),
+    "travel_contradictions_total": ("counter", False, "Destinations with contradicting rules (R22)."),
+    "travel_cache_hits_total": ("counter", False, "Result cache hits."),
+    "travel_cache_misses_total": ("counter", False, "Result cache misses."),
+    "travel_stage_duration_seconds": ("histogram", True, "Latency of one call of a pipeline stage."),
+}
+
+# Instrumented function -> stage label
+STAGES = {
+    "run_inference": "inference",
+    "compute_scores": "scoring",
+    "explain_destination": "explanations",
+    "compute_rule_frequency": "chart_prep",
+    "compute_dest_category_matrices": "chart_prep",
+}
+
+# Upper bounds in seconds; one profile takes ~0.1 ms, a 20k-destination catalog ~0.2 s
+BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+UNCATEGORIZED = "Other"
+
+# Sample key of travel_rules_fired_total per rule that writes trace lines
+_RULE_KEYS = {
+    rule: ("travel_rules_fired_total", (("rule", rule), ("category", RULE_CATEGORY.get(rule, UNCATEGORIZED))))
+    for rule in TRACE_LINES
+}
+
+
+# ===========================
+# 2. Registry
+# ===========================
+
+class Metrics:
+    """
+    Thread-safe counters and histograms. Samples are keyed by
+    (metric name, label pairs); register listener() with
+    travel_instrument.add_listener to feed it.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counters = {}      # (name, labels) -> value
+        self.histograms = {}    # (name, labels) -> [bucket counts..., +Inf count, sum]
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            row = self.histograms.get(key)
+            if row is None:
+                row = self.histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[slot] += 1
+            row[-1] += value
+
+    # ---- instrumentation listener ----
+
+    def listener(self, name, started, elapsed, facts, result):
+        if name == "cache_hit":
+            self.inc("travel_cache_hits_total")
+            return
+        if name == "cache_miss":
+            self.inc("travel_cache_misses_total")
+            return
+
+        stage = STAGES.get(name)
+        if stage is None:
+            return
+        self.observe("travel_stage_duration_seconds", (("stage", stage),), elapsed)
+        if name == "run_inference":
+            self.count_inference(result)
+
+    def count_inference(self, state):
+        trace = state["trace"]
+        if isinstance(trace, TraceBuffer):
+            fired = trace.rule_counts    # counts dropped lines too
+        else:
+            fired = Counter([line[:line.find(":")] for line in trace])
+
+        with self.lock:
+            counters = self.counters
+            key = ("travel_inferences_total", ())
+            counters[key] = counters.get(key, 0) + 1
+            key = ("travel_contradictions_total", ())
+            counters[key] = counters.get(key, 0) + len(state["contradictions"])
+            for rule, count in fired.items():
+                key = _RULE_KEYS.get(rule)
+                if key is not None:
+                    counters[key] = counters.get(key, 0) + count
+
+    # ---- snapshots (for merging pool workers) ----
+
+    def snapshot(self):
+        """
+        Picklable copy of all samples.
+        """
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {key: list(row) for key, row in self.histograms.items()},
+            }
+
+    def merge(self, snapshot):
+        """
+        Add the samples of a snapshot (same buckets) to this registry.
+        """
+        with self.lock:
+            for key, value in snapshot["counters"].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, other in snapshot["histograms"].items():
+                row = self.histograms.get(key)
+                if row is None:
+                    self.histograms[key] = list(other)
+                else:
+                    for i, value in enumerate(other):
+                        row[i] += value
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    # ---- exposition ----
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, (kind, labelled, text) in METRICS.items():
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                samples = sorted((labels, value) for (metric, labels), value in snapshot["counters"].items()
+                                 if metric == name)
+                if not samples and not labelled:
+                    samples = [((), 0)]
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+            else:
+                samples = sorted((labels, row) for (metric, labels), row in snapshot["histograms"].items()
+                                 if metric == name)
+                for labels, row in samples:
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + ("+Inf",), row):
+                        cumulative += count
+                        le = bound if bound == "+Inf" else format_value(bound)
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {format_value(row[-1])}")
+                    lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+# ===========================
+# 3. Process-wide registry
+# ===========================
+
+REGISTRY = Metrics()
+
+
+def enable_metrics():
+    """
+    Start feeding REGISTRY from the instrumentation hooks of this process.
+    """
+    add_listener(REGISTRY.listener, facts=False)
+
+
+def disable_metrics():
+    remove_listener(REGISTRY.listener)
+
+
+def call_with_metrics(fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) with a fresh registry listening.
+    Returns (result, snapshot); meant for pool workers, whose counts the
+    parent merges into its own registry.
+    """
+    metrics = Metrics()
+    add_listener(metrics.listener, facts=False)
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        remove_listener(metrics.listener)
+    return result, metrics.snapshot()
+
+
+def write_metrics(path, metrics=REGISTRY):
+    """
+    Write the exposition text to path (atomically, so a scraper never reads
+    a half-written file).
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(metrics.render())
+    os.replace(tmp, path)
+
+
+# ===========================
+# 4. HTTP endpoint
+# ===========================
+
+def serve_metrics(port=9464, host="127.0.0.1", metrics=REGISTRY):
+    """
+    Serve GET /metrics on a daemon thread. Returns the HTTP server
+    (call shutdown() to stop it; port 0 picks a free port, see server_address).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0].rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="travel-metrics", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate JSONL profiles and expose the travel advisor metrics.")
+    parser.add_argument("input", help="JSONL profiles ('-' for stdin)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes")
+    parser.add_argument("--explain", action="store_true", help="also build explanations")
+    parser.add_argument("--output", metavar="FILE", default=None, help="write the metrics to FILE (default: stdout)")
+    parser.add_argument("--port", type=int, default=None, help="afterwards, serve /metrics on this port until Ctrl+C")
+    args = parser.parse_args()
+
+    from travel_core import run_batch
+
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        with open(os.devnull, "w") as results:
+            count = run_batch(infile, results, workers=args.workers, explain=args.explain, metrics=REGISTRY)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+
+    if args.output is not None:
+        write_metrics(args.output)
+        print(f"Wrote metrics of {count} profiles to {args.output}")
+    elif args.port is None:
+        sys.stdout.write(REGISTRY.render())
+
+    if args.port is not None:
+        server = serve_metrics(args.port)
+        print(f"Serving metrics of {count} profiles on http://127.0.0.1:{server.server_address[1]}/metrics")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
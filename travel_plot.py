@@ -3,30 +3,42 @@
 # =============================================
 # This file contains all plotting and visualization functions for the travel advisor system
 
+import io
+
 import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
 # Import static data needed for plotting
-from travel_info import DESTINATIONS, RULE_CATEGORY
+from travel_info import RULE_CATEGORY
+
+# Opt-in timing hooks (chart preparation is a pipeline stage)
+from travel_instrument import instrumented
+
+# Destination × category × polarity counts (built once by run_inference)
+from travel_cube import CATEGORIES, state_cube
+
+# Rule counts stay exact when the trace retention policy dropped lines
+from travel_trace import trace_rule_counts
+
+# Figure sizes (inches) of the 2D and 3D statistics figures
+STATISTICS_SIZE = (14, 10)
+STATISTICS_3D_SIZE = (16, 5)
 
 
 # ===========================
 # Helper Functions for Plotting Data
 # ===========================
 
+@instrumented
 def compute_rule_frequency(state):
     """
     Count how many times each rule fired during inference.
     Returns a dict: rule_name -> count
     """
-    counts = {}
-    for entry in state["trace"]:
-        # Each trace line starts with something like: "R4_culture_history: ..."
-        parts = entry.split(":", 1)
-        if len(parts) > 0:
-            rule = parts[0].strip()
-            if rule != "":
-                counts[rule] = counts.get(rule, 0) + 1
-    return counts
+    # Each trace line starts with something like: "R4_culture_history: ..."
+    return trace_rule_counts(state["trace"])
 
 
 def compute_category_contributions(state):
@@ -42,6 +54,7 @@ def compute_category_contributions(state):
     return cat_counts
 
 
+@instrumented
 def compute_dest_category_matrices(state):
     """
     Build matrices counting how many positive / negative rules
@@ -52,40 +65,8 @@ def compute_dest_category_matrices(state):
       pos_matrix   -> dict: dest -> dict: category -> count
       neg_matrix   -> dict: dest -> dict: category -> count
     """
-    # Collect all categories used in RULE_CATEGORY
-    categories = []
-    for rule_name in RULE_CATEGORY:
-        cat = RULE_CATEGORY[rule_name]
-        if cat not in categories:
-            categories.append(cat)
-
-    # Initialize matrices
-    pos_matrix = {}
-    neg_matrix = {}
-    for d in DESTINATIONS:
-        pos_matrix[d] = {}
-        neg_matrix[d] = {}
-        for c in categories:
-            pos_matrix[d][c] = 0
-            neg_matrix[d][c] = 0
-
-    # Count positive rules per category per destination
-    for d in DESTINATIONS:
-        for rule_name in state["recommended"][d]:
-            cat = RULE_CATEGORY.get(rule_name, "Other")
-            if cat not in pos_matrix[d]:
-                pos_matrix[d][cat] = 0
-            pos_matrix[d][cat] = pos_matrix[d][cat] + 1
-
-    # Count negative rules per category per destination
-    for d in DESTINATIONS:
-        for rule_name in state["not_recommended"][d]:
-            cat = RULE_CATEGORY.get(rule_name, "Other")
-            if cat not in neg_matrix[d]:
-                neg_matrix[d][cat] = 0
-            neg_matrix[d][cat] = neg_matrix[d][cat] + 1
-
-    return categories, pos_matrix, neg_matrix
+    # Sliced from the analytics cube instead of re-walking the evidence lists
+    return state_cube(state).matrices()
 
 
 # ===========================
@@ -94,13 +75,27 @@ def compute_dest_category_matrices(state):
 
 def visualize_statistics(state, scores):
     """
-    Create a 2x2 grid of statistical visualizations:
+    Show the 2D statistics figure (see draw_statistics()) in a window.
+    Blocks until the window is closed; use statistics_figure() /
+    render_statistics() for headless output.
+    """
+    fig = plt.figure(figsize=STATISTICS_SIZE)
+    draw_statistics(fig, state, scores)
+    plt.show()
+
+
+def draw_statistics(fig, state, scores):
+    """
+    Draw a 2x2 grid of statistical visualizations into fig:
     1. Destination scores (bar chart)
     2. Positive vs negative evidence (grouped bar chart)
     3. Rule firing frequency (line chart)
     4. Category contributions (pie chart)
+    Returns fig.
     """
-    destinations = DESTINATIONS
+    # Catalog order of the state (DESTINATIONS unless a larger catalog was evaluated)
+    cube = state_cube(state)
+    destinations = list(cube.destinations)
 
     # -----------------------------
     # 1) Destination Scores
@@ -112,11 +107,8 @@ def visualize_statistics(state, scores):
     # -----------------------------
     # 2) Positive / Negative Evidence
     # -----------------------------
-    pos_counts = []
-    neg_counts = []
-    for d in destinations:
-        pos_counts.append(len(state["recommended"][d]))
-        neg_counts.append(len(state["not_recommended"][d]))
+    pos_counts = cube.positives().tolist()
+    neg_counts = cube.negatives().tolist()
 
     # -----------------------------
     # 3) Rule Firing Frequency
@@ -139,7 +131,7 @@ def visualize_statistics(state, scores):
     # -----------------------------
     # Create 2x2 Subplot Figure
     # -----------------------------
-    fig, axs = plt.subplots(2, 2, figsize=(14, 10))
+    axs = fig.subplots(2, 2)
     fig.suptitle("Systems Statistical Visualization")
 
     # ---- Subplot 1: Destination Scores ----
@@ -190,40 +182,47 @@ def visualize_statistics(state, scores):
     ax.set_title("Category Contributions")
 
     fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-    plt.show()
+    return fig
 
 
 def visualize_statistics_3d(state, scores):
     """
-    Show a 3D figure with three subplots:
+    Show the 3D statistics figure (see draw_statistics_3d()) in a window.
+    Blocks until the window is closed.
+    """
+    fig = plt.figure(figsize=STATISTICS_3D_SIZE)
+    draw_statistics_3d(fig, state, scores)
+    plt.show()
+
+
+def draw_statistics_3d(fig, state, scores):
+    """
+    Draw a 3D figure with three subplots into fig:
     1) 3D scatter: positives vs negatives vs score
     2) 3D "heat cube": destination × category × total rule intensity
     3) 3D bar landscape: net category contribution (pos - neg) by destination
+    Returns fig.
     """
-    destinations = DESTINATIONS
-
     # ----------------------------------
     # Common data: positives / negatives / scores
     # ----------------------------------
-    pos_counts = []
-    neg_counts = []
+    # Every count below is a slice of the destination × category × polarity cube
+    cube = state_cube(state)
+    destinations = list(cube.destinations)
+    pos_counts = cube.positives().tolist()
+    neg_counts = cube.negatives().tolist()
     score_values = []
 
     for d in destinations:
-        pos_counts.append(len(state["recommended"][d]))
-        neg_counts.append(len(state["not_recommended"][d]))
         score_values.append(scores[d])
 
     dest_indices = range(len(destinations))
-
-    # Destination-category matrices
-    categories, pos_matrix, neg_matrix = compute_dest_category_matrices(state)
+    categories = CATEGORIES
     cat_indices = range(len(categories))
 
     # ----------------------------------
     # Create figure with 3D subplots
     # ----------------------------------
-    fig = plt.figure(figsize=(16, 5))
     fig.suptitle("3D Systems Statistical Visualization")
 
     # ==================================
@@ -251,16 +250,11 @@ def visualize_statistics_3d(state, scores):
     # ==================================
     ax2 = fig.add_subplot(1, 3, 2, projection='3d')
 
-    heat_x = []   # destination index
-    heat_y = []   # category index
-    heat_z = []   # total intensity (pos + neg)
-
-    for i, d in enumerate(destinations):
-        for j, c in enumerate(categories):
-            total = pos_matrix[d].get(c, 0) + neg_matrix[d].get(c, 0)
-            heat_x.append(i)
-            heat_y.append(j)
-            heat_z.append(total)
+    # One point per (destination, category) cell of the cube
+    grid_x, grid_y = np.meshgrid(list(dest_indices), list(cat_indices), indexing="ij")
+    heat_x = grid_x.ravel()
+    heat_y = grid_y.ravel()
+    heat_z = cube.intensity().ravel()
 
     ax2.scatter(heat_x, heat_y, heat_z)
     ax2.set_title("3D Heat Cube: Dest × Category × Intensity")
@@ -280,35 +274,17 @@ def visualize_statistics_3d(state, scores):
     # ==================================
     ax3 = fig.add_subplot(1, 3, 3, projection='3d')
 
-    bar_x = []
-    bar_y = []
-    bar_z = []
-    bar_dx = []
-    bar_dy = []
-    bar_dz = []
-
     width_x = 0.4
     width_y = 0.4
 
-    for i, d in enumerate(destinations):
-        for j, c in enumerate(categories):
-            pos_val = pos_matrix[d].get(c, 0)
-            neg_val = neg_matrix[d].get(c, 0)
-            net = pos_val - neg_val  # net "vote" of that category
-
-            if net >= 0:
-                z_base = 0
-                dz = net
-            else:
-                z_base = net
-                dz = -net
-
-            bar_x.append(i - width_x / 2.0)
-            bar_y.append(j - width_y / 2.0)
-            bar_z.append(z_base)
-            bar_dx.append(width_x)
-            bar_dy.append(width_y)
-            bar_dz.append(dz)
+    # Bars grow up from 0 for a positive net "vote", down from 0 for a negative one
+    net = cube.net().ravel()
+    bar_x = grid_x.ravel() - width_x / 2.0
+    bar_y = grid_y.ravel() - width_y / 2.0
+    bar_z = np.minimum(net, 0)
+    bar_dx = np.full(net.shape, width_x)
+    bar_dy = np.full(net.shape, width_y)
+    bar_dz = np.abs(net)
 
     ax3.bar3d(bar_x, bar_y, bar_z, bar_dx, bar_dy, bar_dz)
     ax3.set_title("3D Bar Landscape: Category Contribution Terrain")
@@ -323,4 +299,43 @@ def visualize_statistics_3d(state, scores):
     ax3.set_yticklabels(categories, rotation=45, ha="right")
 
     fig.tight_layout(rect=[0, 0.03, 1, 0.92])
-    plt.show()
+    return fig
+
+
+# ===========================
+# Headless Rendering
+# ===========================
+# Figures below are created on their own Agg canvas, without pyplot: no window
+# is opened, nothing blocks, and pyplot keeps no reference to them, so they can
+# be rendered in bulk (threads or worker processes) and simply dropped.
+
+@instrumented
+def statistics_figure(state, scores, kind="2d"):
+    """
+    New off-screen Figure with the 2D ("2d") or 3D ("3d") statistics drawn.
+    """
+    if kind == "2d":
+        fig = Figure(figsize=STATISTICS_SIZE)
+        FigureCanvasAgg(fig)
+        return draw_statistics(fig, state, scores)
+    if kind == "3d":
+        fig = Figure(figsize=STATISTICS_3D_SIZE)
+        FigureCanvasAgg(fig)
+        return draw_statistics_3d(fig, state, scores)
+    raise ValueError(f"unknown figure kind: {kind}")
+
+
+def figure_bytes(fig, fmt="png", dpi=100):
+    """
+    Encode a figure as PNG / SVG / PDF bytes.
+    """
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi)
+    return buf.getvalue()
+
+
+def render_statistics(state, scores, fmt="png", kind="2d", dpi=100):
+    """
+    Statistics figure as image bytes, e.g. render_statistics(state, scores, "svg", "3d").
+    """
+    return figure_bytes(statistics_figure(state, scores, kind), fmt, dpi)
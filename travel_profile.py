@@ -0,0 +1,390 @@
+# =============================================
+# Travel Profile - Built-in Profiling Mode
+# =============================================
+# Runs a workload (a GUI session, a batch run, ...) under a profiler and
+# writes two files next to each other:
+#
+#   <prefix>.pstats     profile in the pstats format (python -m pstats, snakeviz, ...)
+#   <prefix>.collapsed  flamegraph-ready collapsed stacks: "frame;frame;frame weight"
+#                       per line, weights in microseconds (flamegraph.pl, speedscope)
+#
+# Frames are labelled <module>:<function>, e.g. travel_core:run_inference,
+# travel_plot:draw_statistics, travel_gui:update_charts. The wrapper frames
+# of travel_instrument's @instrumented are merged into the function they
+# wrap, so the collapsed stacks read caller;function without them.
+#
+# Modes:
+#   deterministic  cProfile: exact call counts and times; the collapsed stacks
+#                  are rebuilt from its caller / callee graph, so time of a
+#                  function called from several places is split between them
+#                  in proportion to each caller's share (cProfile sees a single
+#                  shared wrapper, so which caller reached which instrumented
+#                  function is recorded separately, by a listener)
+#   sampling       the stack of the profiled thread is recorded every interval
+#                  seconds of CPU time (SIGPROF timer, on the main thread of
+#                  Unix systems; elsewhere a background thread samples wall
+#                  time): far less overhead, exact stacks, statistical times;
+#                  the pstats file counts samples as calls
+#
+# Only the thread that starts profiling is profiled (batch pool workers are not:
+# use --workers 1 to profile the engine itself).
+#
+# Usage:
+#     python travel_core.py --profile gui-session                      # profile the GUI
+#     python travel_core.py --batch profiles.jsonl --workers 1 --profile batch --profile-mode sampling
+#     python travel_core.py --explain-profile '{"budget": "low"}' --profile one-profile
+#     python travel_gui.py --profile gui-session
+#     python -m pstats gui-session.pstats
+#     flamegraph.pl gui-session.collapsed > gui-session.svg
+
+import cProfile
+import marshal
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from travel_instrument import WRAPPER_CODE, add_listener, remove_listener
+
+
+PROFILE_MODES = ["deterministic", "sampling"]
+
+# Modules whose time is broken out in the summary
+APP_MODULES = ("travel_core", "travel_plot", "travel_gui")
+
+
+# ===========================
+# 1. Frame labels
+# ===========================
+
+def frame_label(func):
+    """
+    "<module>:<function>" for a pstats function key (filename, line, name).
+    Built-ins ("~" as file name) keep their pstats name.
+    """
+    filename, _, name = func
+    if filename == "~":
+        return name.replace(";", ",")
+    module = os.path.splitext(os.path.basename(filename))[0]
+    return f"{module}:{name}"
+
+
+def code_key(code):
+    """
+    pstats function key (filename, line, name) of a code object.
+    """
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+WRAPPER_KEY = code_key(WRAPPER_CODE)
+
+
+def frame_module(func):
+    filename = func[0]
+    if filename == "~":
+        return "(built-in)"
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def write_collapsed(stacks, path):
+    """
+    Write {tuple of pstats function keys (root first): microseconds} as
+    collapsed stacks, heaviest first.
+    """
+    lines = {}
+    for stack, weight in stacks.items():
+        key = ";".join(frame_label(func) for func in stack)
+        lines[key] = lines.get(key, 0) + weight
+    with open(path, "w", encoding="utf-8") as f:
+        for key, weight in sorted(lines.items(), key=lambda item: item[1], reverse=True):
+            if round(weight) > 0:
+                f.write(f"{key} {round(weight)}\n")
+
+
+# ===========================
+# 2. Deterministic mode
+# ===========================
+
+class WrapperCalls:
+    """
+    travel_instrument listener that records, while cProfile runs, the time
+    each caller spent in each instrumented function:
+      seconds -> {(caller pstats key, function name): seconds}
+    All instrumented functions are called through one wrapper code object,
+    so cProfile's own caller / callee graph cannot tell them apart.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def __call__(self, name, started, elapsed, facts, result):
+        wrapper = sys._getframe(1)
+        if wrapper.f_code is WRAPPER_CODE and wrapper.f_back is not None:
+            self.seconds[(code_key(wrapper.f_back.f_code), name)] += elapsed
+
+
+def collapse_call_graph(stats, min_weight=1.0, max_depth=200, wrapper_calls=None):
+    """
+    Collapsed stacks (microseconds of self time per stack) rebuilt from a
+    pstats stats dict: func -> (cc, nc, tt, ct, callers).
+    Instrumented wrapper frames are merged into the function they wrap: a
+    caller's time in the wrapper goes to the functions it reached through it,
+    by WrapperCalls.seconds (wrapper_calls) or, without them, in proportion
+    to each function's time.
+    """
+    children = defaultdict(dict)
+    for callee, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            children[caller][callee] = edge[3]
+
+    wrapped = children.get(WRAPPER_KEY, {})
+    name_time = defaultdict(float)
+    for func, edge_time in wrapped.items():
+        name_time[func[2]] += edge_time
+
+    def through_wrapper(caller, seconds):
+        # (function, seconds) for the time caller spent in the wrapper
+        if wrapper_calls is None:
+            weights = dict(wrapped)
+        else:
+            weights = {func: wrapper_calls.get((caller, func[2]), 0.0) * edge_time / name_time[func[2]]
+                       for func, edge_time in wrapped.items() if name_time[func[2]] > 0}
+        total = sum(weights.values())
+        if total <= 0:
+            return []
+        return [(func, seconds * weight / total) for func, weight in weights.items() if weight > 0]
+
+    stacks = {}
+
+    def walk(func, path, share):
+        # share -> fraction of func's total time spent on this path
+        _, _, tt, ct, _ = stats[func]
+        if tt * share * 1e6 >= min_weight:
+            stacks[path] = stacks.get(path, 0.0) + tt * share * 1e6
+        if len(path) >= max_depth:
+            return
+        for child, edge_time in children.get(func, {}).items():
+            if child not in stats:
+                continue
+            time_here = edge_time * share
+            if child == WRAPPER_KEY:
+                targets = through_wrapper(func, time_here)
+            else:
+                targets = [(child, time_here)]
+            for target, seconds in targets:
+                if target in path or target not in stats or seconds * 1e6 < min_weight:
+                    continue
+                target_total = stats[target][3]
+                if target_total > 0:
+                    walk(target, path + (target,), seconds / target_total)
+
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            walk(func, (func,), 1.0)
+    return stacks
+
+
+# ===========================
+# 3. Sampling mode
+# ===========================
+
+class SamplingProfiler:
+    """
+    Records the call stack of the thread that calls start() every interval seconds.
+    samples -> {tuple of pstats function keys (root first): [sample count, seconds]}
+
+    On the main thread of systems with setitimer, a SIGPROF timer interrupts
+    the thread itself, so samples land exactly where it is (and time spent
+    idle, e.g. waiting for GUI events, is not sampled). Otherwise a
+    background thread samples it; the interpreter switch interval is then
+    lowered so the sampler is not only woken where the thread releases the GIL.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = defaultdict(lambda: [0, 0.0])
+        self.thread_id = None
+        self.use_signal = False
+        self.previous_handler = None
+        self.stopped = threading.Event()
+        self.thread = None
+        self.switch_interval = None
+
+    def start(self):
+        self.thread_id = threading.get_ident()
+        self.use_signal = hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+        if self.use_signal:
+            self.previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        else:
+            self.switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-5)
+            self.thread = threading.Thread(target=self._run, name="travel-profiler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.use_signal:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self.previous_handler)
+        else:
+            self.stopped.set()
+            self.thread.join()
+            sys.setswitchinterval(self.switch_interval)
+
+    def _record(self, frame, seconds):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            # An instrumented wrapper and the function it calls are one frame
+            if code is not WRAPPER_CODE:
+                stack.append(code_key(code))
+            frame = frame.f_back
+        if stack:
+            stack.reverse()
+            entry = self.samples[tuple(stack)]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def _on_signal(self, signum, frame):
+        self._record(frame, self.interval)
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            now = time.perf_counter()
+            self._record(sys._current_frames().get(self.thread_id), now - last)
+            last = now
+
+    def stacks(self):
+        """
+        Collapsed stacks in microseconds.
+        """
+        return {stack: seconds * 1e6 for stack, (_, seconds) in self.samples.items()}
+
+    def stats(self):
+        """
+        pstats-compatible dict built from the samples: a "call" is a sample.
+        """
+        rows = {}
+        edges = defaultdict(lambda: [0, 0, 0.0, 0.0])
+
+        def row(func):
+            entry = rows.get(func)
+            if entry is None:
+                entry = rows[func] = [0, 0, 0.0, 0.0]
+            return entry
+
+        for stack, (count, weight) in self.samples.items():
+            leaf = stack[-1]
+            row(leaf)[2] += weight
+            seen = set()
+            for i, func in enumerate(stack):
+                if func in seen:
+                    continue
+                seen.add(func)
+                entry = row(func)
+                entry[0] += count
+                entry[1] += count
+                entry[3] += weight
+                if i > 0:
+                    edge = edges[(stack[i - 1], func)]
+                    edge[0] += count
+                    edge[1] += count
+                    edge[2] += weight if func == leaf else 0.0
+                    edge[3] += weight
+
+        callers = defaultdict(dict)
+        for (caller, callee), edge in edges.items():
+            callers[callee][caller] = tuple(edge)
+        return {func: (cc, nc, tt, ct, callers.get(func, {})) for func, (cc, nc, tt, ct) in rows.items()}
+
+
+# ===========================
+# 4. Profiling a workload
+# ===========================
+
+def module_summary(stats, top=15):
+    """
+    Text report: self time per module and the slowest functions (by
+    cumulative time) of the travel_core / travel_plot / travel_gui modules.
+    """
+    by_module = defaultdict(float)
+    total = 0.0
+    for func, (_, _, tt, _, _) in stats.items():
+        by_module[frame_module(func)] += tt
+        total += tt
+
+    lines = [f"{'module':<28} {'self s':>9} {'share':>7}"]
+    for module, seconds in sorted(by_module.items(), key=lambda item: item[1], reverse=True)[:top]:
+        lines.append(f"{module:<28} {seconds:>9.3f} {seconds / total if total else 0:>7.1%}")
+
+    app = [(func, entry) for func, entry in stats.items() if frame_module(func) in APP_MODULES]
+    app.sort(key=lambda item: item[1][3], reverse=True)
+    lines.append("")
+    lines.append(f"{'function':<48} {'calls':>9} {'self s':>9} {'cum s':>9}")
+    for func, (_, nc, tt, ct, _) in app[:top]:
+        lines.append(f"{frame_label(func):<48} {nc:>9} {tt:>9.3f} {ct:>9.3f}")
+    return "\n".join(lines)
+
+
+@contextmanager
+def profiling(prefix, mode="deterministic", interval=0.005, report=sys.stderr):
+    """
+    Profile the with-block and write <prefix>.pstats and <prefix>.collapsed.
+    A summary is printed to report (None for no summary). prefix=None
+    profiles nothing, so entry points can always wrap their workload.
+    """
+    if prefix is None:
+        yield None
+        return
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"unknown profiling mode: {mode}")
+
+    if mode == "deterministic":
+        wrapper_calls = WrapperCalls()
+        add_listener(wrapper_calls, facts=False)
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+    try:
+        yield profiler
+    finally:
+        if mode == "deterministic":
+            profiler.disable()
+            remove_listener(wrapper_calls)
+            profiler.dump_stats(prefix + ".pstats")
+            stats = pstats.Stats(profiler).stats
+            stacks = collapse_call_graph(stats, wrapper_calls=wrapper_calls.seconds)
+        else:
+            profiler.stop()
+            stats = profiler.stats()
+            with open(prefix + ".pstats", "wb") as f:
+                marshal.dump(stats, f)
+            stacks = profiler.stacks()
+        write_collapsed(stacks, prefix + ".collapsed")
+
+        if report is not None:
+            print(f"\n{mode} profile written to {prefix}.pstats and {prefix}.collapsed", file=report)
+            print(module_summary(stats), file=report)
+
+
+def add_profile_args(parser):
+    """
+    Add --profile / --profile-mode / --profile-interval to an argparse parser.
+    """
+    parser.add_argument("--profile", metavar="PREFIX", default=None,
+                        help="profile the run; writes PREFIX.pstats and PREFIX.collapsed")
+    parser.add_argument("--profile-mode", choices=PROFILE_MODES, default="deterministic",
+                        help="deterministic (cProfile) or sampling profiler (default: deterministic)")
+    parser.add_argument("--profile-interval", type=float, default=0.005,
+                        help="seconds between samples in sampling mode (default 0.005)")
+
+
+def profiling_from_args(args):
+    return profiling(args.profile, args.profile_mode, args.profile_interval)
@@ -0,0 +1,404 @@
+# =============================================
+# Travel Query - Bitmap Index over Batch / Sweep Outcomes
+# =============================================
+# While a sweep (travel_sweep) or batch run (travel_core --batch) evaluates
+# profiles, it can record one bitmap per fact about the outcome: bit n is set
+# when profile n has that fact. Questions over the whole run are then answered
+# with a few integer AND / OR / NOT operations instead of rescanning results.
+#
+# Profile numbers are sweep indices (see travel_sweep.decode_profile) for a
+# sweep and input line numbers for a batch run. Bitmaps are Python ints.
+#
+# Index keys:
+#   all                          every profile of the run
+#   budget=low, likes=nature     profile fields
+#   Japan:strongly_recommended   destination labels (see LABEL_KEYS)
+#   rule:R22_contradiction_detection        rule fired (for any destination)
+#   rule:R22_contradiction_detection@Japan  rule fired for a destination
+#
+# Queries combine keys with and / or / not and parentheses:
+#   Japan:strongly_recommended and Japan:contradiction
+#   budget=low and not (rule:R2_budget_allows_expensive or Dubai:neutral)
+#
+# Usage:
+#     python travel_query.py build-sweep sweep.idx --workers 4
+#     python travel_core.py --batch profiles.jsonl --index batch.idx > results.jsonl
+#     python travel_query.py query sweep.idx "Japan:strongly_recommended and Japan:contradiction"
+
+import argparse
+import json
+import re
+import struct
+import sys
+from collections import defaultdict
+
+from travel_info import DESTINATIONS, PROFILE_OPTIONS, LIKES_OPTIONS, RULE_LOGIC
+
+
+# ===========================
+# 1. Index keys
+# ===========================
+
+# Label keys: name -> state key ("recommended" / "not_recommended": any evidence)
+LABEL_KEYS = {
+    "recommended": "recommended",
+    "not_recommended": "not_recommended",
+    "strongly_recommended": "strongly_recommended",
+    "strongly_not_recommended": "strongly_not_recommended",
+    "neutral": "neutral",
+    "season_matched": "season_matched",
+    "weak_recommendation": "weak_recommendation",
+    "contradiction": "contradictions",
+    "final_recommendation": "final_recommendation",
+}
+
+# Rules that do not assert evidence, with the state list they add each
+# destination to (rule keys are read from there, never from the trace)
+LABEL_RULES = {
+    "R9_season_match": "season_matched",
+    "R10_season_weak": "weak_recommendation",
+    "R20_strong_recommendation": "strongly_recommended",
+    "R21_strong_not_recommendation": "strongly_not_recommended",
+    "R22_contradiction_detection": "contradictions",
+    "R24_neutral_default": "neutral",
+    "R25_final_recommendation": "final_recommendation",
+}
+
+# Rules that set a global flag (no destination)
+FLAG_RULES = {
+    "R17_low_safety_concern": "safety_not_a_constraint",
+    "R23_flag_inconsistency": "flag_inconsistency",
+}
+
+_POSITION = {d: i for i, d in enumerate(DESTINATIONS)}
+
+
+def outcome_keys(user, state):
+    """
+    Set of index keys that hold for one evaluated profile.
+    """
+    keys = {"all"}
+    for field in PROFILE_OPTIONS:
+        keys.add(f"{field}={user[field]}")
+    for like in user["likes"]:
+        keys.add(f"likes={like}")
+
+    for name, key in LABEL_KEYS.items():
+        values = state[key]
+        if key in ("recommended", "not_recommended"):
+            members = [d for d in values if len(values[d]) > 0]
+        else:
+            members = values
+        for d in members:
+            keys.add(f"{d}:{name}")
+
+    # Rule keys come from what the rules asserted, so they do not depend on
+    # the trace retention policy
+    for side in ("recommended", "not_recommended"):
+        evidence = state[side]
+        for d in evidence:
+            for rule in evidence[d]:
+                keys.add("rule:" + rule)
+                if d in _POSITION:
+                    keys.add(f"rule:{rule}@{d}")
+    for rule, key in LABEL_RULES.items():
+        for d in state[key]:
+            keys.add("rule:" + rule)
+            if d in _POSITION:
+                keys.add(f"rule:{rule}@{d}")
+    for rule, flag in FLAG_RULES.items():
+        if flag in state["flags"]:
+            keys.add("rule:" + rule)
+    return keys
+
+
+# ===========================
+# 2. Bitmap index
+# ===========================
+
+MAGIC = b"TBX\x01"
+
+
+class IndexBuilder:
+    """
+    Collects outcome keys of the profiles of one chunk; build() turns them
+    into a BitmapIndex. Profile numbers must be >= start.
+    """
+
+    def __init__(self, kind, start=0):
+        self.kind = kind
+        self.start = start
+        self.stop = start
+        self.members = defaultdict(list)
+
+    def add(self, number, user, state):
+        for key in outcome_keys(user, state):
+            self.members[key].append(number - self.start)
+        self.stop = max(self.stop, number + 1)
+
+    def build(self):
+        # Set bits in a bytearray first: growing an int bit by bit is quadratic
+        index = BitmapIndex(self.kind)
+        size = (self.stop - self.start + 7) // 8
+        for key, offsets in self.members.items():
+            bits = bytearray(size)
+            for offset in offsets:
+                bits[offset >> 3] |= 1 << (offset & 7)
+            index.bitmaps[key] = int.from_bytes(bits, "little") << self.start
+        return index
+
+
+class BitmapIndex:
+    """
+    key -> bitmap (int; bit n = profile n). kind is "sweep" or "batch".
+    """
+
+    def __init__(self, kind="batch", bitmaps=None):
+        self.kind = kind
+        self.bitmaps = bitmaps if bitmaps is not None else {}
+
+    def update(self, other):
+        """
+        OR the bitmaps of another index (e.g. of a later chunk) into this one.
+        """
+        for key, bits in other.bitmaps.items():
+            self.bitmaps[key] = self.bitmaps.get(key, 0) | bits
+        return self
+
+    @property
+    def profiles(self):
+        return self.bitmaps.get("all", 0).bit_count()
+
+    def keys(self):
+        return sorted(self.bitmaps)
+
+    def get(self, key):
+        """
+        Bitmap of one key; keys that never occurred give an empty bitmap,
+        unknown keys a ValueError.
+        """
+        if key in self.bitmaps:
+            return self.bitmaps[key]
+        if not is_known_key(key):
+            raise ValueError(f"unknown index key: {key}")
+        return 0
+
+    def query(self, expression):
+        """
+        Bitmap of the profiles matching a query expression.
+        """
+        return QueryParser(self, expression).parse()
+
+    def count(self, expression):
+        return self.query(expression).bit_count()
+
+    def numbers(self, bits, limit=None):
+        """
+        Profile numbers set in a bitmap, in increasing order.
+        """
+        numbers = []
+        while bits and (limit is None or len(numbers) < limit):
+            low = bits & -bits
+            numbers.append(low.bit_length() - 1)
+            bits ^= low
+        return numbers
+
+    def save(self, path):
+        keys = self.keys()
+        blobs = [self.bitmaps[key].to_bytes((self.bitmaps[key].bit_length() + 7) // 8, "little") for key in keys]
+        header = json.dumps({
+            "kind": self.kind,
+            "keys": [[key, len(blob)] for key, blob in zip(keys, blobs)],
+        }).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f"{path} is not a travel bitmap index")
+        (length,) = struct.unpack_from("<I", data, 4)
+        header = json.loads(data[8:8 + length])
+        pos = 8 + length
+        bitmaps = {}
+        for key, size in header["keys"]:
+            bitmaps[key] = int.from_bytes(data[pos:pos + size], "little")
+            pos += size
+        return cls(header["kind"], bitmaps)
+
+
+def is_known_key(key):
+    """
+    True if key is an index key (see the header) over known profile values,
+    destinations, labels and rules, even if it never occurred in a run.
+    """
+    if key == "all":
+        return True
+    if key.startswith("rule:"):
+        rule, at, d = key[len("rule:"):].partition("@")
+        return rule in RULE_LOGIC and (not at or d in _POSITION)
+    if "=" in key:
+        field, _, value = key.partition("=")
+        if field == "likes":
+            return value in LIKES_OPTIONS
+        return field in PROFILE_OPTIONS and value in PROFILE_OPTIONS[field]
+    d, _, label = key.partition(":")
+    return d in _POSITION and label in LABEL_KEYS
+
+
+# ===========================
+# 3. Query language
+# ===========================
+
+TOKEN = re.compile(r"\s*(?:(\()|(\))|([^\s()]+))")
+
+
+class QueryParser:
+    """
+    Recursive-descent parser that evaluates while it parses:
+      expr   := term ("or" term)*
+      term   := factor ("and" factor)*
+      factor := "not" factor | "(" expr ")" | key
+    """
+
+    def __init__(self, index, expression):
+        self.index = index
+        self.tokens = self.tokenize(expression)
+        self.pos = 0
+
+    @staticmethod
+    def tokenize(expression):
+        tokens = []
+        pos = 0
+        expression = expression.strip()
+        while pos < len(expression):
+            match = TOKEN.match(expression, pos)
+            if match is None:
+                raise ValueError(f"cannot parse query at: {expression[pos:]}")
+            tokens.append(match.group(match.lastindex))
+            pos = match.end()
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        if token is None:
+            raise ValueError("unexpected end of query")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        bits = self.expr()
+        if self.peek() is not None:
+            raise ValueError(f"unexpected '{self.peek()}' in query")
+        return bits
+
+    def expr(self):
+        bits = self.term()
+        while self.peek() == "or":
+            self.take()
+            bits |= self.term()
+        return bits
+
+    def term(self):
+        bits = self.factor()
+        while self.peek() == "and":
+            self.take()
+            bits &= self.factor()
+        return bits
+
+    def factor(self):
+        token = self.take()
+        if token == "not":
+            return self.index.get("all") & ~self.factor()
+        if token == "(":
+            bits = self.expr()
+            if self.take() != ")":
+                raise ValueError("missing ')' in query")
+            return bits
+        if token in (")", "and", "or"):
+            raise ValueError(f"unexpected '{token}' in query")
+        return self.index.get(token)
+
+
+# ===========================
+# 4. Building and CLI
+# ===========================
+
+def build_sweep_index(workers=None, limit=None, chunk_size=2000):
+    """
+    Run a profile sweep with indexing on and return its BitmapIndex.
+    """
+    from travel_sweep import sweep
+    return sweep(workers=workers, limit=limit, chunk_size=chunk_size, index=True)["index"]
+
+
+def describe_profile(index, number):
+    """
+    Short text for a profile number: the decoded profile of a sweep,
+    the input line of a batch run.
+    """
+    if index.kind == "sweep":
+        from travel_sweep import decode_profile
+        return f"{number}: {json.dumps(decode_profile(number))}"
+    return f"line {number}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bitmap-indexed queries over sweep / batch outcomes.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build-sweep", help="run a profile sweep and save its index")
+    build.add_argument("index")
+    build.add_argument("--workers", type=int, default=None)
+    build.add_argument("--limit", type=int, default=None, help="only sweep the first N profiles")
+
+    query = commands.add_parser("query", help="list the profiles matching a query")
+    query.add_argument("index")
+    query.add_argument("expression")
+    query.add_argument("--count", action="store_true", help="only print the number of matches")
+    query.add_argument("--limit", type=int, default=20, help="profiles to list (default 20)")
+
+    keys = commands.add_parser("keys", help="list the keys of an index")
+    keys.add_argument("index")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build-sweep":
+        index = build_sweep_index(workers=args.workers, limit=args.limit)
+        index.save(args.index)
+        print(f"Indexed {index.profiles} profiles ({len(index.bitmaps)} bitmaps) -> {args.index}")
+        return 0
+
+    index = BitmapIndex.load(args.index)
+    if args.command == "keys":
+        for key in index.keys():
+            print(f"{key:<50} {index.bitmaps[key].bit_count():>8}")
+        return 0
+
+    try:
+        bits = index.query(args.expression)
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    matches = bits.bit_count()
+    total = index.profiles
+    print(f"{matches} of {total} profiles ({matches / total if total else 0:.1%})")
+    if not args.count:
+        for number in index.numbers(bits, args.limit):
+            print(describe_profile(index, number))
+        if matches > args.limit:
+            print(f"... {matches - args.limit} more")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+# =============================================
+# Travel Report - Headless Per-Profile Reports
+# =============================================
+# Renders one report per user profile without opening any window:
+#   page 1  summary (profile, ranking, final picks, explanations, tips)
+#   page 2  2D statistics (travel_plot.draw_statistics)
+#   page 3  3D statistics (travel_plot.draw_statistics_3d)
+#
+# PDF reports hold the three pages in one file; PNG / SVG reports are written
+# as <name>-summary, <name>-statistics and <name>-statistics-3d files.
+#
+# Profiles come from a JSONL file (same format as travel_core --batch). Chunks
+# of profiles are fanned out over a process pool (attached to one shared copy
+# of the knowledge base) and each worker writes its reports straight to the
+# output directory as <id>-<line>.pdf (or line-<line>.pdf). index.jsonl in that
+# directory lists, per input line, the files written or the error.
+#
+# Usage:
+#     python travel_report.py customers.jsonl reports/ --workers 8
+#     python travel_report.py customers.jsonl reports/ --format png --top 5
+
+import argparse
+import functools
+import json
+import os
+import re
+import sys
+import time
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from travel_info import DESTINATIONS
+from travel_core import (
+    normalize_user,
+    cached_inference,
+    compute_scores,
+    rank_destinations,
+    LazyExplanations,
+    lookup_tips,
+    map_ordered,
+    read_chunks,
+)
+from travel_instrument import instrumented
+from travel_plot import statistics_figure, figure_bytes
+
+
+REPORT_FORMATS = ["pdf", "png", "svg"]
+
+# A4 portrait, in inches
+PAGE_SIZE = (8.27, 11.69)
+
+
+# ===========================
+# 1. Report pages
+# ===========================
+
+def summary_lines(user, state, scores, top=5):
+    """
+    Text of the summary page as (text, style) pairs; style is "title",
+    "heading" or "body".
+    """
+    lines = [("Travel Advisor Report", "title")]
+    if "id" in user:
+        lines.append((f"Customer: {user['id']}", "body"))
+
+    lines.append(("Profile", "heading"))
+    for field, value in user.items():
+        if field == "id":
+            continue
+        if isinstance(value, list):
+            value = ", ".join(value) if value else "-"
+        lines.append((f"{field}: {value}", "body"))
+
+    ranked = rank_destinations(scores, k=top, destinations=DESTINATIONS)
+    lines.append((f"Top {len(ranked)} destinations", "heading"))
+    for i, d in enumerate(ranked, start=1):
+        labels = []
+        if d in state["strongly_recommended"]:
+            labels.append("strongly recommended")
+        if d in state["contradictions"]:
+            labels.append("contradicting rules")
+        suffix = f"  ({', '.join(labels)})" if labels else ""
+        lines.append((f"{i}. {d}  score {scores[d]}{suffix}", "body"))
+
+    final = list(state["final_recommendation"])
+    lines.append(("Final recommendation: " + (", ".join(final) if final else "none"), "body"))
+    if state["flags"]:
+        lines.append(("Flags: " + ", ".join(state["flags"]), "body"))
+
+    explanations = LazyExplanations(state)
+    tips = lookup_tips(ranked[:3])
+    for d in ranked[:3]:
+        lines.append((f"Why {d}?", "heading"))
+        explanation = explanations[d]
+        for text in explanation["positives"]:
+            lines.append(("+ " + text, "body"))
+        for text in explanation["negatives"]:
+            lines.append(("- " + text, "body"))
+        for tip in tips[d][:2]:
+            lines.append(("Tip: " + tip, "body"))
+    return lines
+
+
+def summary_figure(user, state, scores, top=5):
+    """
+    Off-screen A4 Figure with the summary page.
+    """
+    fig = Figure(figsize=PAGE_SIZE)
+    FigureCanvasAgg(fig)
+
+    sizes = {"title": 16, "heading": 11, "body": 8.5}
+    y = 0.95
+    for text, style in summary_lines(user, state, scores, top):
+        if style == "heading":
+            y -= 0.012
+        for part in textwrap.wrap(text, 110) or [""]:
+            fig.text(0.07, y, part, fontsize=sizes[style],
+                     fontweight="bold" if style != "body" else "normal", va="top")
+            y -= 0.016 if style == "body" else 0.024
+        if y < 0.04:
+            break
+    return fig
+
+
+def report_figures(user, state, scores, top=5):
+    """
+    The report pages as (suffix, Figure) pairs.
+    """
+    return [
+        ("summary", summary_figure(user, state, scores, top)),
+        ("statistics", statistics_figure(state, scores, "2d")),
+        ("statistics-3d", statistics_figure(state, scores, "3d")),
+    ]
+
+
+@instrumented
+def write_report(user, state, scores, path, fmt="pdf", top=5, dpi=100):
+    """
+    Write the report for one profile. path is the file name without extension.
+    Returns the list of files written.
+    """
+    pages = report_figures(user, state, scores, top)
+    if fmt == "pdf":
+        filename = path + ".pdf"
+        with PdfPages(filename) as pdf:
+            for _, fig in pages:
+                pdf.savefig(fig)
+        return [filename]
+
+    files = []
+    for suffix, fig in pages:
+        filename = f"{path}-{suffix}.{fmt}"
+        with open(filename, "wb") as f:
+            f.write(figure_bytes(fig, fmt, dpi))
+        files.append(filename)
+    return files
+
+
+# ===========================
+# 2. Batch generation
+# ===========================
+
+def report_name(raw, number):
+    """
+    File name (without extension) for a profile: its "id" made safe for
+    file systems, then -<line number>, or line-<number>.
+    The line number keeps names unique: ids that clean up to the same name
+    (or repeated ids) would otherwise overwrite each other's reports.
+    """
+    if isinstance(raw, dict) and "id" in raw:
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(raw["id"])).strip("._")[:100]
+        if name:
+            return f"{name}-{number}"
+    return f"line-{number}"
+
+
+def report_lines(lines, outdir, fmt="pdf", top=5, dpi=100):
+    """
+    Write the reports of a chunk of (line number, JSON text) pairs.
+    Returns one index record per line: {"line", "files"} or {"line", "error"}.
+    Invalid input and failures to write a report (disk full, permissions,
+    a rendering error) only affect their own line.
+    """
+    records = []
+    for number, text in lines:
+        record = {"line": number}
+        records.append(record)
+        try:
+            raw = json.loads(text)
+            user = normalize_user(raw)
+            if isinstance(raw, dict) and "id" in raw:
+                record["id"] = raw["id"]
+                user["id"] = raw["id"]
+            state = cached_inference(user)
+            scores = compute_scores(state)
+        except ValueError as e:
+            record["error"] = str(e)
+            continue
+
+        path = os.path.join(outdir, report_name(raw, number))
+        try:
+            record["files"] = [os.path.basename(f) for f in write_report(user, state, scores, path, fmt, top, dpi)]
+        except Exception as e:
+            # OSError from the file system, or anything matplotlib raises while drawing
+            record["error"] = f"report not written: {type(e).__name__}: {e}"
+    return records
+
+
+def generate_reports(infile, outdir, workers=1, fmt="pdf", top=5, dpi=100, chunk_size=4,
+                     max_in_flight=None, progress=None):
+    """
+    Write one report per JSONL profile of infile into outdir, plus index.jsonl.
+    With workers > 1 chunks run on a process pool with a bounded number in flight.
+    progress -> optional callable(done), called as chunks finish
+    Returns (reports written, lines with an error: invalid input or a report
+    that could not be written).
+    """
+    if fmt not in REPORT_FORMATS:
+        raise ValueError(f"unknown report format: {fmt}")
+    os.makedirs(outdir, exist_ok=True)
+    chunks = read_chunks(infile, chunk_size)
+    work = functools.partial(report_lines, outdir=outdir, fmt=fmt, top=top, dpi=dpi)
+    written = 0
+    failed = 0
+
+    with open(os.path.join(outdir, "index.jsonl"), "w", encoding="utf-8") as index:
+        def collect(records):
+            nonlocal written, failed
+            for record in records:
+                index.write(json.dumps(record) + "\n")
+                if "error" in record:
+                    failed += 1
+                else:
+                    written += 1
+            if progress is not None:
+                progress(written + failed)
+
+        if workers <= 1:
+            for records in map_ordered(work, chunks):
+                collect(records)
+        else:
+            if max_in_flight is None:
+                max_in_flight = workers * 2
+            # Workers attach to one shared copy of the knowledge base
+            from travel_kb import SharedKB, init_worker
+            with SharedKB() as kb:
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                         initargs=(kb.name,)) as pool:
+                    for records in map_ordered(work, chunks, pool, max_in_flight):
+                        collect(records)
+
+    return written, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render one travel advisor report per JSONL profile.")
+    parser.add_argument("input", help="JSONL profiles ('-' for stdin)")
+    parser.add_argument("output", help="output directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: all CPUs)")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="pdf")
+    parser.add_argument("--top", type=int, default=5, help="destinations listed on the summary page")
+    parser.add_argument("--dpi", type=int, default=100, help="resolution of PNG reports")
+    parser.add_argument("--chunk-size", type=int, default=4, help="profiles per work unit")
+    args = parser.parse_args()
+
+    def report_progress(done):
+        print(f"\r{done} profiles", end="", flush=True)
+
+    started = time.perf_counter()
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        written, failed = generate_reports(infile, args.output, workers=args.workers, fmt=args.format,
+                                            top=args.top, dpi=args.dpi, chunk_size=args.chunk_size,
+                                            progress=report_progress)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+    print(f"\nWrote {written} reports ({failed} lines with errors, see index.jsonl) to {args.output} "
+          f"in {time.perf_counter() - started:.1f}s")
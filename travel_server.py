@@ -0,0 +1,546 @@
+# =============================================
+# Travel Server - Local HTTP Recommendation Service
+# =============================================
+# Small asyncio HTTP/1.1 server (standard library only) exposing the engine
+# as JSON endpoints:
+#
+#   GET  /health                 -> {"status": "ok"}
+#   GET  /destinations           -> {"destinations": [...]}
+#   GET  /stats                  -> coalescing counters (see SingleFlight)
+#   GET  /metrics                -> Prometheus text exposition (see travel_metrics)
+#   GET  /tips/<destination>     -> {"destination", "tips"}
+#   POST /recommend[?top=N&explain=1]  body: profile JSON -> ranking, final recommendation, flags
+#   POST /scores                 body: profile JSON -> {"scores": {dest: score}}
+#   POST /explain                body: profile JSON -> {"explanations": {dest: {...}}}
+#
+# Profiles use the same format as the JSONL batch mode of travel_core
+# (missing fields take the sample user's value).
+#
+# Inference runs in a process pool (attached to a shared-memory copy of the
+# knowledge base, see travel_kb), so the event loop never blocks; each
+# request builds its own state, so nothing is shared between requests.
+# Concurrent requests for the same canonical profile share one computation.
+# Workers measure each request (counters, stage latencies) and send the
+# counts back with the result; /metrics exposes their sum.
+# With --trace, a sample of requests is recorded as timing spans (parsing,
+# inference and its rule families, scoring, explanations, rendering), see
+# travel_spans. --trace-retention ring:200 bounds the reasoning trace each
+# request keeps (see travel_trace).
+#
+# Usage:
+#     python travel_server.py --port 8080 --workers 4 --concurrency 16
+#     curl -d '{"budget": "low", "likes": ["nature_scenery"]}' localhost:8080/recommend?top=3
+#     python travel_server.py --trace trace.json --trace-rate 0.05
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from travel_info import DESTINATIONS, TRAVEL_TIPS
+from travel_kb import SharedKB, init_worker
+from travel_core import (
+    normalize_user,
+    canonical_profile,
+    evaluate_profile,
+    cached_inference,
+    compute_scores,
+    build_explanations,
+    lookup_tips,
+)
+from travel_instrument import instrumented, stage
+from travel_metrics import Metrics, CONTENT_TYPE, call_with_metrics
+from travel_spans import Tracer, make_exporter, current_trace, call_traced
+from travel_trace import add_trace_args, apply_trace_args
+
+
+# ===========================
+# 1. Work done in the pool
+# ===========================
+
+def evaluate_request(kind, user, top=None, explain=False):
+    """
+    Compute the JSON payload of a POST endpoint for one normalized user.
+    Runs in a worker process.
+    """
+    if kind == "recommend":
+        return evaluate_profile(user, explain=explain, top=top)
+
+    state = cached_inference(user)
+    if kind == "scores":
+        return {"scores": compute_scores(state)}
+    if kind == "explain":
+        return {"explanations": build_explanations(state)}
+    raise ValueError(f"unknown request kind: {kind}")
+
+
+# ===========================
+# 2. HTTP helpers
+# ===========================
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    411: "Length Required",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    """
+    Error that is sent back to the client as {"error": message} with the given status.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def encode_response(status, payload, keep_alive):
+    """
+    Encode a response: dict payloads as JSON, str payloads as Prometheus text.
+    """
+    if isinstance(payload, str):
+        body = payload.encode("utf-8")
+        content_type = CONTENT_TYPE
+    else:
+        body = json.dumps(payload).encode("utf-8")
+        content_type = "application/json"
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        f"\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+# Header lines accepted per request
+MAX_HEADERS = 100
+
+
+async def read_line(reader, status, message):
+    """
+    One line of the request head; lines longer than the stream limit
+    (64 KiB by default) raise HTTPError(status, message).
+    """
+    try:
+        return await reader.readline()
+    except (asyncio.LimitOverrunError, ValueError):   # readline() re-raises overruns as ValueError
+        raise HTTPError(status, message) from None
+
+
+async def read_request(reader, max_body):
+    """
+    Read one request. Returns (method, target, version, headers, body),
+    or None if the client closed the connection before sending anything.
+    """
+    line = await read_line(reader, 400, "request line too long")
+    if line == b"":
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise HTTPError(400, "malformed request line")
+    method, target, version = parts
+
+    headers = {}
+    count = 0
+    while True:
+        line = await read_line(reader, 431, "header line too long")
+        if line in (b"\r\n", b"\n"):
+            break
+        if line == b"":
+            raise HTTPError(400, "incomplete headers")
+        count += 1
+        if count > MAX_HEADERS:
+            raise HTTPError(431, f"more than {MAX_HEADERS} headers")
+        name, sep, value = line.decode("latin-1").partition(":")
+        if sep == "":
+            raise HTTPError(400, "malformed header")
+        headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    if "transfer-encoding" in headers:
+        raise HTTPError(411, "chunked bodies are not supported, send Content-Length")
+    if "content-length" in headers:
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HTTPError(400, "invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "invalid Content-Length")
+        if length > max_body:
+            raise HTTPError(413, f"body larger than {max_body} bytes")
+        body = await reader.readexactly(length)
+
+    return method, target, version, headers, body
+
+
+def wants_keep_alive(version, headers):
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+@instrumented
+def parse_profile(body):
+    try:
+        raw = json.loads(body.decode("utf-8") if body else "{}")
+        return normalize_user(raw)
+    except ValueError as e:
+        raise HTTPError(400, str(e))
+
+
+def query_int(query, name):
+    if name not in query:
+        return None
+    try:
+        value = int(query[name][-1])
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+    if value < 1:
+        raise HTTPError(400, f"{name} must be at least 1")
+    return value
+
+
+def query_flag(query, name):
+    return name in query and query[name][-1].lower() in ("1", "true", "yes")
+
+
+# ===========================
+# 3. Request coalescing
+# ===========================
+
+class SingleFlight:
+    """
+    Share one in-flight computation between concurrent callers with the same key.
+
+    The first caller for a key starts the computation ("computed"); callers that
+    arrive while it is still running wait for the same result ("coalesced").
+    Once it finishes the key is forgotten, so results are never served stale.
+    """
+
+    def __init__(self):
+        self.inflight = {}
+        self.computed = 0
+        self.coalesced = 0
+
+    async def run(self, key, factory):
+        """
+        Return the result of factory() (a coroutine function), computed at most
+        once for all concurrent callers with the same key.
+        """
+        future = self.inflight.get(key)
+        if future is None:
+            self.computed += 1
+            future = asyncio.ensure_future(factory())
+            self.inflight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+
+        # shield: a caller that disconnects must not cancel the shared computation
+        return await asyncio.shield(future)
+
+    def _finished(self, key, future):
+        if self.inflight.get(key) is future:
+            del self.inflight[key]
+        if not future.cancelled():
+            # Mark the exception as retrieved even if every waiter went away
+            future.exception()
+
+    def stats(self):
+        return {
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+            "inflight": len(self.inflight),
+        }
+
+
+# ===========================
+# 4. Server
+# ===========================
+
+class RecommendationServer:
+    """
+    asyncio HTTP server for the travel advisor.
+
+    workers           -> inference processes
+    concurrency       -> max requests computing at once; further requests wait
+    keepalive_timeout -> seconds an idle keep-alive connection is kept open
+    max_body          -> largest accepted request body in bytes
+    coalesce          -> share one computation between identical concurrent requests
+    metrics           -> collect counters and stage latencies for GET /metrics
+    tracer            -> optional travel_spans.Tracer recording sampled requests
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, workers=None, concurrency=None,
+                 keepalive_timeout=15.0, max_body=64 * 1024, coalesce=True, metrics=True,
+                 tracer=None):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.concurrency = concurrency or self.workers * 4
+        self.keepalive_timeout = keepalive_timeout
+        self.max_body = max_body
+        self.coalesce = coalesce
+        self.single_flight = SingleFlight()
+        self.metrics = Metrics() if metrics else None
+        self.tracer = tracer
+
+        self.pool = None
+        self.kb = None
+        self.server = None
+        self.limit = None
+        self.connections = set()   # connection handler tasks
+        self.busy = set()          # tasks currently handling a request
+        self.closing = False
+        self.stopped = None
+
+    # ----- lifecycle -----
+
+    async def start(self):
+        # Workers attach to one shared copy of the knowledge base
+        self.kb = SharedKB()
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(self.kb.name,))
+        self.limit = asyncio.Semaphore(self.concurrency)
+        self.stopped = asyncio.Event()
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        await self.stopped.wait()
+
+    async def shutdown(self, timeout=10.0):
+        """
+        Graceful shutdown: stop accepting connections, let requests that are
+        already running finish (up to timeout seconds), close idle keep-alive
+        connections, then stop the worker processes.
+        """
+        if self.closing:
+            return
+        self.closing = True
+        self.server.close()
+
+        # Idle connections are waiting for the next request: close them now
+        for task in list(self.connections):
+            if task not in self.busy:
+                task.cancel()
+
+        if self.connections:
+            done, pending = await asyncio.wait(list(self.connections), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+        # Only after the connections are gone: on Python 3.12+ this waits for them
+        await self.server.wait_closed()
+        self.pool.shutdown(wait=True)
+        if self.tracer is not None:
+            self.tracer.close()
+        self.kb.close()
+        self.kb.unlink()
+        self.stopped.set()
+
+    # ----- connections -----
+
+    async def handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while not self.closing:
+                try:
+                    request = await asyncio.wait_for(read_request(reader, self.max_body), self.keepalive_timeout)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    writer.write(encode_response(e.status, {"error": e.message}, False))
+                    await writer.drain()
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+
+                method, target, version, headers, body = request
+                keep_alive = wants_keep_alive(version, headers)
+
+                self.busy.add(task)
+                try:
+                    with self.trace_request(method, target) as trace:
+                        status, payload = await self.dispatch(method, target, body)
+                        keep_alive = keep_alive and not self.closing
+                        with stage("render"):
+                            response = encode_response(status, payload, keep_alive)
+                        if trace is not None:
+                            trace.args["status"] = status
+                finally:
+                    self.busy.discard(task)
+
+                writer.write(response)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except asyncio.CancelledError:
+            pass
+        except ConnectionError:
+            pass
+        finally:
+            self.connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    def trace_request(self, method, target):
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.request(f"{method} {urlsplit(target).path}")
+
+    # ----- routing -----
+
+    async def dispatch(self, method, target, body):
+        """
+        Route one request and return (status, JSON payload or metrics text).
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        query = parse_qs(url.query)
+
+        try:
+            if path == "/health":
+                self.require(method, "GET")
+                return 200, {"status": "ok"}
+
+            if path == "/destinations":
+                self.require(method, "GET")
+                return 200, {"destinations": list(DESTINATIONS)}
+
+            if path == "/stats":
+                self.require(method, "GET")
+                return 200, self.single_flight.stats()
+
+            if path == "/metrics":
+                self.require(method, "GET")
+                if self.metrics is None:
+                    raise HTTPError(404, "metrics are disabled")
+                return 200, self.metrics.render()
+
+            if path.startswith("/tips/"):
+                self.require(method, "GET")
+                dest = unquote(path[len("/tips/"):])
+                if dest not in TRAVEL_TIPS and dest not in DESTINATIONS:
+                    raise HTTPError(404, f"unknown destination: {dest}")
+                return 200, {"destination": dest, "tips": lookup_tips([dest])[dest]}
+
+            if path in ("/recommend", "/scores", "/explain"):
+                self.require(method, "POST")
+                kind = path[1:]
+                user = parse_profile(body)
+                top = query_int(query, "top")
+                explain = query_flag(query, "explain")
+                return 200, await self.compute(kind, user, top, explain)
+
+            raise HTTPError(404, f"no such endpoint: {path}")
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    def require(self, method, expected):
+        if method != expected:
+            raise HTTPError(405, f"use {expected}")
+
+    async def compute(self, kind, user, top=None, explain=False):
+        """
+        Run one inference request in the process pool, at most `concurrency` at a time.
+        Identical concurrent requests (same endpoint, options and canonical profile)
+        share one computation unless coalescing is disabled.
+        """
+        async def run():
+            # Workers send their metric counts and spans back with the payload
+            trace = current_trace()
+            work = functools.partial(evaluate_request, kind, user, top, explain)
+            if trace is not None:
+                work = functools.partial(call_traced, work, trace.context())
+            if self.metrics is not None:
+                work = functools.partial(call_with_metrics, work)
+
+            async with self.limit:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.pool, work)
+            if self.metrics is not None:
+                result, snapshot = result
+                self.metrics.merge(snapshot)
+            if trace is not None:
+                result, spans = result
+                trace.attach(spans)
+            return result
+
+        if not self.coalesce:
+            self.single_flight.computed += 1
+            return await run()
+        key = (kind, top, explain, canonical_profile(user))
+        return await self.single_flight.run(key, run)
+
+
+async def serve(host="127.0.0.1", port=8080, workers=None, concurrency=None, keepalive_timeout=15.0, coalesce=True,
+                metrics=True, tracer=None):
+    """
+    Run a server until SIGINT / SIGTERM, then shut down gracefully.
+    """
+    server = RecommendationServer(host, port, workers, concurrency, keepalive_timeout, coalesce=coalesce,
+                                  metrics=metrics, tracer=tracer)
+    await server.start()
+    print(f"Travel advisor listening on http://{server.host}:{server.port} "
+          f"({server.workers} workers, concurrency {server.concurrency})")
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.ensure_future(server.shutdown()))
+        except NotImplementedError:
+            # Windows: Ctrl+C raises KeyboardInterrupt instead
+            pass
+
+    await server.serve_forever()
+    stats = server.single_flight.stats()
+    print(f"Server stopped ({stats['computed']} computed, {stats['coalesced']} coalesced).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local HTTP service for the travel advisor.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="inference processes (default: all CPUs)")
+    parser.add_argument("--concurrency", type=int, default=None, help="max requests computing at once (default: 4 per worker)")
+    parser.add_argument("--keepalive-timeout", type=float, default=15.0, help="seconds to keep idle connections open")
+    parser.add_argument("--no-coalesce", action="store_true", help="compute every request, even identical concurrent ones")
+    parser.add_argument("--no-metrics", action="store_true", help="do not collect metrics (GET /metrics returns 404)")
+    parser.add_argument("--trace", metavar="TARGET", default=None, help="record timing spans to a trace file or collector URL")
+    parser.add_argument("--trace-rate", type=float, default=1.0, help="fraction of requests traced with --trace (default 1)")
+    add_trace_args(parser)
+    args = parser.parse_args()
+    apply_trace_args(args)
+
+    tracer = Tracer(make_exporter(args.trace), args.trace_rate) if args.trace else None
+
+    asyncio.run(serve(args.host, args.port, args.workers, args.concurrency, args.keepalive_timeout,
+                      coalesce=not args.no_coalesce, metrics=not args.no_metrics, tracer=tracer))
@@ -0,0 +1,335 @@
+# =============================================
+# Travel Shard - Sharded Catalog, Scatter-Gather Ranking
+# =============================================
+# Splits the destination catalog into contiguous shards. Each shard is served
+# by its own worker process over a TCP socket and runs the rules on its slice
+# only; a coordinator sends the profile to every shard, gathers the per-shard
+# top-k and merges them into the global ranking.
+#
+# Every rule and score is computed per destination (only the R23 flag looks at
+# all destinations, and it does not affect scores), so the merged ranking is
+# identical to rank_destinations(compute_scores(...)) on the whole catalog:
+# shards rank by (-score, global catalog index) and the merge uses the same key.
+#
+# Messages use the newline-JSON format of travel_daemon (send_message / recv_message).
+#
+# Usage:
+#     python travel_shard.py serve --shard 0 --shards 2 --port 9100 &
+#     python travel_shard.py serve --shard 1 --shards 2 --port 9101 &
+#     echo '{"budget": "low"}' | python travel_shard.py query --top 5 localhost:9100 localhost:9101
+#     python travel_shard.py demo --shards 4        # local shards, checked against the unsharded ranking
+
+import argparse
+import heapq
+import itertools
+import json
+import multiprocessing
+import socket
+import socketserver
+import sys
+
+from travel_info import DESTINATIONS, build_destination_facts
+from travel_core import (
+    normalize_user,
+    run_inference,
+    compute_scores,
+    rank_destinations,
+)
+from travel_daemon import send_message, recv_message
+
+
+# ===========================
+# 1. Catalog slices
+# ===========================
+
+def load_catalog(path=None):
+    """
+    Return (destinations, dest_facts): the built-in catalog, or a JSON file
+    {"destinations": [...], "facts": {...}} with facts shaped like build_destination_facts().
+    """
+    if path is None:
+        return list(DESTINATIONS), build_destination_facts()
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["destinations"], data["facts"]
+
+
+def shard_range(count, shard, shards):
+    """
+    (start, stop) catalog indices of one shard; shards differ in size by at most one.
+    """
+    size, extra = divmod(count, shards)
+    start = shard * size + min(shard, extra)
+    stop = start + size + (1 if shard < extra else 0)
+    return start, stop
+
+
+def slice_facts(dest_facts, members):
+    """
+    Restrict dest_facts to the given set of destinations.
+    """
+    sliced = {}
+    for fact, values in dest_facts.items():
+        if isinstance(values, dict):
+            sliced[fact] = {d: v for d, v in values.items() if d in members}
+        else:
+            sliced[fact] = {d for d in values if d in members}
+    return sliced
+
+
+# ===========================
+# 2. Shard worker
+# ===========================
+
+def check_k(k):
+    """
+    k of a top_k request: None (every destination) or a non-negative integer.
+    """
+    if k is not None and (isinstance(k, bool) or not isinstance(k, int) or k < 0):
+        raise ValueError(f"invalid k: {k!r} (expected a non-negative integer)")
+    return k
+
+
+class Shard:
+    """
+    One slice of the catalog: destinations[start:stop] and their facts.
+    """
+
+    def __init__(self, destinations, dest_facts, shard=0, shards=1):
+        self.start, stop = shard_range(len(destinations), shard, shards)
+        self.destinations = destinations[self.start:stop]
+        self.position = {d: self.start + i for i, d in enumerate(self.destinations)}
+        self.dest_facts = slice_facts(dest_facts, set(self.destinations))
+
+    def top_k(self, user, k=None):
+        """
+        Best k destinations of this shard as [score, global index, destination],
+        ordered by (-score, global index), plus the shard's flags.
+        """
+        state = run_inference(user, self.dest_facts, self.destinations)
+        scores = compute_scores(state)
+        ranked = rank_destinations(scores, k=k, destinations=self.destinations)
+        entries = [[scores[d], self.position[d], d] for d in ranked]
+        return {"entries": entries, "flags": state["flags"]}
+
+    def handle(self, message):
+        op = message.get("op", "top_k")
+        if op == "ping":
+            return {"ok": True, "result": {"start": self.start, "size": len(self.destinations)}}
+        if op != "top_k":
+            return {"ok": False, "error": f"unknown op: {op}"}
+        try:
+            k = check_k(message.get("k"))
+            user = normalize_user(message.get("profile", {}))
+            return {"ok": True, "result": self.top_k(user, k)}
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+
+
+def serve_shard(shard, shards, host="127.0.0.1", port=0, catalog=None, ready=None):
+    """
+    Serve one shard over TCP until the process is stopped.
+    ready (optional multiprocessing connection) receives the bound (host, port).
+    """
+    destinations, dest_facts = load_catalog(catalog)
+    worker = Shard(destinations, dest_facts, shard, shards)
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                try:
+                    message = recv_message(self.rfile)
+                except ValueError as e:
+                    send_message(self.connection, {"ok": False, "error": f"invalid JSON: {e}"})
+                    continue
+                if message is None:
+                    return
+                send_message(self.connection, worker.handle(message))
+
+    class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+        daemon_threads = True
+        allow_reuse_address = True
+
+    with Server((host, port), Handler) as server:
+        if ready is not None:
+            ready.send(server.server_address[:2])
+            ready.close()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+# ===========================
+# 3. Coordinator
+# ===========================
+
+def parse_address(text):
+    host, _, port = text.rpartition(":")
+    return (host or "127.0.0.1", int(port))
+
+
+class ShardedCatalog:
+    """
+    Coordinator for a set of shard servers (one persistent connection each).
+    Not thread-safe: use one coordinator per thread.
+    """
+
+    def __init__(self, addresses, timeout=60.0):
+        self.addresses = [parse_address(a) if isinstance(a, str) else tuple(a) for a in addresses]
+        self.connections = []
+        for address in self.addresses:
+            sock = socket.create_connection(address, timeout=timeout)
+            self.connections.append((sock, sock.makefile("rb")))
+
+    def scatter_gather(self, message):
+        """
+        Send message to every shard first, then collect all answers, so the
+        shards work in parallel. Returns the list of results in shard order.
+        """
+        for sock, _ in self.connections:
+            send_message(sock, message)
+        results = []
+        errors = []
+        for (sock, stream), address in zip(self.connections, self.addresses):
+            response = recv_message(stream)
+            if response is None:
+                raise ConnectionError(f"shard {address[0]}:{address[1]} closed the connection")
+            if not response.get("ok"):
+                errors.append(response.get("error"))
+            results.append(response.get("result"))
+        if errors:
+            raise ValueError(errors[0])
+        return results
+
+    def rank(self, profile, k=None):
+        """
+        Global ranking for a profile (dict, normalized by the shards):
+          "ranking" -> [{"destination", "score"}, ...] best first, top k if given
+          "flags"   -> union of the shard flags
+        """
+        parts = self.scatter_gather({"op": "top_k", "profile": profile, "k": check_k(k)})
+        return merge_top_k(parts, k)
+
+    def close(self):
+        for sock, stream in self.connections:
+            stream.close()
+            sock.close()
+        self.connections = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def merge_top_k(parts, k=None):
+    """
+    Merge per-shard results (each sorted by (-score, global index)) into the global top k.
+    """
+    streams = [[(-score, index, d) for score, index, d in part["entries"]] for part in parts]
+    merged = heapq.merge(*streams)
+    if k is not None:
+        merged = itertools.islice(merged, k)
+
+    flags = []
+    for part in parts:
+        for flag in part["flags"]:
+            if flag not in flags:
+                flags.append(flag)
+
+    return {
+        "ranking": [{"destination": d, "score": -neg} for neg, index, d in merged],
+        "flags": flags,
+    }
+
+
+# ===========================
+# 4. Local shards
+# ===========================
+
+def start_local_shards(shards, catalog=None, host="127.0.0.1"):
+    """
+    Start one shard server process per shard on free local ports.
+    Returns (addresses, processes); stop them with stop_local_shards().
+    """
+    addresses = []
+    processes = []
+    for shard in range(shards):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=serve_shard,
+            args=(shard, shards, host, 0, catalog, sender),
+            daemon=True,
+        )
+        process.start()
+        sender.close()
+        addresses.append(tuple(receiver.recv()))
+        receiver.close()
+        processes.append(process)
+    return addresses, processes
+
+
+def stop_local_shards(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sharded travel advisor catalog.")
+    parser.add_argument("--catalog", default=None, help="catalog JSON file (default: built-in destinations)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="serve one shard")
+    serve.add_argument("--shard", type=int, required=True)
+    serve.add_argument("--shards", type=int, required=True)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, required=True)
+
+    query = commands.add_parser("query", help="rank a profile (JSON on stdin) across shards")
+    query.add_argument("addresses", nargs="+", help="shard addresses host:port, in shard order")
+    query.add_argument("--top", type=int, default=None)
+
+    demo = commands.add_parser("demo", help="start local shards and compare with the unsharded ranking")
+    demo.add_argument("--shards", type=int, default=2)
+    demo.add_argument("--top", type=int, default=5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        print(f"Shard {args.shard}/{args.shards} listening on {args.host}:{args.port}", flush=True)
+        serve_shard(args.shard, args.shards, args.host, args.port, args.catalog)
+        return 0
+
+    if args.command == "query":
+        text = sys.stdin.read()
+        profile = json.loads(text) if text.strip() else {}
+        with ShardedCatalog(args.addresses) as catalog:
+            print(json.dumps(catalog.rank(profile, args.top)))
+        return 0
+
+    # demo
+    user = normalize_user({})
+    destinations, dest_facts = load_catalog(args.catalog)
+    expected = rank_destinations(compute_scores(run_inference(user, dest_facts, destinations)),
+                                 k=args.top, destinations=destinations)
+
+    addresses, processes = start_local_shards(args.shards, args.catalog)
+    try:
+        with ShardedCatalog(addresses) as catalog:
+            result = catalog.rank({}, args.top)
+    finally:
+        stop_local_shards(processes)
+
+    for i, entry in enumerate(result["ranking"], start=1):
+        print(f"{i:>3}. {entry['destination']:<20} {entry['score']:>4}")
+    same = [entry["destination"] for entry in result["ranking"]] == expected
+    print("Matches unsharded ranking:", same)
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,499 @@
+# =============================================
+# Travel Spans - Sampled Request Tracing
+# =============================================
+# Records one timing span per instrumented call made while a sampled request
+# runs: profile parsing (normalize_user), run_inference and each rule_* family
+# inside it, compute_scores, explanations, tip lookup (lookup_tips) and
+# rendering (JSON encoding, charts, reports). Spans come from the
+# travel_instrument hooks, so no engine code knows about tracing.
+#
+# Spans are exported in the Chrome trace-event format ("X" complete events,
+# timestamps in microseconds), which chrome://tracing, Perfetto and most trace
+# tools load directly:
+#
+#   {"name": "rule_safety", "cat": "rule", "ph": "X", "ts": ..., "dur": ...,
+#    "pid": ..., "tid": <request lane>, "args": {"trace_id": ...}}
+#
+# Each request gets its own lane (tid), so concurrent requests never overlap;
+# spans recorded in pool workers keep the worker's pid on the same lane.
+#
+# Sampling is decided once per request (rate 0..1). The hooks are only
+# registered while a sampled request runs, so unsampled requests (and
+# processes without a tracer) pay nothing beyond the usual listener check.
+#
+# Targets: a local file (trace.json) or the URL of a collector, which receives
+# {"traceEvents": [...]} batches by HTTP POST. "collect" runs a stand-in
+# collector that appends what it receives to a file.
+#
+# Usage:
+#     python travel_server.py --trace trace.json --trace-rate 0.05
+#     TRAVEL_TRACE=trace.json python travel_gui.py
+#     python travel_spans.py run profiles.jsonl trace.json --rate 0.1
+#     python travel_spans.py collect --port 9411 --output collected.json
+#     python travel_spans.py summary trace.json        # p50 / p99 / max per span
+
+import argparse
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from travel_instrument import add_listener, remove_listener
+
+
+# ===========================
+# 1. Per-request traces
+# ===========================
+
+# Trace of the request running in the current thread / asyncio task
+_CURRENT = contextvars.ContextVar("travel_trace", default=None)
+
+
+class Trace:
+    """
+    Spans of one sampled request.
+    trace_id -> hex id shared by all spans of the request
+    lane     -> tid of the request in the exported events
+    spans    -> list of (name, started, elapsed, pid); started is time.perf_counter()
+    args     -> extra arguments of the request span (e.g. status)
+    """
+
+    def __init__(self, trace_id, lane):
+        self.trace_id = trace_id
+        self.lane = lane
+        self.pid = os.getpid()
+        self.spans = []
+        self.args = {}
+
+    def context(self):
+        """
+        Picklable (trace_id, lane) pair to continue the trace in a worker process.
+        """
+        return self.trace_id, self.lane
+
+    def attach(self, spans):
+        """
+        Add spans recorded elsewhere (see call_traced).
+        """
+        self.spans.extend(spans)
+
+
+def current_trace():
+    """
+    Trace of the sampled request being handled here, or None.
+    """
+    return _CURRENT.get()
+
+
+def _record(name, started, elapsed, facts, result):
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.spans.append((name, started, elapsed, trace.pid))
+
+
+# The listener is registered while at least one sampled request runs
+_RECORDING = threading.Lock()
+_recording = 0
+
+
+def _start_recording():
+    global _recording
+    with _RECORDING:
+        if _recording == 0:
+            add_listener(_record, facts=False)
+        _recording += 1
+
+
+def _stop_recording():
+    global _recording
+    with _RECORDING:
+        _recording -= 1
+        if _recording == 0:
+            remove_listener(_record)
+
+
+def call_traced(fn, context, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) as part of the trace context (from Trace.context())
+    and return (result, spans); meant for pool workers, whose spans the parent
+    attaches to its trace.
+    """
+    trace = Trace(*context)
+    token = _CURRENT.set(trace)
+    _start_recording()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        _stop_recording()
+        _CURRENT.reset(token)
+    return result, trace.spans
+
+
+# ===========================
+# 2. Tracer
+# ===========================
+
+def span_category(name):
+    return "rule" if name.startswith("rule_") else "stage"
+
+
+def trace_events(trace, name, started, elapsed):
+    """
+    Chrome trace events of a finished request: its own span plus every recorded span.
+    """
+    base = {"trace_id": trace.trace_id}
+    events = [{
+        "name": name, "cat": "request", "ph": "X",
+        "ts": round(started * 1e6, 3), "dur": round(elapsed * 1e6, 3),
+        "pid": trace.pid, "tid": trace.lane, "args": dict(base, **trace.args),
+    }]
+    for span_name, span_started, span_elapsed, pid in trace.spans:
+        events.append({
+            "name": span_name, "cat": span_category(span_name), "ph": "X",
+            "ts": round(span_started * 1e6, 3), "dur": round(span_elapsed * 1e6, 3),
+            "pid": pid, "tid": trace.lane, "args": base,
+        })
+    return events
+
+
+class _RequestSpan:
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.trace = None
+
+    def __enter__(self):
+        if not self.tracer.sampled():
+            return None
+        self.trace = Trace(f"{random.getrandbits(64):016x}", next(self.tracer.lanes))
+        self.trace.args.update(self.args)
+        self.token = _CURRENT.set(self.trace)
+        _start_recording()
+        self.started = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.trace is None:
+            return False
+        elapsed = time.perf_counter() - self.started
+        _stop_recording()
+        _CURRENT.reset(self.token)
+        if exc_type is not None:
+            self.trace.args["error"] = exc_type.__name__
+        self.tracer.exporter.export(trace_events(self.trace, self.name, self.started, elapsed))
+        return False
+
+
+class Tracer:
+    """
+    exporter -> FileExporter / CollectorExporter (anything with export(events) and close())
+    rate     -> fraction of requests that are traced (0..1)
+    """
+
+    def __init__(self, exporter, rate=1.0):
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"sampling rate must be between 0 and 1: {rate}")
+        self.exporter = exporter
+        self.rate = rate
+        self.lanes = itertools.count(1)
+
+    def sampled(self):
+        return self.rate >= 1.0 or (self.rate > 0.0 and random.random() < self.rate)
+
+    def request(self, name, **args):
+        """
+        Context manager around one request. Yields its Trace if the request is
+        sampled, else None; the spans are exported when the block ends.
+        """
+        return _RequestSpan(self, name, args)
+
+    def close(self):
+        self.exporter.close()
+
+
+# ===========================
+# 3. Exporters
+# ===========================
+
+class FileExporter:
+    """
+    Appends events to a Chrome trace file (JSON array format). The file is
+    loadable at any time: trace viewers accept an array that is not closed yet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write("[\n")
+        self.file.flush()
+
+    def export(self, events):
+        text = "".join(json.dumps(event) + ",\n" for event in events)
+        with self.lock:
+            if self.file is not None:
+                self.file.write(text)
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is None:
+                return
+            meta = {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "travel-advisor"}}
+            self.file.write(json.dumps(meta) + "\n]\n")
+            self.file.close()
+            self.file = None
+
+
+class CollectorExporter:
+    """
+    Sends events to a collector URL in batches ({"traceEvents": [...]} POSTs)
+    from a background thread. Requests never wait for the collector: when the
+    queue is full or the collector is unreachable, events are dropped and
+    counted in .dropped.
+    """
+
+    def __init__(self, url, batch_size=512, interval=1.0, max_queue=50000, timeout=2.0):
+        self.url = url
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.queue = deque()
+        self.dropped = 0
+        self.sent = 0
+        self.wake = threading.Event()
+        self.closing = False
+        self.thread = threading.Thread(target=self._run, name="travel-spans", daemon=True)
+        self.thread.start()
+
+    def export(self, events):
+        if len(self.queue) + len(events) > self.max_queue:
+            self.dropped += len(events)
+            return
+        self.queue.extend(events)
+        if len(self.queue) >= self.batch_size:
+            self.wake.set()
+
+    def _run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            while self.queue:
+                batch = []
+                while self.queue and len(batch) < self.batch_size:
+                    batch.append(self.queue.popleft())
+                self._send(batch)
+            if self.closing:
+                return
+
+    def _send(self, batch):
+        body = json.dumps({"traceEvents": batch}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+            self.sent += len(batch)
+        except OSError:
+            self.dropped += len(batch)
+
+    def close(self):
+        if self.closing:
+            return
+        self.closing = True
+        self.wake.set()
+        self.thread.join()
+
+
+def make_exporter(target):
+    """
+    CollectorExporter for http(s) URLs, FileExporter for anything else.
+    """
+    if target.startswith(("http://", "https://")):
+        return CollectorExporter(target)
+    return FileExporter(target)
+
+
+# ===========================
+# 4. Process-wide tracer
+# ===========================
+
+_DEFAULT = {}
+
+
+def default_tracer():
+    """
+    Tracer configured by TRAVEL_TRACE (file or collector URL) and
+    TRAVEL_TRACE_RATE (default 1), or None when TRAVEL_TRACE is not set.
+    """
+    target = os.environ.get("TRAVEL_TRACE")
+    if not target:
+        return None
+    tracer = _DEFAULT.get(target)
+    if tracer is None:
+        rate = float(os.environ.get("TRAVEL_TRACE_RATE", "1"))
+        tracer = Tracer(make_exporter(target), rate)
+        atexit.register(tracer.close)
+        _DEFAULT[target] = tracer
+    return tracer
+
+
+def trace_request(name, **args):
+    """
+    tracer.request(name) on the default tracer; a no-op context when tracing is off.
+    """
+    tracer = default_tracer()
+    if tracer is None:
+        return nullcontext()
+    return tracer.request(name, **args)
+
+
+# ===========================
+# 5. Collector stand-in and CLI
+# ===========================
+
+def serve_collector(output, port=9411, host="127.0.0.1"):
+    """
+    Accept POSTed {"traceEvents": [...]} batches and append them to a trace
+    file. Runs on a daemon thread; returns (HTTP server, FileExporter).
+    """
+    exporter = FileExporter(output)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                events = json.loads(self.rfile.read(length))["traceEvents"]
+            except (ValueError, KeyError, TypeError):
+                self.send_error(400, "expected {\"traceEvents\": [...]}")
+                return
+            exporter.export(events)
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="travel-collector", daemon=True).start()
+    return server, exporter
+
+
+def read_trace(path):
+    """
+    Events of a trace file written by FileExporter (closed or not).
+    """
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    if not text.endswith("]"):
+        text = text.rstrip(",") + "]"
+    return json.loads(text)
+
+
+def summarize_trace(events):
+    """
+    Per span name: (count, p50 ms, p99 ms, max ms), slowest p99 first.
+    """
+    durations = {}
+    for event in events:
+        if event.get("ph") == "X":
+            durations.setdefault(event["name"], []).append(event["dur"] / 1000.0)
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        p50 = values[(len(values) - 1) // 2]
+        p99 = values[min(len(values) - 1, int(len(values) * 0.99))]
+        rows.append((name, len(values), p50, p99, values[-1]))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def run_profiles(infile, tracer):
+    """
+    Evaluate JSONL profiles in this process, one traced request per line:
+    parsing, inference, scoring, explanations, tips and JSON rendering.
+    """
+    from travel_core import normalize_user, cached_inference, summarize_state, lookup_tips
+    from travel_instrument import stage
+
+    count = 0
+    for number, text in enumerate(infile, start=1):
+        if not text.strip():
+            continue
+        with tracer.request("profile", line=number):
+            try:
+                user = normalize_user(json.loads(text))
+                state = cached_inference(user)
+                result = summarize_state(state, explain=True)
+                result["tips"] = lookup_tips(result["final_recommendation"])
+            except ValueError as e:
+                result = {"line": number, "error": str(e)}
+            with stage("render"):
+                json.dumps(result)
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timing spans of the travel advisor pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="trace the evaluation of JSONL profiles")
+    run.add_argument("input", help="JSONL profiles ('-' for stdin)")
+    run.add_argument("target", help="trace file or collector URL")
+    run.add_argument("--rate", type=float, default=1.0, help="fraction of profiles traced (default 1)")
+
+    collect = commands.add_parser("collect", help="run a stand-in collector that writes a trace file")
+    collect.add_argument("--port", type=int, default=9411)
+    collect.add_argument("--host", default="127.0.0.1")
+    collect.add_argument("--output", default="collected.json")
+
+    summary = commands.add_parser("summary", help="latency percentiles per span name")
+    summary.add_argument("trace")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        tracer = Tracer(make_exporter(args.target), args.rate)
+        infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+        try:
+            count = run_profiles(infile, tracer)
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+            tracer.close()
+        print(f"Evaluated {count} profiles, spans in {args.target}")
+        return 0
+
+    if args.command == "collect":
+        server, exporter = serve_collector(args.output, args.port, args.host)
+        print(f"Collecting spans on http://{args.host}:{server.server_address[1]}/ into {args.output}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+            exporter.close()
+        return 0
+
+    rows = summarize_trace(read_trace(args.trace))
+    header = f"{'span':<34} {'count':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, count, p50, p99, worst in rows:
+        print(f"{name:<34} {count:>7} {p50:>9.3f} {p99:>9.3f} {worst:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
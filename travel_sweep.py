@@ -0,0 +1,283 @@
+# =============================================
+# Travel Sweep - Exhaustive Profile Audit
+# =============================================
+# Runs every reachable user profile through the engine and counts:
+# - how often each destination ranks first,
+# - how often each rule fires,
+# - how often R22 contradictions occur (per destination and per profile).
+#
+# Used to audit the knowledge base in travel_info.py for bias.
+#
+# Only fields that some rule reads are swept (see travel_whatif.FIELD_RULE_FAMILY);
+# trip_duration, crowd_tolerance and climate_preference never change the result,
+# so sweeping them would only multiply every count by the same factor.
+#
+# Profiles are numbered 0 .. sweep_size()-1 and decoded on the worker side, so
+# a work unit is just an index range. Results are merged into running Counters
+# as chunks finish, with a bounded number of chunks in flight, so memory stays
+# flat regardless of sweep size.
+#
+# Usage:
+#     python travel_sweep.py                 # all CPUs
+#     python travel_sweep.py --workers 1     # serial, in-process
+
+import argparse
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from travel_info import (
+    DESTINATIONS,
+    PROFILE_OPTIONS,
+    LIKES_OPTIONS,
+    build_destination_facts,
+)
+from travel_core import (
+    run_inference,
+    compute_scores,
+    rank_destinations,
+)
+from travel_plot import compute_rule_frequency
+from travel_whatif import FIELD_RULE_FAMILY
+from travel_kb import SharedKB, attach_kb
+from travel_query import BitmapIndex, IndexBuilder
+
+
+# ===========================
+# 1. Profile numbering
+# ===========================
+
+# Single-valued fields read by at least one rule, in decoding order
+SWEEP_FIELDS = [field for field in PROFILE_OPTIONS if field in FIELD_RULE_FAMILY]
+
+# "likes" is swept as every subset of LIKES_OPTIONS (a bitmask)
+LIKES_SUBSETS = 2 ** len(LIKES_OPTIONS)
+
+
+def sweep_size():
+    """
+    Number of distinct profiles in a full sweep.
+    """
+    size = LIKES_SUBSETS
+    for field in SWEEP_FIELDS:
+        size *= len(PROFILE_OPTIONS[field])
+    return size
+
+
+def decode_profile(index):
+    """
+    Build the user profile with the given sweep index (mixed radix over
+    SWEEP_FIELDS, then the "likes" bitmask). Fields that no rule reads get
+    their first option.
+    """
+    user = {field: options[0] for field, options in PROFILE_OPTIONS.items()}
+
+    for field in SWEEP_FIELDS:
+        options = PROFILE_OPTIONS[field]
+        index, digit = divmod(index, len(options))
+        user[field] = options[digit]
+
+    mask = index % LIKES_SUBSETS
+    user["likes"] = [like for bit, like in enumerate(LIKES_OPTIONS) if mask & (1 << bit)]
+    return user
+
+
+# ===========================
+# 2. Work units
+# ===========================
+
+# Per-process catalog, set once by _init_worker() / _init_shared_worker()
+_WORKER = {}
+
+
+def _init_worker(dest_facts, destinations, weights, index=False):
+    _WORKER["dest_facts"] = dest_facts
+    _WORKER["destinations"] = destinations
+    _WORKER["weights"] = weights
+    _WORKER["index"] = index
+
+
+def _init_shared_worker(kb_name, weights, index=False):
+    # Attach to the catalog published by the parent instead of copying it; the
+    # rules read the shared fact views, only the names they loop over are decoded
+    kb = attach_kb(kb_name)
+    _WORKER["kb"] = kb
+    _init_worker(kb.dest_facts, list(kb.destinations), weights, index)
+
+
+def empty_totals():
+    """
+    Counters filled by a sweep:
+      "profiles"                -> number of profiles evaluated
+      "winners"                 -> dest -> times ranked first
+      "rules"                   -> rule -> times fired (trace lines, like the charts)
+      "contradictions"          -> dest -> times flagged by R22
+      "contradicting_profiles"  -> profiles with at least one R22 contradiction
+      "index"                   -> travel_query.BitmapIndex (only with sweep(index=True))
+    """
+    return {
+        "profiles": 0,
+        "winners": Counter(),
+        "rules": Counter(),
+        "contradictions": Counter(),
+        "contradicting_profiles": 0,
+    }
+
+
+def merge_totals(totals, part):
+    """
+    Add the counts of one chunk into the running totals (in place).
+    """
+    totals["profiles"] += part["profiles"]
+    totals["winners"].update(part["winners"])
+    totals["rules"].update(part["rules"])
+    totals["contradictions"].update(part["contradictions"])
+    totals["contradicting_profiles"] += part["contradicting_profiles"]
+    if "index" in part:
+        totals.setdefault("index", BitmapIndex("sweep")).update(part["index"])
+    return totals
+
+
+def sweep_chunk(start, stop):
+    """
+    Evaluate profiles start .. stop-1 and return their counts (see empty_totals()).
+    Runs in a worker process after _init_worker().
+    """
+    dest_facts = _WORKER["dest_facts"]
+    destinations = _WORKER["destinations"]
+    weights = _WORKER["weights"]
+    builder = IndexBuilder("sweep", start) if _WORKER.get("index") else None
+
+    part = empty_totals()
+    for index in range(start, stop):
+        user = decode_profile(index)
+        state = run_inference(user, dest_facts, destinations)
+        scores = compute_scores(state, weights)
+        if builder is not None:
+            builder.add(index, user, state)
+
+        part["winners"][rank_destinations(scores, k=1)[0]] += 1
+        part["rules"].update(compute_rule_frequency(state))
+        if len(state["contradictions"]) > 0:
+            part["contradictions"].update(state["contradictions"])
+            part["contradicting_profiles"] += 1
+
+    part["profiles"] = stop - start
+    if builder is not None:
+        part["index"] = builder.build()
+    return part
+
+
+def chunk_ranges(size, chunk_size):
+    """
+    Yield (start, stop) index ranges covering 0 .. size-1.
+    """
+    for start in range(0, size, chunk_size):
+        yield start, min(start + chunk_size, size)
+
+
+# ===========================
+# 3. Sweep driver
+# ===========================
+
+def sweep(workers=None, chunk_size=2000, dest_facts=None, destinations=DESTINATIONS,
+          weights="default", limit=None, progress=None, index=False):
+    """
+    Run the full profile sweep and return the merged counts (see empty_totals()).
+
+    workers    -> worker processes (None = all CPUs, 1 = serial in this process)
+    chunk_size -> profiles per work unit
+    limit      -> only sweep the first `limit` profiles
+    progress   -> optional callable(done, total), called as chunks finish
+    index      -> also build a bitmap index of the outcomes (totals["index"], see travel_query)
+    """
+    if dest_facts is None:
+        dest_facts = build_destination_facts()
+    destinations = list(destinations)
+
+    size = sweep_size()
+    if limit is not None:
+        size = min(size, limit)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    totals = empty_totals()
+    if index:
+        totals["index"] = BitmapIndex("sweep")
+    ranges = chunk_ranges(size, chunk_size)
+
+    if workers <= 1:
+        _init_worker(dest_facts, destinations, weights, index)
+        for start, stop in ranges:
+            merge_totals(totals, sweep_chunk(start, stop))
+            if progress is not None:
+                progress(totals["profiles"], size)
+        return totals
+
+    # Keep a few chunks per worker queued; merge results as they finish
+    max_in_flight = workers * 2
+    with SharedKB(dest_facts, destinations) as kb, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_shared_worker,
+                                initargs=(kb.name, weights, index)) as pool:
+        pending = set()
+        for start, stop in ranges:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge_totals(totals, future.result())
+                if progress is not None:
+                    progress(totals["profiles"], size)
+            pending.add(pool.submit(sweep_chunk, start, stop))
+
+        for future in pending:
+            merge_totals(totals, future.result())
+        if progress is not None:
+            progress(totals["profiles"], size)
+
+    return totals
+
+
+def format_sweep(totals, destinations=DESTINATIONS):
+    """
+    Text report for sweep counts: winners, contradictions and rule firings.
+    """
+    profiles = totals["profiles"]
+    lines = [f"Profiles evaluated: {profiles}"]
+    if profiles == 0:
+        return "\n".join(lines)
+
+    lines.append("")
+    lines.append(f"{'destination':<20} {'ranked first':>12} {'share':>7} {'contradictions':>15}")
+    for d in sorted(destinations, key=lambda d: -totals["winners"][d]):
+        wins = totals["winners"][d]
+        lines.append(
+            f"{d:<20} {wins:>12} {wins / profiles:>7.1%} {totals['contradictions'][d]:>15}"
+        )
+
+    contradicting = totals["contradicting_profiles"]
+    lines.append("")
+    lines.append(f"Profiles with R22 contradictions: {contradicting} ({contradicting / profiles:.1%})")
+
+    lines.append("")
+    lines.append(f"{'rule':<40} {'fired':>10} {'per profile':>12}")
+    for rule, count in sorted(totals["rules"].items(), key=lambda item: (-item[1], item[0])):
+        lines.append(f"{rule:<40} {count:>10} {count / profiles:>12.2f}")
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep every reachable profile through the travel advisor.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all CPUs, 1 = serial)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="profiles per work unit")
+    parser.add_argument("--limit", type=int, default=None, help="only sweep the first N profiles")
+    args = parser.parse_args()
+
+    def report_progress(done, total):
+        print(f"\r{done}/{total} profiles", end="", flush=True)
+
+    started = time.perf_counter()
+    totals = sweep(workers=args.workers, chunk_size=args.chunk_size, limit=args.limit, progress=report_progress)
+    print(f"\nSwept in {time.perf_counter() - started:.1f}s\n")
+    print(format_sweep(totals))
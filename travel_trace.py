@@ -0,0 +1,281 @@
+# =============================================
+# Travel Trace - Reasoning Trace Retention Policies
+# =============================================
+# Decides how much of state["trace"] an inference keeps, so long-running
+# processes (the server, a long GUI session) can keep the reasoning feature
+# with a strict bound on trace memory per request:
+#
+#   full        every trace line (default; state["trace"] is a plain list)
+#   first:N     the first N lines
+#   ring:N      the last N lines (ring buffer)
+#   sampled:N   a uniform sample of N lines, kept in trace order (reservoir)
+#
+# Bounded policies store the trace in a TraceBuffer. It keeps at most N lines,
+# but it counts every event per rule (rule_counts), so rule frequency charts
+# and metrics stay exact. trace_marker() describes what was dropped. The GUI
+# reasoning tab and travel_core.py --explain-profile show it.
+#
+# The policy is process-wide: TRAVEL_TRACE_RETENTION=ring:200, set_trace_policy()
+# or --trace-retention on travel_core.py / travel_gui.py / travel_server.py.
+#
+# Usage:
+#     from travel_trace import set_trace_policy, format_trace
+#     set_trace_policy("ring:200")
+#     state = run_inference(user, dest_facts)     # len(state["trace"]) <= 200
+#     for line in format_trace(state["trace"]):
+#         print(line)
+
+import argparse
+import os
+import random
+from collections import Counter, deque
+from collections.abc import Sequence
+
+
+TRACE_POLICIES = ["full", "first", "ring", "sampled"]
+
+DEFAULT_TRACE_LIMIT = 200
+
+
+# ===========================
+# 1. Policies
+# ===========================
+
+def parse_trace_policy(spec):
+    """
+    "full", "first:N", "ring:N" or "sampled:N" -> (policy, limit).
+    A bounded policy without N keeps DEFAULT_TRACE_LIMIT lines.
+    """
+    policy, _, limit = spec.strip().partition(":")
+    if policy not in TRACE_POLICIES:
+        raise ValueError(f"unknown trace policy: {spec}")
+    if policy == "full":
+        return "full", None
+    try:
+        limit = int(limit) if limit else DEFAULT_TRACE_LIMIT
+    except ValueError:
+        raise ValueError(f"invalid trace limit: {spec}") from None
+    if limit < 0:
+        raise ValueError(f"invalid trace limit: {spec}")
+    return policy, limit
+
+
+def format_trace_policy(policy, limit=None):
+    return policy if policy == "full" else f"{policy}:{limit}"
+
+
+_POLICY = [parse_trace_policy(os.environ.get("TRAVEL_TRACE_RETENTION") or "full")]
+
+
+def set_trace_policy(spec):
+    """
+    Set the retention policy of traces created from now on in this process.
+    """
+    _POLICY[0] = parse_trace_policy(spec)
+
+
+def trace_policy():
+    """
+    Current (policy, limit) of this process.
+    """
+    return _POLICY[0]
+
+
+def trace_policy_spec():
+    return format_trace_policy(*_POLICY[0])
+
+
+def add_trace_args(parser):
+    """
+    Add --trace-retention to an argparse parser.
+    """
+    def policy_arg(spec):
+        try:
+            parse_trace_policy(spec)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e)) from None
+        return spec
+
+    parser.add_argument("--trace-retention", metavar="POLICY", default=None, type=policy_arg,
+                        help="reasoning trace kept per request: full, first:N, ring:N or sampled:N "
+                             "(default: $TRAVEL_TRACE_RETENTION or full)")
+
+
+def apply_trace_args(args):
+    """
+    Use the --trace-retention policy here and in worker processes started later.
+    """
+    if args.trace_retention is not None:
+        set_trace_policy(args.trace_retention)
+        os.environ["TRAVEL_TRACE_RETENTION"] = args.trace_retention
+
+
+# ===========================
+# 2. Bounded trace buffer
+# ===========================
+
+def trace_rule(line):
+    """
+    Rule name of a trace line (text before the first colon), as charted by
+    travel_plot.compute_rule_frequency.
+    """
+    return line.split(":", 1)[0].strip()
+
+
+class TraceBuffer(Sequence):
+    """
+    Trace that keeps at most limit lines under a first / ring / sampled policy.
+      seen         -> trace events appended (kept or not)
+      dropped      -> events not kept
+      rule_counts  -> rule -> events appended, dropped ones included
+    Reads like the list it replaces: iteration, len() and indexing give the
+    kept lines in trace order.
+    """
+
+    def __init__(self, policy, limit):
+        if policy not in TRACE_POLICIES or policy == "full":
+            raise ValueError(f"not a bounded trace policy: {policy}")
+        self.policy = policy
+        self.limit = limit
+        self.seen = 0
+        self.rule_counts = Counter()
+        if policy == "ring":
+            self.lines = deque(maxlen=limit)
+        else:
+            self.lines = []
+        # sampled: sequence number of each kept line, to restore trace order
+        self.positions = []
+        self.rng = None
+
+    def append(self, line):
+        self.rule_counts[trace_rule(line)] += 1
+        seen = self.seen
+        self.seen = seen + 1
+        if self.policy == "ring":
+            if self.limit > 0:
+                self.lines.append(line)
+        elif len(self.lines) < self.limit:
+            self.lines.append(line)
+            self.positions.append(seen)
+        elif self.policy == "sampled" and self.limit > 0:
+            # Reservoir sampling: every event ends up kept with probability limit / seen.
+            # Seeded per buffer, so the same inference keeps the same lines.
+            if self.rng is None:
+                self.rng = random.Random(0)
+            slot = self.rng.randrange(seen + 1)
+            if slot < self.limit:
+                self.lines[slot] = line
+                self.positions[slot] = seen
+
+    @property
+    def dropped(self):
+        return self.seen - len(self.lines)
+
+    def _ordered(self):
+        if self.policy == "sampled" and self.seen > self.limit:
+            return [line for _, line in sorted(zip(self.positions, self.lines))]
+        return list(self.lines)
+
+    def __iter__(self):
+        return iter(self._ordered())
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getitem__(self, index):
+        return self._ordered()[index]
+
+    @classmethod
+    def restore(cls, policy, limit, lines, seen, rule_counts):
+        """
+        Rebuild a buffer from its kept lines (in trace order) and counters,
+        e.g. when decoding an encoded state.
+        """
+        trace = cls(policy, limit)
+        trace.lines.extend(lines)
+        trace.positions = list(range(len(trace.lines)))
+        trace.seen = seen
+        trace.rule_counts = Counter(rule_counts)
+        return trace
+
+    def copy(self):
+        other = TraceBuffer(self.policy, self.limit)
+        other.seen = self.seen
+        other.rule_counts = Counter(self.rule_counts)
+        other.lines = self.lines.copy()
+        other.positions = list(self.positions)
+        return other
+
+    def __repr__(self):
+        return f"TraceBuffer({format_trace_policy(self.policy, self.limit)}, {len(self)} of {self.seen} lines)"
+
+
+def new_trace():
+    """
+    Empty trace under the current policy: a list for "full", else a TraceBuffer.
+    """
+    policy, limit = _POLICY[0]
+    if policy == "full":
+        return []
+    return TraceBuffer(policy, limit)
+
+
+def retain_trace(lines, policy=None):
+    """
+    Apply a retention policy (default: the current one) to trace lines.
+    """
+    policy, limit = trace_policy() if policy is None else parse_trace_policy(policy)
+    if policy == "full":
+        return list(lines)
+    trace = TraceBuffer(policy, limit)
+    for line in lines:
+        trace.append(line)
+    return trace
+
+
+# ===========================
+# 3. Reading traces
+# ===========================
+
+def trace_rule_counts(trace):
+    """
+    rule -> trace events, in order of first appearance; exact for bounded
+    traces even when lines were dropped.
+    """
+    if isinstance(trace, TraceBuffer):
+        return {rule: count for rule, count in trace.rule_counts.items() if rule != ""}
+    counts = {}
+    for line in trace:
+        rule = trace_rule(line)
+        if rule != "":
+            counts[rule] = counts.get(rule, 0) + 1
+    return counts
+
+
+def trace_marker(trace):
+    """
+    Text describing the lines a bounded trace dropped, or None if it is complete.
+    """
+    if not isinstance(trace, TraceBuffer) or trace.dropped == 0:
+        return None
+    kept = {
+        "first": f"first {len(trace)} kept",
+        "ring": f"last {len(trace)} kept",
+        "sampled": f"sample of {len(trace)} kept",
+    }[trace.policy]
+    return f"[trace truncated: {trace.dropped} of {trace.seen} events dropped, {kept} " \
+           f"(policy {format_trace_policy(trace.policy, trace.limit)})]"
+
+
+def format_trace(trace):
+    """
+    Trace lines for display, with the truncation marker where lines are missing:
+    after the kept lines for first:N, before them for ring:N and sampled:N.
+    """
+    lines = list(trace)
+    marker = trace_marker(trace)
+    if marker is None:
+        return lines
+    if trace.policy == "first":
+        return lines + [marker]
+    return [marker] + lines
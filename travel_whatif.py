@@ -0,0 +1,324 @@
+# =============================================
+# Travel What-If - Sensitivity Analysis
+# =============================================
+# Reports, for every alternative value of every profile field, how the top
+# recommendation and the scores would change, e.g.
+# "If you travelled in autumn instead of spring, Japan would win."
+#
+# Alternatives are evaluated as deltas against ONE base run_inference()
+# result instead of ~30 full re-runs:
+# - only the rule family that reads the changed field is re-run;
+# - the higher-level rules (R20-R25) and the scores are only recomputed
+#   for destinations whose evidence actually changed.
+
+from collections import defaultdict
+
+from travel_info import (
+    PROFILE_OPTIONS,
+    LIKES_OPTIONS,
+    build_destination_facts,
+)
+
+from travel_core import (
+    init_state,
+    run_inference,
+    compute_scores,
+    rank_destinations,
+    rule_budget_vs_cost,
+    rule_food_preferences,
+    rule_activity_preferences,
+    rule_season_matching,
+    rule_traffic_and_transport,
+    rule_safety,
+    rule_companions,
+    rule_strong_recommendations,
+    rule_contradictions,
+    rule_neutral_and_final,
+)
+
+
+# ===========================
+# 1. Field -> rule family
+# ===========================
+
+# Base rule family that reads each profile field. Fields not listed here
+# (trip_duration, crowd_tolerance, climate_preference) are not used by any rule.
+FIELD_RULE_FAMILY = {
+    "budget": rule_budget_vs_cost,
+    "food_preference": rule_food_preferences,
+    "likes": rule_activity_preferences,
+    "prefers_season": rule_season_matching,
+    "transport": rule_traffic_and_transport,
+    "traffic_preference": rule_traffic_and_transport,
+    "safety_priority": rule_safety,
+    "companions": rule_companions,
+}
+
+# Evidence rules each family asserts into recommended / not_recommended.
+# rule_season_matching asserts the season_matched / weak_recommendation labels instead.
+FAMILY_RULES = {
+    rule_budget_vs_cost: {"R1_budget_low_avoid_expensive", "R2_budget_allows_expensive"},
+    rule_food_preferences: {"R3_food_local_cuisine"},
+    rule_activity_preferences: {"R4_culture_history", "R5_adventure", "R6_shopping", "R7_nature", "R8_city_life"},
+    rule_season_matching: set(),
+    rule_traffic_and_transport: {
+        "R11_low_traffic_avoid_high",
+        "R12_high_traffic_ok",
+        "R13_public_transport",
+        "R14_walking_avoid_high_traffic",
+    },
+    rule_safety: {"R15_high_safety_avoid_mid", "R16_high_safety_prefers_very_safe"},
+    rule_companions: {"R18_family_avoid_risky_adventure_city", "R19_solo_city_life"},
+}
+
+SEASON_LABELS = ["season_matched", "weak_recommendation"]
+
+
+# ===========================
+# 2. Alternatives
+# ===========================
+
+def profile_alternatives(user):
+    """
+    Yield (field, old value, new value, alternative user) for every single-field change:
+    every other option of each PROFILE_OPTIONS field, and toggling each "likes" entry.
+    """
+    for field, options in PROFILE_OPTIONS.items():
+        for value in options:
+            if value != user[field]:
+                alt = dict(user)
+                alt[field] = value
+                yield field, user[field], value, alt
+
+    for like in LIKES_OPTIONS:
+        alt = dict(user)
+        if like in user["likes"]:
+            alt["likes"] = [l for l in user["likes"] if l != like]
+        else:
+            alt["likes"] = list(user["likes"]) + [like]
+        yield "likes", list(user["likes"]), alt["likes"], alt
+
+
+# ===========================
+# 3. Delta evaluation
+# ===========================
+
+def base_context(base_state):
+    """
+    Lookups shared by every alternative of one base result:
+      "labels"   -> season label -> set of destinations
+      "evidence" -> family -> {dest: (rec rules, not_rec rules)} (filled lazily)
+      "position" -> dest -> catalog index
+    """
+    return {
+        "labels": {label: set(base_state[label]) for label in SEASON_LABELS},
+        "evidence": {},
+        "position": {d: i for i, d in enumerate(base_state["recommended"])},
+    }
+
+
+def family_evidence(base_state, rules):
+    """
+    Evidence one rule family contributed to the base state, only for the
+    destinations where it fired: dest -> (set of rec rules, set of not_rec rules)
+    """
+    evidence = {}
+    for d, fired in base_state["recommended"].items():
+        own = {r for r in fired if r in rules}
+        if own:
+            evidence[d] = (own, set())
+    for d, fired in base_state["not_recommended"].items():
+        own = {r for r in fired if r in rules}
+        if own:
+            evidence[d] = (evidence.get(d, (set(), set()))[0], own)
+    return evidence
+
+
+def delta_scores(base_state, base_scores, alt_user, dest_facts, family, weights="default", context=None):
+    """
+    Scores for alt_user, which differs from the base profile only in
+    fields read by one rule family.
+
+    Re-runs that family alone, then rebuilds evidence, higher-level rules
+    and scores only for the destinations whose family output changed.
+    context (from base_context()) can be passed to reuse lookups across alternatives.
+    Returns (scores, changed destinations in catalog order).
+    """
+    if context is None:
+        context = base_context(base_state)
+    destinations = list(base_state["recommended"])
+    rules = FAMILY_RULES[family]
+    is_season = family is rule_season_matching
+
+    if family not in context["evidence"]:
+        context["evidence"][family] = family_evidence(base_state, rules)
+    old_evidence = context["evidence"][family]
+    base_labels = context["labels"]
+
+    # Family output for the alternative profile. The evidence dicts only
+    # get an entry for destinations the family actually fires for.
+    scratch = init_state([])
+    scratch["recommended"] = defaultdict(list)
+    scratch["not_recommended"] = defaultdict(list)
+    family(alt_user, dest_facts, scratch, destinations)
+
+    candidates = set(old_evidence) | set(scratch["recommended"]) | set(scratch["not_recommended"])
+    if is_season:
+        alt_labels = {label: set(scratch[label]) for label in SEASON_LABELS}
+        for label in SEASON_LABELS:
+            candidates |= base_labels[label] ^ alt_labels[label]
+    else:
+        alt_labels = base_labels
+
+    no_evidence = (set(), set())
+    changed = []
+    for d in candidates:
+        old_rec, old_not = old_evidence.get(d, no_evidence)
+        if old_rec != set(scratch["recommended"].get(d, ())) or old_not != set(scratch["not_recommended"].get(d, ())):
+            changed.append(d)
+        elif is_season and any((d in base_labels[l]) != (d in alt_labels[l]) for l in SEASON_LABELS):
+            changed.append(d)
+    changed.sort(key=context["position"].__getitem__)
+
+    scores = dict(base_scores)
+    if len(changed) == 0:
+        return scores, changed
+
+    # Rebuild only the changed destinations: base evidence of the other
+    # families plus the new family output, then the higher-level rules
+    mini = init_state(changed)
+    for d in changed:
+        mini["recommended"][d] = [r for r in base_state["recommended"][d] if r not in rules] + scratch["recommended"].get(d, [])
+        mini["not_recommended"][d] = [r for r in base_state["not_recommended"][d] if r not in rules] + scratch["not_recommended"].get(d, [])
+    for label in SEASON_LABELS:
+        mini[label] = [d for d in changed if d in alt_labels[label]]
+
+    rule_strong_recommendations(mini, changed)
+    rule_contradictions(mini, changed)
+    rule_neutral_and_final(mini, changed)
+
+    scores.update(compute_scores(mini, weights))
+    return scores, changed
+
+
+def top_after_change(base_order, position, scores, changed):
+    """
+    Best destination after a delta, without re-ranking the catalog:
+    the best unchanged destination is the first one in the base ranking
+    that did not change; compare it with the changed destinations.
+    Ties are broken by catalog position, like rank_destinations().
+    """
+    if len(changed) == 0:
+        return base_order[0]
+
+    changed_set = set(changed)
+    candidates = list(changed)
+    for d in base_order:
+        if d not in changed_set:
+            candidates.append(d)
+            break
+
+    return min(candidates, key=lambda d: (-scores[d], position[d]))
+
+
+def what_if(user, dest_facts=None, base_state=None, weights="default"):
+    """
+    Sensitivity report for a user profile.
+
+    Returns a dict:
+      "base_top"    -> best destination for the profile as given
+      "base_scores" -> dest -> score
+      "changes"     -> one entry per single-field alternative:
+          {"field", "from", "to",
+           "top"         -> best destination after the change,
+           "top_score"   -> its score,
+           "top_changed" -> True if the winner differs from base_top,
+           "deltas"      -> dest -> score change (only non-zero changes)}
+    """
+    if dest_facts is None:
+        dest_facts = build_destination_facts()
+    if base_state is None:
+        base_state = run_inference(user, dest_facts)
+
+    base_scores = compute_scores(base_state, weights)
+    base_order = rank_destinations(base_scores)
+    base_top = base_order[0]
+    context = base_context(base_state)
+
+    changes = []
+    for field, old, new, alt in profile_alternatives(user):
+        family = FIELD_RULE_FAMILY.get(field)
+        if family is None:
+            # No rule reads this field: nothing can change
+            scores, changed = base_scores, []
+        else:
+            scores, changed = delta_scores(base_state, base_scores, alt, dest_facts, family, weights, context)
+
+        top = top_after_change(base_order, context["position"], scores, changed)
+        deltas = {}
+        for d in changed:
+            if scores[d] != base_scores[d]:
+                deltas[d] = scores[d] - base_scores[d]
+
+        changes.append({
+            "field": field,
+            "from": old,
+            "to": new,
+            "top": top,
+            "top_score": scores[top],
+            "top_changed": top != base_top,
+            "deltas": deltas,
+        })
+
+    return {
+        "base_top": base_top,
+        "base_scores": base_scores,
+        "changes": changes,
+    }
+
+
+# ===========================
+# 4. Advisor wording
+# ===========================
+
+def describe_change(change):
+    """
+    One advisor-friendly sentence for a change entry of what_if().
+    """
+    field = change["field"]
+    if field == "likes":
+        added = [l for l in change["to"] if l not in change["from"]]
+        removed = [l for l in change["from"] if l not in change["to"]]
+        if added:
+            condition = "If you were also interested in " + added[0].replace("_", " ")
+        else:
+            condition = "If you were not interested in " + removed[0].replace("_", " ")
+    elif field == "prefers_season":
+        condition = f"If you travelled in {change['to']} instead of {change['from']}"
+    else:
+        condition = f"If your {field.replace('_', ' ')} were {change['to']} instead of {change['from']}"
+
+    if change["top_changed"]:
+        return f"{condition}, {change['top']} would win (score {change['top_score']})."
+    return f"{condition}, {change['top']} would still be the top pick."
+
+
+def describe_what_if(report, only_winner_changes=True):
+    """
+    List of sentences for a what_if() report.
+    By default only changes that alter the top recommendation are described.
+    """
+    lines = []
+    for change in report["changes"]:
+        if change["top_changed"] or not only_winner_changes:
+            lines.append(describe_change(change))
+    return lines
+
+
+if __name__ == "__main__":
+    from travel_core import build_sample_user
+
+    report = what_if(build_sample_user())
+    print("Top pick:", report["base_top"], "(score", str(report["base_scores"][report["base_top"]]) + ")")
+    for line in describe_what_if(report):
+        print(" -", line)